@@ -1,10 +1,27 @@
 import os
+import threading
 import requests
 
+from modules.matching.matchengine import CompiledRuleset, MatchEngine
+
 
 MATCHER_URL = os.environ.get("MATCHER_API")
+# Optional /find_matches endpoint: one remote call per event, not per rule
+MATCHER_RULESET_URL = os.environ.get("MATCHER_RULESET_API")
 SERVICE_TOKEN_PATH = "/run/secrets/service_token"
 
+# "local" evaluates rules in-process; "remote" posts each rule to the matcher
+DETECTOR_MATCH_MODE = os.environ.get("DETECTOR_MATCH_MODE", "local").lower()
+MATCHER_TIMEOUT = float(os.environ.get("MATCHER_TIMEOUT", 10))
+
+_engine = MatchEngine()
+
+_session = None
+_session_lock = threading.Lock()
+_auth_headers = None
+_remote_ruleset = (None, None)
+_local_ruleset = (None, None)
+
 
 def service_auth_headers():
     try:
@@ -16,27 +33,149 @@ def service_auth_headers():
         return {}
 
 
-def analyze_log_with_rules(log_data: dict, rules: list[dict]) -> dict:
+def get_session() -> requests.Session:
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+        return _session
+
+
+def _cached_auth_headers(refresh: bool = False) -> dict:
+    # The token file is read once; a 401 re-reads it in case it was rotated
+    global _auth_headers
+
+    if _auth_headers is None or refresh:
+        _auth_headers = service_auth_headers()
+    return _auth_headers
+
+
+def _post(url: str, payload: dict) -> requests.Response:
+	session = get_session()
+	resp = session.post(url,
+	                    json=payload,
+	                    headers=_cached_auth_headers(),
+	                    timeout=MATCHER_TIMEOUT)
+
+	if resp.status_code == 401:
+		resp = session.post(url,
+		                    json=payload,
+		                    headers=_cached_auth_headers(refresh=True),
+		                    timeout=MATCHER_TIMEOUT)
+
+	return resp
+
+
+def _match_remote(rule: dict, log_data: dict) -> dict:
 	if not MATCHER_URL:
 		raise RuntimeError("MATCHER_API environment variable is not set.")
 
-	results = []
-	detected = False
+	resp = _post(MATCHER_URL, {
+		"rule": rule,
+		"log_data": log_data,
+	})
+
+	resp.raise_for_status()
+	return resp.json()
+
+
+def _match_remote_ruleset(log_data: dict, rules: list[dict]) -> list[int]:
+	"""
+	Positions of the matching rules, from one /find_matches call. The
+	ruleset is sent once; later calls send the ruleset_id the matcher
+	returned, and the rules again if it no longer knows that id.
+	"""
+	global _remote_ruleset
+
+	known_rules, ruleset_id = _remote_ruleset
+	full = {"log_data": log_data, "rules": [r.get("rule", {}) for r in rules]}
+
+	if known_rules is rules and ruleset_id:
+		resp = _post(MATCHER_RULESET_URL, {"log_data": log_data, "ruleset_id": ruleset_id})
+		if resp.status_code == 404:
+			resp = _post(MATCHER_RULESET_URL, full)
+	else:
+		resp = _post(MATCHER_RULESET_URL, full)
+
+	resp.raise_for_status()
+	out = resp.json()
+
+	_remote_ruleset = (rules, out.get("ruleset_id"))
+
+	errors = out.get("errors") or []
+	if errors:
+		raise RuntimeError(f"Matcher error: {errors[0].get('details')}")
+
+	return out.get("matched_index", [])
+
+
+def _match_local(rule: dict, log_data: dict) -> dict:
+	result = _engine.match(rule, log_data)
+
+	# The matcher service answers with the engine's status; keep failing the
+	# event the same way raise_for_status() did.
+	if result["status"] >= 400:
+		raise RuntimeError(f"Matcher error ({result['status']}): {result['details']}")
+
+	return {
+		"matched": result["is_matched"],
+		"details": result["details"],
+	}
+
+
+def match_rule(rule: dict, log_data: dict) -> dict:
+	if DETECTOR_MATCH_MODE == "remote":
+		return _match_remote(rule, log_data)
+	return _match_local(rule, log_data)
+
+
+def compiled_ruleset(rules: list[dict]) -> CompiledRuleset:
+	"""
+	The CompiledRuleset for this rules list, compiled once per list.
+	"""
+	global _local_ruleset
+
+	known_rules, compiled = _local_ruleset
+	if known_rules is not rules:
+		compiled = CompiledRuleset(r.get("rule", {}) for r in rules)
+		_local_ruleset = (rules, compiled)
+
+	return compiled
+
+
+def _match_local_ruleset(log_data: dict, rules: list[dict]) -> list[int]:
+	matched, errors = compiled_ruleset(rules).evaluate(log_data)
+
+	if errors:
+		result = errors[0][1]
+		raise RuntimeError(f"Matcher error ({result['status']}): {result['details']}")
+
+	return matched
+
+
+def _matches(log_data: dict, rules: list[dict]):
+	# (rule_entry, matcher response) for every rule, or every matched rule
+	if DETECTOR_MATCH_MODE == "remote" and MATCHER_RULESET_URL:
+		for index in _match_remote_ruleset(log_data, rules):
+			yield rules[index], {"matched": True, "details": "Matched by ruleset evaluation"}
+		return
+
+	if DETECTOR_MATCH_MODE != "remote":
+		compiled = compiled_ruleset(rules)
+		for index in _match_local_ruleset(log_data, rules):
+			yield rules[index], {"matched": True, "details": compiled.rules[index].matched["details"]}
+		return
 
 	for rule_entry in rules:
-		payload = {
-			"rule": rule_entry.get("rule", {}),
-			"log_data": log_data,
-		}
-
-		resp = requests.post(MATCHER_URL, 
-                       		json=payload,
-                            headers=service_auth_headers(),
-                            timeout=10)
-        
-		resp.raise_for_status()
-		match = resp.json()
+		yield rule_entry, match_rule(rule_entry.get("rule", {}), log_data)
+
+
+def analyze_log_with_rules(log_data: dict, rules: list[dict]) -> dict:
+	results = []
+	detected = False
 
+	for rule_entry, match in _matches(log_data, rules):
 		matched = bool(match.get("matched", False))
 		if matched:
 			detected = True
@@ -1,5 +1,17 @@
 import os
+import socket
+import uuid
 from modules.database.mongo_db import HerringboneMongoDatabase
+from modules.database.leases import LeaseKeeper
+
+
+DETECTOR_BATCH_SIZE = int(os.environ.get("DETECTOR_BATCH_SIZE", 100))
+DETECTOR_LEASE_SECONDS = float(os.environ.get("DETECTOR_LEASE_SECONDS", 60.0))
+# "oldest" drains the backlog in arrival order; "newest" favours fresh events
+DETECTOR_ORDER = os.environ.get("DETECTOR_ORDER", "oldest").lower()
+
+WORKER_ID = os.environ.get("DETECTOR_WORKER_ID") or f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+LEASE_FIELD = "detect_lease"
 
 
 def _db() -> HerringboneMongoDatabase:
@@ -11,43 +23,73 @@ def _db() -> HerringboneMongoDatabase:
     )
 
 
-def fetch_one_undetected() -> dict | None:
-    status_collection = os.environ.get("EVENT_STATUS_COLLECTION_NAME", "event_state")
-    events_collection = os.environ.get("EVENTS_COLLECTION_NAME", "events")
+def _collections() -> tuple[str, str]:
+    return (
+        os.environ.get("EVENT_STATUS_COLLECTION_NAME", "event_state"),
+        os.environ.get("EVENTS_COLLECTION_NAME", "events"),
+    )
 
-    mongo = _db()
 
-    try:
-        status_list = mongo.find_sorted(
-            collection=status_collection,
-            filter_query={
-                "parsed": True,
-                "detected": False,
-            },
-            sort=[("_id", -1)],
-            limit=1,
-        )
-    except Exception:
-        return None
+def claim_undetected(mongo=None, limit: int = DETECTOR_BATCH_SIZE) -> list[dict]:
+    """
+    Lease up to `limit` parsed, undetected event states to this worker and
+    join them with their events in one $in query.
 
-    if not status_list:
-        return None
+    Returns [{"event": event or None, "status": state}] in claim order. A
+    state whose event is missing (or that has no event_id) comes back with
+    event None so the caller can close it instead of claiming it forever.
+    Leases expire after DETECTOR_LEASE_SECONDS, so states claimed by a
+    detector that died are picked up by another replica.
+    """
+    status_collection, events_collection = _collections()
+    mongo = mongo or _db()
 
-    status = status_list[0]
+    direction = -1 if DETECTOR_ORDER == "newest" else 1
 
-    event_id = status.get("event_id")
-    if not event_id:
-        return None
+    states = mongo.claim_batch(
+        status_collection,
+        {"parsed": True, "detected": False},
+        owner=WORKER_ID,
+        lease_field=LEASE_FIELD,
+        lease_seconds=DETECTOR_LEASE_SECONDS,
+        limit=limit,
+        sort=[("_id", direction)],
+    )
 
+    if not states:
+        return []
+
+    event_ids = [s["event_id"] for s in states if s.get("event_id") is not None]
+
+    events = {}
+    if event_ids:
+        for event in mongo.find(events_collection, {"_id": {"$in": event_ids}}):
+            events[event["_id"]] = event
+
+    return [
+        {"event": events.get(s.get("event_id")), "status": s}
+        for s in states
+    ]
+
+
+def lease_keeper(mongo=None) -> LeaseKeeper:
+    """
+    Renews this worker's detect leases on states that are claimed but not
+    yet written, however long they sit in the pipeline's queues.
+    """
+    return LeaseKeeper(
+        mongo or _db(),
+        _collections()[0],
+        owner=WORKER_ID,
+        lease_field=LEASE_FIELD,
+        lease_seconds=DETECTOR_LEASE_SECONDS,
+    )
+
+
+def fetch_one_undetected() -> dict | None:
     try:
-        event = mongo.find_one(events_collection, {"_id": event_id})
+        docs = claim_undetected(limit=1)
     except Exception:
         return None
 
-    if not event:
-        return None
-
-    return {
-        "event": event,
-        "status": status,
-    }
+    return docs[0] if docs else None
@@ -1,19 +1,109 @@
-from app.processor import process_one
+from app.fetcher import DETECTOR_BATCH_SIZE, DETECTOR_ORDER, WORKER_ID, _db, claim_undetected, lease_keeper
+from app.processor import process_batch, _maybe_log
+from app.pipeline import DetectorPipeline
+from app.updater import start_result_writer, stop_result_writer
+from app.outbox import ORCHESTRATOR_URL, OrchestratorSender
+import os
+import signal
+import threading
 import time
 
 
-def main():
-	print("[detector] started")
+DETECTOR_POLL_INTERVAL = float(os.environ.get("DETECTOR_POLL_INTERVAL", 0.05))
+# "poll" sleeps between empty claims; "changestream" wakes on event_state writes
+DETECTOR_WAKE_MODE = os.environ.get("DETECTOR_WAKE_MODE", "poll").lower()
+# "false" keeps the single-threaded claim -> evaluate -> write loop
+DETECTOR_PIPELINE = os.environ.get("DETECTOR_PIPELINE", "true").lower() == "true"
+
 
-	while True:
+def wait_for_work(mongo):
+	global DETECTOR_WAKE_MODE
+
+	if DETECTOR_WAKE_MODE == "changestream":
 		try:
-			processed = process_one()
-			if not processed.get("status"):
-				time.sleep(0.05)
+			mongo.wait_for_change(
+				os.environ.get("EVENT_STATUS_COLLECTION_NAME", "event_state"),
+				pipeline=[{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}],
+				timeout=max(DETECTOR_POLL_INTERVAL, 1.0),
+			)
+			return
+		except Exception as e:
+			print(f"[!] Change stream unavailable, polling instead: {e}")
+			DETECTOR_WAKE_MODE = "poll"
+
+	time.sleep(DETECTOR_POLL_INTERVAL)
+
+
+def _stop_on_signal() -> threading.Event:
+	stopped = threading.Event()
+
+	def _shutdown(signum, frame):
+		print("[*] detector stopping, draining claimed events")
+		stopped.set()
+
+	signal.signal(signal.SIGTERM, _shutdown)
+	signal.signal(signal.SIGINT, _shutdown)
+
+	return stopped
+
+
+def run_pipeline(mongo, stopped: threading.Event, leases):
+	pipeline = DetectorPipeline(mongo, wait_for_work, leases=leases)
+
+	pipeline.start()
+	stopped.wait()
+	pipeline.stop()
+
+
+def run_serial(mongo, stopped: threading.Event, leases):
+	while not stopped.is_set():
+		try:
+			batch = claim_undetected(mongo)
+
+			if not batch:
+				_maybe_log()
+				wait_for_work(mongo)
+				continue
+
+			leases.add(d["status"]["_id"] for d in batch if d["status"].get("_id") is not None)
+			process_batch(batch)
 		except Exception as e:
 			print(f"[ERROR] detector loop failure: {e}")
 			time.sleep(0.1)
 
 
+def main():
+	print(
+		f"[detector] started worker={WORKER_ID} batch_size={DETECTOR_BATCH_SIZE} "
+		f"order={DETECTOR_ORDER} wake_mode={DETECTOR_WAKE_MODE} pipeline={DETECTOR_PIPELINE}"
+	)
+
+	mongo = _db()
+	stopped = _stop_on_signal()
+
+	# Claimed states stay leased until their result is written
+	leases = lease_keeper(mongo).start()
+	start_result_writer(leases)
+
+	sender = None
+	if ORCHESTRATOR_URL:
+		sender = OrchestratorSender(mongo).start()
+	else:
+		print("[!] ORCHESTRATOR_URL not set, detections will not be forwarded")
+
+	try:
+		if DETECTOR_PIPELINE:
+			run_pipeline(mongo, stopped, leases)
+		else:
+			run_serial(mongo, stopped, leases)
+	finally:
+		# Results still buffered are written before the process exits;
+		# undelivered notifications stay in the outbox
+		stop_result_writer()
+		leases.stop()
+		if sender is not None:
+			sender.stop()
+
+
 if __name__ == "__main__":
 	main()
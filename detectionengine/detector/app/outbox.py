@@ -0,0 +1,301 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import requests
+from bson import ObjectId
+from pymongo import DeleteOne, UpdateOne
+
+from app.fetcher import WORKER_ID
+
+
+ORCHESTRATOR_URL = os.environ.get("ORCHESTRATOR_URL", None)
+# Defaults to the batch twin of ORCHESTRATOR_URL (.../process_detections)
+ORCHESTRATOR_BATCH_URL = os.environ.get("ORCHESTRATOR_BATCH_URL") or (
+    ORCHESTRATOR_URL + "s" if ORCHESTRATOR_URL and ORCHESTRATOR_URL.endswith("/process_detection") else None
+)
+SERVICE_TOKEN_PATH = "/run/secrets/service_token"
+
+OUTBOX_COLLECTION = os.environ.get("DETECTOR_OUTBOX_COLLECTION", "detection_outbox")
+# The orchestrator makes up to two 5s calls per detection, eight detections
+# at a time: 16 per batch finish within the 30s timeout even when every
+# call is slow
+OUTBOX_BATCH_SIZE = int(os.environ.get("DETECTOR_OUTBOX_BATCH_SIZE", 16))
+OUTBOX_TIMEOUT = float(os.environ.get("DETECTOR_OUTBOX_TIMEOUT", 30.0))
+OUTBOX_POLL_INTERVAL = float(os.environ.get("DETECTOR_OUTBOX_POLL_INTERVAL", 0.5))
+# Covers a post and its retry after a 401, so a batch being sent is not
+# leased to another replica
+OUTBOX_LEASE_SECONDS = float(os.environ.get("DETECTOR_OUTBOX_LEASE_SECONDS", max(60.0, 3 * OUTBOX_TIMEOUT)))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("DETECTOR_OUTBOX_MAX_ATTEMPTS", 10))
+OUTBOX_BACKOFF_BASE = float(os.environ.get("DETECTOR_OUTBOX_BACKOFF_BASE", 1.0))
+OUTBOX_BACKOFF_MAX = float(os.environ.get("DETECTOR_OUTBOX_BACKOFF_MAX", 300.0))
+
+LEASE_FIELD = "send_lease"
+
+
+def outbox_record(payload: dict) -> dict:
+    """
+    An outbox document for one orchestrator notification. The _id is set
+    here so a retried bulk insert does not queue it twice.
+    """
+    now = datetime.now(timezone.utc)
+    return {
+        "_id": ObjectId(),
+        "payload": payload,
+        "state": "pending",
+        "attempts": 0,
+        "next_attempt_at": now,
+        "created_at": now,
+        LEASE_FIELD: None,
+    }
+
+
+def _permanent(status_code: int) -> bool:
+    # The orchestrator rejected the detection itself; resending won't help
+    return 400 <= status_code < 500 and status_code not in (401, 404, 408, 429)
+
+
+class OrchestratorSender:
+    """
+    Delivers the detection outbox to the orchestrator.
+
+    Detections are written to OUTBOX_COLLECTION together with their
+    event_state update, so notifying never blocks detection and survives a
+    restart. This thread leases due outbox documents (several detector
+    replicas can share one outbox), posts them as one batch to the
+    orchestrator's /process_detections over a keep-alive session and then
+    deletes the delivered ones. Failures are retried with exponential
+    backoff up to OUTBOX_MAX_ATTEMPTS; detections the orchestrator rejects
+    with a 4xx, or that run out of attempts, are kept with state "dead".
+
+    Against an orchestrator without the batch endpoint (404) it falls back
+    to one /process_detection post per detection on the same session.
+
+    Every payload carries its detection_id, which the orchestrator uses as
+    an idempotency key: resending a batch that timed out after the
+    orchestrator acted on it does not open or attach incidents twice.
+    """
+
+    def __init__(
+        self,
+        mongo,
+        *,
+        url: str | None = ORCHESTRATOR_URL,
+        batch_url: str | None = ORCHESTRATOR_BATCH_URL,
+        collection: str = OUTBOX_COLLECTION,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        poll_interval: float = OUTBOX_POLL_INTERVAL,
+        max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+        backoff_base: float = OUTBOX_BACKOFF_BASE,
+        backoff_max: float = OUTBOX_BACKOFF_MAX,
+        timeout: float = OUTBOX_TIMEOUT,
+    ):
+        self.mongo = mongo
+        self.url = url
+        self.batch_url = batch_url
+        self.collection = collection
+        self.batch_size = max(1, batch_size)
+        self.poll_interval = poll_interval
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self._auth_headers = None
+
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        self._lock = threading.Lock()
+        self._metrics = {
+            "sent": 0,
+            "batches": 0,
+            "retries": 0,
+            "dead": 0,
+            "last_send_ms": 0.0,
+            "last_log": 0.0,
+        }
+
+    # ===========================
+    # Lifecycle
+    # ===========================
+
+    def start(self) -> "OrchestratorSender":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="detector-outbox", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float | None = 30.0):
+        """
+        Stop after the batch in progress; undelivered detections stay in
+        the outbox for the next start.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.session.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {k: v for k, v in self._metrics.items() if k != "last_log"}
+
+    # ===========================
+    # Delivery
+    # ===========================
+
+    def _headers(self, refresh: bool = False) -> dict:
+        # The token file is read once; a 401 re-reads it in case it was rotated
+        if self._auth_headers is None or refresh:
+            try:
+                with open(SERVICE_TOKEN_PATH, "r") as f:
+                    self._auth_headers = {"Authorization": f"Bearer {f.read().strip()}"}
+            except Exception as e:
+                print(f"[✗] Failed to read service token: {e}")
+                self._auth_headers = {}
+        return self._auth_headers
+
+    def _post(self, url: str, body: dict) -> requests.Response:
+        resp = self.session.post(url, json=body, headers=self._headers(), timeout=self.timeout)
+
+        if resp.status_code == 401:
+            resp = self.session.post(url, json=body, headers=self._headers(refresh=True), timeout=self.timeout)
+
+        return resp
+
+    def _send_batch(self, payloads: list[dict]) -> list[tuple[int | None, str | None]] | None:
+        """
+        One status per payload, or None when the orchestrator has no
+        batch endpoint.
+        """
+        resp = self._post(self.batch_url, {"detections": payloads})
+
+        if resp.status_code == 404:
+            return None
+        if resp.status_code >= 400:
+            return [(resp.status_code, resp.text[:200])] * len(payloads)
+
+        results = resp.json().get("results", [])
+        if len(results) != len(payloads):
+            raise ValueError(f"orchestrator returned {len(results)} results for {len(payloads)} detections")
+
+        return [(r.get("status_code", 200), r.get("error")) for r in results]
+
+    def _send_each(self, payloads: list[dict]) -> list[tuple[int | None, str | None]]:
+        out = []
+        for payload in payloads:
+            try:
+                resp = self._post(self.url, payload)
+                out.append((resp.status_code, None if resp.status_code < 400 else resp.text[:200]))
+            except Exception as e:
+                out.append((None, str(e)))
+        return out
+
+    def deliver(self, payloads: list[dict]) -> list[tuple[int | None, str | None]]:
+        """
+        (status_code, error) per payload; status_code is None when the
+        request itself failed.
+        """
+        try:
+            if self.batch_url:
+                results = self._send_batch(payloads)
+                if results is not None:
+                    return results
+                print("[!] Orchestrator has no batch endpoint, sending detections one by one")
+                self.batch_url = None
+            return self._send_each(payloads)
+        except Exception as e:
+            return [(None, str(e))] * len(payloads)
+
+    def _outcome(self, doc: dict, status_code: int | None, error: str | None, now: datetime):
+        if status_code is not None and status_code < 400:
+            self._count("sent")
+            return DeleteOne({"_id": doc["_id"]})
+
+        attempts = doc.get("attempts", 0) + 1
+        fields = {"attempts": attempts, "last_error": error, LEASE_FIELD: None}
+
+        if (status_code is not None and _permanent(status_code)) or attempts >= self.max_attempts:
+            self._count("dead")
+            print(f"[✗] Giving up on orchestrator notification {doc['_id']}: {status_code} {error}")
+            fields["state"] = "dead"
+        else:
+            self._count("retries")
+            delay = min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1)))
+            fields["next_attempt_at"] = now + timedelta(seconds=delay)
+
+        return UpdateOne({"_id": doc["_id"]}, {"$set": fields})
+
+    def send_due(self) -> int:
+        """
+        Lease and deliver one batch of due notifications; returns how many
+        were claimed.
+        """
+        now = datetime.now(timezone.utc)
+
+        docs = self.mongo.claim_batch(
+            self.collection,
+            {"state": "pending", "next_attempt_at": {"$lte": now}},
+            owner=WORKER_ID,
+            lease_field=LEASE_FIELD,
+            lease_seconds=OUTBOX_LEASE_SECONDS,
+            limit=self.batch_size,
+            sort=[("_id", 1)],
+        )
+
+        if not docs:
+            return 0
+
+        started = time.monotonic()
+        results = self.deliver([d["payload"] for d in docs])
+        now = datetime.now(timezone.utc)
+
+        self.mongo.bulk_write(
+            self.collection,
+            [self._outcome(doc, code, err, now) for doc, (code, err) in zip(docs, results)],
+            ordered=False,
+        )
+
+        with self._lock:
+            self._metrics["batches"] += 1
+            self._metrics["last_send_ms"] = round((time.monotonic() - started) * 1000, 2)
+
+        return len(docs)
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self._metrics[key] += n
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                claimed = self.send_due()
+            except Exception as e:
+                print(f"[✗] Outbox delivery failed: {e}")
+                claimed = 0
+
+            self._maybe_log()
+
+            if claimed < self.batch_size:
+                self._stop.wait(self.poll_interval)
+
+    def _maybe_log(self, interval: float = 5.0):
+        now = time.monotonic()
+
+        with self._lock:
+            if now - self._metrics["last_log"] < interval:
+                return
+            self._metrics["last_log"] = now
+
+        s = self.stats()
+        print(
+            f"[*] detector outbox heartbeat "
+            f"sent={s['sent']} "
+            f"batches={s['batches']} "
+            f"retries={s['retries']} "
+            f"dead={s['dead']} "
+            f"last_send_ms={s['last_send_ms']}"
+        )
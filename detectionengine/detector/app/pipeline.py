@@ -0,0 +1,308 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from app.fetcher import claim_undetected
+from app.processor import evaluate_doc, persist_outcome, get_rules_with_version, register_stage_stats, _count, _maybe_log
+from app.updater import result_writer_depth
+
+
+# Rule evaluation processes; 0 evaluates on the dispatcher thread instead
+DETECTOR_EVAL_WORKERS = int(os.environ.get("DETECTOR_EVAL_WORKERS", 2))
+# Threads writing results, states and orchestrator notifications
+DETECTOR_WRITE_WORKERS = int(os.environ.get("DETECTOR_WRITE_WORKERS", 4))
+# Claimed batches buffered between stages; a full queue stalls the stage before it
+DETECTOR_QUEUE_SIZE = int(os.environ.get("DETECTOR_QUEUE_SIZE", 4))
+
+_GET_TIMEOUT = 0.5
+_STOP = object()
+
+
+# ===========================
+# Evaluation worker
+# ===========================
+
+_worker_rules = (None, None)
+
+
+def _evaluate_batch(version: int, rules: list[dict] | None, docs: list[dict]) -> list[dict] | None:
+    """
+    Runs in a pool process. Rules are only sent after they change; a
+    worker keeps the last copy it was given, so the analyzer's compiled
+    ruleset cache (keyed by identity) is reused until the next reload.
+    Returns None when the batch came without rules and this worker does
+    not have the version yet; the dispatcher then resends it with them.
+    """
+    global _worker_rules
+
+    if rules is not None:
+        _worker_rules = (version, rules)
+    elif _worker_rules[0] != version:
+        return None
+
+    return [evaluate_doc(doc, _worker_rules[1]) for doc in docs]
+
+
+# ===========================
+# Pipeline
+# ===========================
+
+class DetectorPipeline:
+    """
+    Fetch -> evaluate -> persist, each stage on its own thread(s) with a
+    bounded queue in between:
+
+        fetch     one thread claiming batches with claim_undetected()
+        evaluate  a dispatcher thread feeding a process pool, keeping at
+                  most two batches per worker in flight
+        persist   DETECTOR_WRITE_WORKERS threads calling persist_outcome(),
+                  which hands writes to the updater's bulk result writer
+
+    Claimed states can wait in the queues for longer than their lease, so
+    with a LeaseKeeper every claimed state is held (and its lease renewed)
+    until the updater has written its result.
+
+    The ruleset goes to the pool with the first batches after it changes;
+    later batches carry only its version. Queue depths and in-flight counts
+    are appended to the detector heartbeat.
+    """
+
+    def __init__(
+        self,
+        mongo,
+        wait_for_work,
+        eval_workers: int = DETECTOR_EVAL_WORKERS,
+        write_workers: int = DETECTOR_WRITE_WORKERS,
+        queue_size: int = DETECTOR_QUEUE_SIZE,
+        leases=None,
+    ):
+        self.mongo = mongo
+        self.wait_for_work = wait_for_work
+        self.leases = leases
+        self.eval_workers = max(0, eval_workers)
+        self.write_workers = max(1, write_workers)
+        self.max_in_flight = max(1, self.eval_workers * 2)
+
+        self.eval_queue = queue.Queue(maxsize=max(1, queue_size))
+        self.write_queue = queue.Queue(maxsize=max(1, queue_size))
+
+        self._stopping = threading.Event()
+        self._pool = None
+        self._threads = []
+        self._in_flight = 0
+        self._writing = 0
+        self._writing_lock = threading.Lock()
+
+        # Rules version the pool was last sent, and how many more batches
+        # carry the rules so that each worker is likely to get a copy
+        self._sent_version = None
+        self._rules_sends = 0
+
+    # ---------------------------
+    # Lifecycle
+    # ---------------------------
+
+    def start(self):
+        if self.eval_workers:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.eval_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+        register_stage_stats(self.stats)
+
+        self._threads = [
+            threading.Thread(target=self._fetch_loop, name="detector-fetch", daemon=True),
+            threading.Thread(target=self._evaluate_loop, name="detector-evaluate", daemon=True),
+        ] + [
+            threading.Thread(target=self._write_loop, name=f"detector-write-{i}", daemon=True)
+            for i in range(self.write_workers)
+        ]
+
+        for t in self._threads:
+            t.start()
+
+        print(
+            f"[*] detector pipeline started eval_workers={self.eval_workers} "
+            f"write_workers={self.write_workers} queue_size={self.eval_queue.maxsize}"
+        )
+
+    def stop(self, timeout: float | None = None):
+        """
+        Stop claiming and drain what was already claimed: queued batches
+        are still evaluated and persisted before the threads exit.
+        """
+        self._stopping.set()
+
+        for t in self._threads:
+            t.join(timeout)
+
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+        register_stage_stats(None)
+
+    def join(self):
+        for t in self._threads:
+            t.join()
+
+    def stats(self) -> dict:
+        out = {
+            "eval_queue": self.eval_queue.qsize(),
+            "eval_in_flight": self._in_flight,
+            "write_queue": self.write_queue.qsize(),
+            "writing": self._writing,
+        }
+
+        if self.leases is not None:
+            out["leased"] = self.leases.held()
+
+        depth = result_writer_depth()
+        if depth is not None:
+            out["result_queue"] = depth
+
+        return out
+
+    # ---------------------------
+    # Stages
+    # ---------------------------
+
+    def _fetch_loop(self):
+        while not self._stopping.is_set():
+            try:
+                batch = claim_undetected(self.mongo)
+
+                if not batch:
+                    _maybe_log()
+                    self.wait_for_work(self.mongo)
+                    continue
+
+                _count(claimed=len(batch))
+
+                if self.leases is not None:
+                    self.leases.add(d["status"]["_id"] for d in batch if d["status"].get("_id") is not None)
+
+                # Blocks while evaluation is behind, so no more is leased
+                # than the pipeline can hold
+                self.eval_queue.put(batch)
+            except Exception as e:
+                print(f"[ERROR] detector fetch failure: {e}")
+                time.sleep(0.1)
+
+        self.eval_queue.put(_STOP)
+
+    def _evaluate_loop(self):
+        pending = deque()
+        stopping = False
+
+        while not stopping or pending:
+
+            batch = None
+            if not stopping and len(pending) < self.max_in_flight:
+                # Don't sit on finished results while waiting for new work
+                if not pending:
+                    timeout = _GET_TIMEOUT
+                elif pending[0][0].done():
+                    timeout = 0
+                else:
+                    timeout = 0.05
+
+                try:
+                    batch = self.eval_queue.get(timeout=timeout)
+                except queue.Empty:
+                    pass
+
+            if batch is _STOP:
+                stopping = True
+            elif batch is not None:
+                self._submit(pending, batch)
+
+            while pending and (stopping or len(pending) >= self.max_in_flight or pending[0][0].done()):
+                self.write_queue.put(self._collect(*pending.popleft()))
+                self._in_flight = len(pending)
+
+        for _ in range(self.write_workers):
+            self.write_queue.put(_STOP)
+
+    def _submit(self, pending: deque, docs: list[dict]):
+        version, rules = get_rules_with_version()
+
+        if self._pool is None:
+            outcomes = [evaluate_doc(doc, rules) for doc in docs]
+            self.write_queue.put(outcomes)
+            return
+
+        pool = self._pool
+
+        if version != self._sent_version:
+            self._sent_version = version
+            self._rules_sends = self.eval_workers
+
+        send_rules = self._rules_sends > 0
+        if send_rules:
+            self._rules_sends -= 1
+
+        try:
+            future = pool.submit(_evaluate_batch, version, rules if send_rules else None, docs)
+        except Exception as e:
+            print(f"[!] detector eval pool unavailable, evaluating inline: {e}")
+            self._restart_pool(pool)
+            self.write_queue.put([evaluate_doc(doc, rules) for doc in docs])
+            return
+
+        pending.append((future, docs, version, rules, pool))
+        self._in_flight = len(pending)
+
+    def _collect(self, future, docs: list[dict], version: int, rules: list[dict], pool) -> list[dict]:
+        try:
+            outcomes = future.result()
+            if outcomes is None:
+                # This worker had not seen the current rules yet
+                outcomes = pool.submit(_evaluate_batch, version, rules, docs).result()
+            return outcomes
+        except Exception as e:
+            # A crashed worker breaks the whole pool and fails every batch
+            # in flight on it; redo each here and replace the pool once
+            print(f"[!] detector eval worker failed, evaluating inline: {e}")
+            self._restart_pool(pool)
+            return [evaluate_doc(doc, rules) for doc in docs]
+
+    def _restart_pool(self, broken):
+        if self._pool is not broken:
+            return
+
+        try:
+            broken.shutdown(wait=False)
+        except Exception:
+            pass
+
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.eval_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        # Fresh workers have no rules
+        self._sent_version = None
+
+    def _write_loop(self):
+        while True:
+            outcomes = self.write_queue.get()
+
+            if outcomes is _STOP:
+                return
+
+            with self._writing_lock:
+                self._writing += 1
+
+            try:
+                for outcome in outcomes:
+                    persist_outcome(outcome)
+            except Exception as e:
+                print(f"[ERROR] detector write failure: {e}")
+            finally:
+                with self._writing_lock:
+                    self._writing -= 1
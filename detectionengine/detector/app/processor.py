@@ -1,35 +1,57 @@
+import threading
 from datetime import datetime
 from time import time
 
 from app.fetcher import fetch_one_undetected
-from app.rules import load_rules
+from app.rule_cache import RuleCache
 from app.analyzer import analyze_log_with_rules
-from app.updater import apply_result, set_failed
+from app.updater import apply_result, release_lease, set_failed, set_state_failed
 
 
 _metrics = {
+    "claimed": 0,
     "processed": 0,
     "detected": 0,
     "failed": 0,
     "last_log": 0.0,
 }
+# Counters are shared by the pipeline's writer threads
+_metrics_lock = threading.Lock()
+# Optional callable returning extra heartbeat fields (pipeline stage depths)
+_stage_stats = None
 
-# cache rules so we don't reload every event
-_rules_cache = None
-_rules_last_load = 0
-RULE_RELOAD_INTERVAL = 30  # seconds
+# Rules are reloaded when the ruleset service bumps their version
+_rule_cache = RuleCache()
 
 
 def _get_rules():
-    global _rules_cache, _rules_last_load
+    return get_rules_with_version()[1]
 
-    now = time()
 
-    if _rules_cache is None or now - _rules_last_load > RULE_RELOAD_INTERVAL:
-        _rules_cache = load_rules()
-        _rules_last_load = now
+def get_rules_with_version() -> tuple[int, list[dict]]:
+    """
+    The active rules and their cache generation, which changes on every
+    reload so evaluation workers can tell when their copy is stale.
+    """
+    snapshot = _rule_cache.current()
+    return snapshot.generation, snapshot.rules
+
+
+def register_stage_stats(stats):
+    """
+    Append the fields returned by stats() to the heartbeat; None removes
+    them again.
+    """
+    global _stage_stats
+
+    with _metrics_lock:
+        _stage_stats = stats
 
-    return _rules_cache
+
+def _count(**deltas):
+    with _metrics_lock:
+        for name, n in deltas.items():
+            _metrics[name] += n
 
 
 def _sanitize(event: dict) -> dict:
@@ -51,25 +73,39 @@ def _maybe_log(interval: float = 5.0):
 
     now = time()
 
-    if now - _metrics["last_log"] < interval:
-        return
+    with _metrics_lock:
+
+        if now - _metrics["last_log"] < interval:
+            return
 
-    processed = _metrics["processed"]
+        processed = _metrics["processed"]
 
-    rate = processed / interval if interval else 0
+        rate = processed / interval if interval else 0
 
-    print(
-        f"[*] detector heartbeat "
-        f"processed={processed} "
-        f"detected={_metrics['detected']} "
-        f"failed={_metrics['failed']} "
-        f"rate={rate:.1f}/s"
-    )
+        rules = _rule_cache.stats()
 
-    _metrics["processed"] = 0
-    _metrics["detected"] = 0
-    _metrics["failed"] = 0
-    _metrics["last_log"] = now
+        stages = ""
+        if _stage_stats is not None:
+            stages = "".join(f" {k}={v}" for k, v in _stage_stats().items())
+
+        print(
+            f"[*] detector heartbeat "
+            f"claimed={_metrics['claimed']} "
+            f"processed={processed} "
+            f"detected={_metrics['detected']} "
+            f"failed={_metrics['failed']} "
+            f"rate={rate:.1f}/s "
+            f"rules_version={rules['rules_version']} "
+            f"rules={rules['rules']} "
+            f"rules_compile_ms={rules['rules_compile_ms']}"
+            f"{stages}"
+        )
+
+        _metrics["claimed"] = 0
+        _metrics["processed"] = 0
+        _metrics["detected"] = 0
+        _metrics["failed"] = 0
+        _metrics["last_log"] = now
 
 
 def process_one():
@@ -80,29 +116,50 @@ def process_one():
         _maybe_log()
         return {"status": False}
 
+    _count(claimed=1)
+
+    return process_doc(doc)
+
+
+def process_batch(docs: list[dict]) -> int:
+    """
+    Process a claimed batch; returns how many events were processed
+    successfully.
+    """
+    _count(claimed=len(docs))
+
+    ok = 0
+    for doc in docs:
+        if process_doc(doc).get("status"):
+            ok += 1
+
+    return ok
+
+
+def process_doc(doc: dict):
+    return persist_outcome(evaluate_doc(doc, _get_rules()))
+
+
+def evaluate_doc(doc: dict, rules: list[dict]) -> dict:
+    """
+    Rule evaluation for one claimed doc, with no database writes, so it
+    can run in a worker process. The outcome is handed to
+    persist_outcome().
+    """
     event = doc.get("event")
+    state_id = (doc.get("status") or {}).get("_id")
 
     if not event:
-        _metrics["failed"] += 1
-        _maybe_log()
-        return {"status": False}
+        return {"kind": "orphan", "status": doc.get("status") or {}}
 
     event_id = event.get("_id")
 
     if not event_id:
-        _metrics["failed"] += 1
-        _maybe_log()
-        return {"status": False}
-
-    to_send = _sanitize(event)
-
-    rules = _get_rules()
+        return {"kind": "invalid", "state_id": state_id}
 
     try:
 
-        analysis = analyze_log_with_rules(to_send, rules)
-
-        print(f"[*] analysis result detection={analysis.get('detection')}")
+        analysis = analyze_log_with_rules(_sanitize(event), rules)
 
         rule_id = None
 
@@ -111,21 +168,65 @@ def process_one():
                 rule_id = d.get("rule_id") or d.get("rule_name")
                 break
 
-        print(f"[*] extracted rule_id={rule_id}")
-
         if analysis.get("detection") and not rule_id:
             raise Exception("detection true but no rule_id found")
 
+        return {
+            "kind": "analyzed",
+            "event_id": event_id,
+            "state_id": state_id,
+            "analysis": analysis,
+            "rule_id": rule_id,
+        }
+
+    except Exception as e:
+        return {"kind": "error", "event_id": event_id, "state_id": state_id, "error": str(e)}
+
+
+def persist_outcome(outcome: dict):
+
+    kind = outcome["kind"]
+
+    if kind == "orphan":
+        # Close the state so it is not claimed again once its lease expires
+        status = outcome["status"]
+        if status.get("event_id") is not None:
+            set_failed(status["event_id"], "event not found", state_id=status.get("_id"))
+        elif status.get("_id") is not None:
+            set_state_failed(status["_id"], "event state has no event_id")
+
+        _count(failed=1)
+        _maybe_log()
+        return {"status": False}
+
+    if kind == "invalid":
+        release_lease(outcome.get("state_id"))
+        _count(failed=1)
+        _maybe_log()
+        return {"status": False}
+
+    event_id = outcome["event_id"]
+    state_id = outcome.get("state_id")
+
+    try:
+
+        if kind == "error":
+            raise Exception(outcome["error"])
+
+        analysis = outcome["analysis"]
+        rule_id = outcome["rule_id"]
+
+        print(f"[*] analysis result detection={analysis.get('detection')}")
+        print(f"[*] extracted rule_id={rule_id}")
+
         apply_result(
             event_id,
             analysis,
             rule_id,
+            state_id=state_id,
         )
 
-        _metrics["processed"] += 1
-
-        if analysis.get("detection"):
-            _metrics["detected"] += 1
+        _count(processed=1, detected=1 if analysis.get("detection") else 0)
 
         _maybe_log()
 
@@ -133,13 +234,12 @@ def process_one():
 
     except Exception as e:
 
-        _metrics["processed"] += 1
-        _metrics["failed"] += 1
+        _count(processed=1, failed=1)
 
         print(f"[✗] detector processing failed: {e}")
 
-        set_failed(event_id, str(e))
+        set_failed(event_id, str(e), state_id=state_id)
 
         _maybe_log()
 
-        return {"status": False}
\ No newline at end of file
+        return {"status": False}
@@ -0,0 +1,272 @@
+import os
+import queue
+import threading
+import time
+
+from bson import ObjectId
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+
+DETECTOR_RESULT_BATCH_SIZE = int(os.environ.get("DETECTOR_RESULT_BATCH_SIZE", 500))
+DETECTOR_RESULT_FLUSH_INTERVAL = float(os.environ.get("DETECTOR_RESULT_FLUSH_INTERVAL", 0.5))
+DETECTOR_RESULT_QUEUE_SIZE = int(os.environ.get("DETECTOR_RESULT_QUEUE_SIZE", 10000))
+DETECTOR_RESULT_RETRY_DELAY = float(os.environ.get("DETECTOR_RESULT_RETRY_DELAY", 1.0))
+SHUTDOWN_FLUSH_ATTEMPTS = 3
+
+# Queued by stop() so a writer waiting out flush_interval wakes at once
+_WAKE = object()
+
+
+def _bulk_error(exc: Exception) -> BulkWriteError | None:
+    cause = exc if isinstance(exc, BulkWriteError) else exc.__cause__
+    return cause if isinstance(cause, BulkWriteError) else None
+
+
+def _failed_indexes(exc: Exception, *, ignore_duplicates: bool = False) -> set[int] | None:
+    """
+    Indexes of the operations an unordered bulk write rejected, or None when
+    the failure was not per-operation (connection, write concern) and the
+    whole batch has to be retried.
+    """
+    err = _bulk_error(exc)
+    if err is None:
+        return None
+
+    details = err.details or {}
+    if details.get("writeConcernErrors"):
+        return None
+
+    return {
+        e["index"]
+        for e in details.get("writeErrors", [])
+        if not (ignore_duplicates and e.get("code") == 11000)
+    }
+
+
+class ResultWriter:
+    """
+    Batches detector results into unordered bulk writes.
+
+    put() queues one event's writes: the event_state update, an optional
+    detection record and an optional orchestrator outbox record. A
+    background thread flushes batch_size results, or whatever is pending
+    every flush_interval seconds, as one bulk_write per collection.
+
+    Detection and outbox records carry their _id from put() so a batch
+    retried after a connection failure does not insert them twice; state
+    updates are $set and safe to repeat. put() blocks when the queue is
+    full, which slows the detector down instead of losing results. stop()
+    flushes everything queued before returning.
+
+    With a LeaseKeeper, the state passed to put() as release stays leased
+    until its batch is written.
+    """
+
+    def __init__(
+        self,
+        mongo,
+        status_collection: str,
+        detections_collection: str | None,
+        outbox_collection: str | None = None,
+        *,
+        batch_size: int = DETECTOR_RESULT_BATCH_SIZE,
+        flush_interval: float = DETECTOR_RESULT_FLUSH_INTERVAL,
+        max_queue: int = DETECTOR_RESULT_QUEUE_SIZE,
+        retry_delay: float = DETECTOR_RESULT_RETRY_DELAY,
+        leases=None,
+    ):
+        self.mongo = mongo
+        self.status_collection = status_collection
+        self.detections_collection = detections_collection
+        self.outbox_collection = outbox_collection
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.retry_delay = retry_delay
+        self.leases = leases
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        self._lock = threading.Lock()
+        self._metrics = {
+            "queued": 0,
+            "flushed": 0,
+            "batches": 0,
+            "write_errors": 0,
+            "flush_failures": 0,
+            "dropped": 0,
+            "last_flush_ms": 0.0,
+            "last_log": 0.0,
+        }
+
+    # ===========================
+    # Lifecycle
+    # ===========================
+
+    def start(self) -> "ResultWriter":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="detector-result-writer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float | None = 30.0):
+        """
+        Flush everything queued and wait for the writer thread.
+        """
+        self._stop.set()
+        try:
+            self._queue.put_nowait(_WAKE)
+        except queue.Full:
+            pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # ===========================
+    # Producer side
+    # ===========================
+
+    def put(self, state_filter: dict, state_fields: dict, *, upsert: bool = True, detection: dict | None = None, notification: dict | None = None, release=None):
+        if detection is not None and self.detections_collection:
+            detection.setdefault("_id", ObjectId())
+        else:
+            detection = None
+
+        if not self.outbox_collection:
+            notification = None
+
+        self._queue.put((UpdateOne(state_filter, {"$set": state_fields}, upsert=upsert), detection, notification, release))
+        self._count("queued")
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = {k: v for k, v in self._metrics.items() if k != "last_log"}
+        out["queue_depth"] = self._queue.qsize()
+        out["queue_capacity"] = self._queue.maxsize
+        return out
+
+    # ===========================
+    # Writer side
+    # ===========================
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self._metrics[key] += n
+
+    def _fill(self, pending: list, deadline: float):
+        while len(pending) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0 and not self._stop.is_set():
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+            if item is not _WAKE:
+                pending.append(item)
+
+    def _flush(self, batch: list) -> bool:
+        started = time.monotonic()
+        failed_states: set[int] = set()
+
+        try:
+            try:
+                self.mongo.bulk_write(self.status_collection, [item[0] for item in batch], ordered=False)
+            except Exception as e:
+                failed_states = _failed_indexes(e)
+                if failed_states is None:
+                    raise
+                print(f"[✗] Failed to update status for {len(failed_states)} of {len(batch)} events: {e}")
+
+            # As with single writes, an event whose state update failed gets
+            # no detection record and no notification
+            for collection, slot, what in (
+                (self.detections_collection, 1, "detection records"),
+                (self.outbox_collection, 2, "orchestrator notifications"),
+            ):
+                inserts = [
+                    InsertOne(item[slot])
+                    for i, item in enumerate(batch)
+                    if item[slot] is not None and i not in failed_states
+                ]
+                if not inserts:
+                    continue
+
+                try:
+                    self.mongo.bulk_write(collection, inserts, ordered=False)
+                except Exception as e:
+                    failed = _failed_indexes(e, ignore_duplicates=True)
+                    if failed is None:
+                        raise
+                    if failed:
+                        self._count("write_errors", len(failed))
+                        print(f"[✗] Failed to write {len(failed)} {what}: {e}")
+
+        except Exception as e:
+            self._count("flush_failures")
+            print(f"[✗] Detector result flush failed for {len(batch)} events: {e}")
+            return False
+
+        with self._lock:
+            self._metrics["flushed"] += len(batch)
+            self._metrics["batches"] += 1
+            self._metrics["write_errors"] += len(failed_states)
+            self._metrics["last_flush_ms"] = round((time.monotonic() - started) * 1000, 2)
+
+        return True
+
+    def _release(self, batch: list):
+        if self.leases is not None:
+            self.leases.discard([item[3] for item in batch if item[3] is not None])
+
+    def _run(self):
+        pending: list = []
+        shutdown_failures = 0
+
+        while True:
+            self._fill(pending, time.monotonic() + self.flush_interval)
+
+            if pending:
+                if self._flush(pending):
+                    self._release(pending)
+                    pending = []
+                elif self._stop.is_set():
+                    shutdown_failures += 1
+                    if shutdown_failures >= SHUTDOWN_FLUSH_ATTEMPTS:
+                        self._count("dropped", len(pending))
+                        print(f"[✗] Dropping {len(pending)} detector results at shutdown after failed flush")
+                        self._release(pending)
+                        pending = []
+                    else:
+                        time.sleep(self.retry_delay)
+                else:
+                    self._stop.wait(self.retry_delay)
+
+            self._maybe_log()
+
+            if self._stop.is_set() and not pending and self._queue.empty():
+                return
+
+    def _maybe_log(self, interval: float = 5.0):
+        now = time.monotonic()
+
+        with self._lock:
+            if now - self._metrics["last_log"] < interval:
+                return
+            self._metrics["last_log"] = now
+
+        s = self.stats()
+        print(
+            f"[*] detector result writer heartbeat "
+            f"queued={s['queued']} "
+            f"flushed={s['flushed']} "
+            f"batches={s['batches']} "
+            f"write_errors={s['write_errors']} "
+            f"flush_failures={s['flush_failures']} "
+            f"depth={s['queue_depth']}/{s['queue_capacity']} "
+            f"last_flush_ms={s['last_flush_ms']}"
+        )
@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+from typing import NamedTuple
+
+from app import analyzer
+from app.rules import get_rules_db, rules_collection
+
+
+DETECTOR_RULES_CHECK_INTERVAL = float(os.environ.get("DETECTOR_RULES_CHECK_INTERVAL", 1.0))
+DETECTOR_RULES_FULL_RELOAD = float(os.environ.get("DETECTOR_RULES_FULL_RELOAD", 300.0))
+
+
+class RulesSnapshot(NamedTuple):
+    generation: int
+    version: int | None
+    rules: list
+    loaded_at: float
+    compile_ms: float
+
+
+_EMPTY = RulesSnapshot(0, None, [], 0.0, 0.0)
+
+
+class RuleCache:
+    """
+    The detector's rules, reloaded only when they change.
+
+    current() is cheap to call per batch: at most every check_interval
+    seconds it reads the rules collection's change counter (bumped by the
+    ruleset service on every write) and reloads only when it moved. A full
+    reload still happens every full_reload_interval seconds to pick up
+    writes that bypassed the ruleset service.
+
+    A reload builds a complete snapshot (rules plus, in local match mode,
+    their CompiledRuleset) before swapping it in with one assignment, so
+    readers never see a half-loaded ruleset. A failed load keeps the
+    current snapshot. generation increases with every swap and is what
+    evaluation workers key their copy on.
+    """
+
+    def __init__(
+        self,
+        collection: str | None = None,
+        *,
+        check_interval: float = DETECTOR_RULES_CHECK_INTERVAL,
+        full_reload_interval: float = DETECTOR_RULES_FULL_RELOAD,
+        mongo=None,
+    ):
+        self.collection = collection or rules_collection()
+        self.check_interval = check_interval
+        self.full_reload_interval = full_reload_interval
+        self.mongo = mongo
+
+        self.snapshot = _EMPTY
+        self._loaded = False
+        self._last_check = 0.0
+        self._last_full = 0.0
+        self._refresh_lock = threading.Lock()
+
+        self._metrics = {
+            "reloads": 0,
+            "reload_failures": 0,
+        }
+
+    def current(self) -> RulesSnapshot:
+        t = time.monotonic()
+
+        if self._loaded and t - self._last_check < self.check_interval:
+            return self.snapshot
+
+        # One thread checks; the others keep using the current snapshot
+        if self._refresh_lock.acquire(blocking=not self._loaded):
+            try:
+                self.refresh()
+            finally:
+                self._refresh_lock.release()
+
+        return self.snapshot
+
+    def refresh(self, *, force: bool = False) -> bool:
+        """
+        Reload if the version moved (or a full reload is due); returns True
+        when a new snapshot was swapped in.
+        """
+        t = time.monotonic()
+        self._last_check = t
+
+        mongo = self.mongo or get_rules_db()
+
+        try:
+            # Read the counter before the rules so a write racing with the
+            # load is picked up again on the next check.
+            version = mongo.get_version(self.collection)
+
+            if not (force or not self._loaded or t - self._last_full >= self.full_reload_interval) \
+                    and version == self.snapshot.version:
+                return False
+
+            rules = mongo.find(self.collection, {})
+        except Exception as e:
+            self._metrics["reload_failures"] += 1
+            print(f"[✗] Failed to reload rules, keeping version={self.snapshot.version}: {e}")
+            return False
+
+        for rule in rules:
+            rule.pop("_id", None)
+
+        started = time.perf_counter()
+        if analyzer.DETECTOR_MATCH_MODE != "remote":
+            analyzer.compiled_ruleset(rules)
+        compile_ms = round((time.perf_counter() - started) * 1000, 2)
+
+        self.snapshot = RulesSnapshot(self.snapshot.generation + 1, version, rules, time.time(), compile_ms)
+        self._loaded = True
+        self._last_full = t
+        self._metrics["reloads"] += 1
+
+        print(f"[✓] rules loaded version={version} rules={len(rules)} compile_ms={compile_ms}")
+        return True
+
+    def stats(self) -> dict:
+        s = self.snapshot
+        return {
+            **self._metrics,
+            "rules_version": s.version,
+            "rules": len(s.rules),
+            "rules_compile_ms": s.compile_ms,
+            "rules_age_s": round(time.time() - s.loaded_at, 1) if s.loaded_at else None,
+        }
@@ -11,16 +11,5 @@ def get_rules_db() -> HerringboneMongoDatabase:
     )
 
 
-def load_rules() -> list[dict]:
-    rules_collection = os.environ.get("RULES_COLLECTION_NAME", "rules")
-    mongo = get_rules_db()
-
-    try:
-        items = mongo.find(rules_collection, {})
-    except Exception:
-        return []
-
-    for rule in items:
-        rule.pop("_id", None)
-
-    return items
+def rules_collection() -> str:
+    return os.environ.get("RULES_COLLECTION_NAME", "rules")
@@ -1,21 +1,16 @@
 import os
-import requests
 from datetime import datetime, timezone
 from modules.database.mongo_db import HerringboneMongoDatabase
 
+from app.fetcher import LEASE_FIELD
+from app.outbox import ORCHESTRATOR_URL, OUTBOX_COLLECTION, outbox_record
+from app.result_writer import ResultWriter
 
-ORCHESTRATOR_URL = os.environ.get("ORCHESTRATOR_URL", None)
-SERVICE_TOKEN_PATH = "/run/secrets/service_token"
 
-
-def service_auth_headers():
-    try:
-        with open(SERVICE_TOKEN_PATH, "r") as f:
-            token = f.read().strip()
-        return {"Authorization": f"Bearer {token}"}
-    except Exception as e:
-        print(f"[✗] Failed to read service token: {e}")
-        return {}
+# Set by start_result_writer(); without it every result is written directly
+_writer: ResultWriter | None = None
+# Lease keeper whose states are let go once their result is written
+_leases = None
 
 
 def _db() -> HerringboneMongoDatabase:
@@ -27,6 +22,53 @@ def _db() -> HerringboneMongoDatabase:
     )
 
 
+def start_result_writer(leases=None) -> ResultWriter:
+    """
+    Route apply_result/set_failed through a batched bulk writer. With a
+    LeaseKeeper, each state is released from it once its result is written.
+    """
+    global _writer, _leases
+
+    _leases = leases
+
+    if _writer is None:
+        _writer = ResultWriter(
+            _db(),
+            os.environ.get("EVENT_STATUS_COLLECTION_NAME", "event_state"),
+            os.environ.get("DETECTIONS_COLLECTION_NAME"),
+            OUTBOX_COLLECTION,
+            leases=leases,
+        ).start()
+
+    return _writer
+
+
+def stop_result_writer():
+    """
+    Flush pending results and go back to direct writes.
+    """
+    global _writer, _leases
+
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
+
+    _leases = None
+
+
+def release_lease(state_id):
+    """
+    Stop renewing a claimed state's lease; its result has been written (or
+    it will never be).
+    """
+    if _leases is not None and state_id is not None:
+        _leases.discard([state_id])
+
+
+def result_writer_depth() -> int | None:
+    return _writer.stats()["queue_depth"] if _writer is not None else None
+
+
 def _max_severity(analysis: dict):
     vals = [
         int(d["severity"])
@@ -36,25 +78,22 @@ def _max_severity(analysis: dict):
     return max(vals) if vals else None
 
 
-def notify_orchestrator(payload):
-    if not ORCHESTRATOR_URL:
-        print("[✗] ORCHESTRATOR_URL not set, skipping notification")
-        return
+def _failed_fields(reason: str) -> dict:
+    return {
+        "detected": True,
+        "detection": False,
+        "last_stage": "detector",
+        "last_updated": datetime.now(timezone.utc),
+        "error": reason,
+        LEASE_FIELD: None,
+    }
 
-    try:
-        resp = requests.post(ORCHESTRATOR_URL, 
-                             json=payload, 
-                             headers=service_auth_headers(), 
-                             timeout=2)
-        
-        resp.raise_for_status()
-        print("[✓] Detection forwarded to orchestrator")
-    except Exception as e:
-        print(f"[✗] Failed to notify orchestrator: {e}")
 
+def set_failed(event_id, reason: str, state_id=None):
+    if _writer is not None:
+        _writer.put({"event_id": event_id}, _failed_fields(reason), release=state_id)
+        return
 
-def set_failed(event_id, reason: str):
-    now = datetime.now(timezone.utc)
     mongo = _db()
 
     status_collection = os.environ.get("EVENT_STATUS_COLLECTION_NAME", "event_state")
@@ -63,24 +102,43 @@ def set_failed(event_id, reason: str):
         mongo.upsert_one(
             status_collection,
             {"event_id": event_id},
-            {
-                "detected": True,
-                "detection": False,
-                "last_stage": "detector",
-                "last_updated": now,
-                "error": reason,
-            },
+            _failed_fields(reason),
         )
     except Exception as e:
         print(f"[✗] Failed to mark event failed: {e}")
 
+    release_lease(state_id)
+
+
+def set_state_failed(state_id, reason: str):
+    """
+    Close an event_state that has no event_id to key on.
+    """
+    if _writer is not None:
+        _writer.put({"_id": state_id}, _failed_fields(reason), upsert=False, release=state_id)
+        return
+
+    mongo = _db()
 
-def apply_result(event_id, analysis: dict, rule_id: str):
+    status_collection = os.environ.get("EVENT_STATUS_COLLECTION_NAME", "event_state")
+
+    try:
+        mongo.update_one(
+            status_collection,
+            {"_id": state_id},
+            {"$set": _failed_fields(reason)},
+        )
+    except Exception as e:
+        print(f"[✗] Failed to mark event state failed: {e}")
+
+    release_lease(state_id)
+
+
+def apply_result(event_id, analysis: dict, rule_id: str, state_id=None):
     now = datetime.now(timezone.utc)
     severity = _max_severity(analysis)
     detected = bool(analysis.get("detection"))
 
-    mongo = _db()
     status_collection = os.environ.get("EVENT_STATUS_COLLECTION_NAME", "event_state")
 
     correlate_values = []
@@ -96,11 +154,49 @@ def apply_result(event_id, analysis: dict, rule_id: str):
         "last_stage": "detector",
         "correlate_on": correlate_values,
         "last_updated": now,
+        LEASE_FIELD: None,
     }
 
     if severity is not None:
         update_fields["severity"] = severity
 
+    detection_record = {
+        "event_id": event_id,
+        "detection": detected,
+        "severity": severity,
+        "analysis": analysis,
+        "inserted_at": now,
+    }
+
+    notification = None
+    if detected:
+        print("[*] Detection evaluated as TRUE")
+        if ORCHESTRATOR_URL:
+            # Delivered by the outbox sender once this write is durable
+            notification = outbox_record({
+                "detection_id": str(event_id),
+                "rule_id": rule_id,
+                "event_ids": [str(event_id)],
+                "severity": severity,
+                "correlate_on": correlate_values,
+                "priority": "high" if (severity or 0) >= 75 else "medium",
+                "timestamp": now.isoformat(),
+            })
+        else:
+            print("[✗] ORCHESTRATOR_URL not set, skipping notification")
+
+    if _writer is not None:
+        _writer.put(
+            {"event_id": event_id},
+            update_fields,
+            detection=detection_record,
+            notification=notification,
+            release=state_id,
+        )
+        return
+
+    mongo = _db()
+
     try:
         mongo.upsert_one(
             status_collection,
@@ -109,32 +205,23 @@ def apply_result(event_id, analysis: dict, rule_id: str):
         )
     except Exception as e:
         print(f"[✗] Failed to update status: {e}")
+        release_lease(state_id)
         return
 
-    if detected:
-        print("[*] Detection evaluated as TRUE")
-        notify_orchestrator({
-            "detection_id": str(event_id),
-            "rule_id": rule_id,
-            "event_ids": [str(event_id)],
-            "severity": severity,
-            "correlate_on": correlate_values,
-            "priority": "high" if (severity or 0) >= 75 else "medium",
-            "timestamp": now.isoformat(),
-        })
+    release_lease(state_id)
+
+    if notification is not None:
+        try:
+            mongo.insert_one(OUTBOX_COLLECTION, notification)
+        except Exception as e:
+            print(f"[✗] Failed to queue orchestrator notification: {e}")
 
     det_collection = os.environ.get("DETECTIONS_COLLECTION_NAME")
     if det_collection:
         try:
             mongo.insert_one(
                 det_collection,
-                {
-                    "event_id": event_id,
-                    "detection": detected,
-                    "severity": severity,
-                    "analysis": analysis,
-                    "inserted_at": now,
-                },
+                detection_record,
                 clean_codec=False,
             )
             print("[✓] Detection written to detections collection")
@@ -8,4 +8,5 @@ sys.path.insert(0, str(APP_DIR))
 @pytest.fixture(autouse=True)
 def detector_env(monkeypatch):
     monkeypatch.setenv("MATCHER_API", "http://matcher.local/find_match")
+    monkeypatch.setenv("DETECTOR_MATCH_MODE", "remote")
     monkeypatch.setenv("ORCHESTRATOR_URL", "http://orchestrator.local")
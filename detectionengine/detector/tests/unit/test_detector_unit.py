@@ -18,3 +18,54 @@ def test_analyze_log_with_rules_no_match(requests_mock):
     out = analyze_log_with_rules({"raw": "hello world"}, rules)
     assert out["detection"] is False
     assert isinstance(out["details"], list)
+
+
+def test_analyze_log_with_rules_local_mode(monkeypatch, requests_mock):
+    import analyzer
+
+    monkeypatch.setattr(analyzer, "DETECTOR_MATCH_MODE", "local")
+
+    rules = [
+        {"name": "hit", "severity": 40, "rule": {"regex": "fail(ed|ure)", "key": "msg"}},
+        {"name": "miss", "severity": 90, "rule": {"regex": "root", "key": "msg"}},
+    ]
+
+    out = analyzer.analyze_log_with_rules({"msg": "login failed"}, rules)
+
+    assert out["detection"] is True
+    assert [d["rule_name"] for d in out["details"]] == ["hit"]
+    assert not requests_mock.called
+
+
+def test_local_mode_fails_event_on_matcher_error(monkeypatch):
+    import pytest
+    import analyzer
+
+    monkeypatch.setattr(analyzer, "DETECTOR_MATCH_MODE", "local")
+
+    with pytest.raises(RuntimeError, match="Matcher error"):
+        analyzer.analyze_log_with_rules({"raw": "x"}, [{"name": "bad", "rule": {"key": "raw"}}])
+
+
+def test_remote_ruleset_mode_sends_rules_once(monkeypatch, requests_mock):
+    import analyzer
+
+    monkeypatch.setattr(analyzer, "MATCHER_RULESET_URL", "http://matcher.local/find_matches")
+    monkeypatch.setattr(analyzer, "_remote_ruleset", (None, None))
+
+    calls = requests_mock.post(
+        "http://matcher.local/find_matches",
+        json={"ruleset_id": "abc", "matched": ["1"], "matched_index": [1], "errors": []},
+    )
+
+    rules = [
+        {"name": "r0", "rule": {"regex": "x", "key": "raw"}},
+        {"name": "r1", "severity": 20, "rule": {"regex": "y", "key": "raw"}},
+    ]
+
+    first = analyzer.analyze_log_with_rules({"raw": "y"}, rules)
+    analyzer.analyze_log_with_rules({"raw": "y"}, rules)
+
+    assert [d["rule_name"] for d in first["details"]] == ["r1"]
+    assert "rules" in calls.request_history[0].json()
+    assert calls.request_history[1].json() == {"log_data": {"raw": "y"}, "ruleset_id": "abc"}
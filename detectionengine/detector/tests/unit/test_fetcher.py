@@ -0,0 +1,62 @@
+class FakeMongo:
+    def __init__(self, states, events):
+        self.states = states
+        self.events = {e["_id"]: e for e in events}
+        self.claims = []
+        self.finds = []
+
+    def claim_batch(self, collection, filter_query, *, owner, lease_field, lease_seconds, limit, sort=None):
+        self.claims.append({"collection": collection, "filter": filter_query, "limit": limit, "sort": sort})
+        ordered = sorted(self.states, key=lambda s: s["_id"], reverse=bool(sort and sort[0][1] == -1))
+        return ordered[:limit]
+
+    def find(self, collection, filter_query, **kwargs):
+        self.finds.append((collection, filter_query))
+        return [self.events[i] for i in filter_query["_id"]["$in"] if i in self.events]
+
+
+def test_claim_joins_events_in_one_query():
+    from app import fetcher
+
+    mongo = FakeMongo(
+        states=[
+            {"_id": 2, "event_id": "e2"},
+            {"_id": 1, "event_id": "e1"},
+            {"_id": 3, "event_id": "gone"},
+            {"_id": 4},
+        ],
+        events=[{"_id": "e1", "raw": "a"}, {"_id": "e2", "raw": "b"}],
+    )
+
+    docs = fetcher.claim_undetected(mongo, limit=10)
+
+    assert mongo.claims[0]["filter"] == {"parsed": True, "detected": False}
+    assert mongo.claims[0]["sort"] == [("_id", 1)]
+    assert len(mongo.finds) == 1
+    assert [d["event"] and d["event"]["_id"] for d in docs] == ["e1", "e2", None, None]
+
+
+def test_claim_newest_first(monkeypatch):
+    from app import fetcher
+
+    monkeypatch.setattr(fetcher, "DETECTOR_ORDER", "newest")
+    mongo = FakeMongo(states=[{"_id": 1, "event_id": "e1"}, {"_id": 2, "event_id": "e2"}], events=[])
+
+    fetcher.claim_undetected(mongo, limit=1)
+
+    assert mongo.claims[0]["sort"] == [("_id", -1)]
+
+
+def test_missing_event_closes_state(monkeypatch):
+    from app import processor
+
+    failed = []
+    monkeypatch.setattr(processor, "set_failed", lambda event_id, reason, state_id=None: failed.append(("event", event_id)))
+    monkeypatch.setattr(processor, "set_state_failed", lambda state_id, reason: failed.append(("state", state_id)))
+
+    processor.process_batch([
+        {"event": None, "status": {"_id": 3, "event_id": "gone"}},
+        {"event": None, "status": {"_id": 4}},
+    ])
+
+    assert failed == [("event", "gone"), ("state", 4)]
@@ -0,0 +1,110 @@
+class Resp:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.body = body or {}
+        self.text = str(self.body)
+
+    def json(self):
+        return self.body
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.posts = []
+
+    def post(self, url, json, headers, timeout):
+        self.posts.append((url, json))
+        resp = self.responses.pop(0)
+        if isinstance(resp, Exception):
+            raise resp
+        return resp
+
+    def close(self):
+        pass
+
+
+class FakeMongo:
+    def __init__(self, docs):
+        self.docs = docs
+        self.writes = []
+
+    def claim_batch(self, collection, filter_query, *, owner, lease_field, lease_seconds, limit, sort=None):
+        return self.docs[:limit]
+
+    def bulk_write(self, collection, operations, *, ordered=False):
+        self.writes.extend(operations)
+
+
+def _sender(docs, responses, **kwargs):
+    from app.outbox import OrchestratorSender, outbox_record
+
+    docs = [outbox_record(p) for p in docs]
+    mongo = FakeMongo(docs)
+    sender = OrchestratorSender(
+        mongo,
+        url="http://orchestrator.local/incidents/orchestrator/process_detection",
+        batch_url="http://orchestrator.local/incidents/orchestrator/process_detections",
+        **kwargs,
+    )
+    sender.session = FakeSession(responses)
+    sender._auth_headers = {}
+    return sender, mongo, docs
+
+
+def test_batch_delivery_deletes_sent_and_schedules_retries():
+    from pymongo import DeleteOne, UpdateOne
+
+    sender, mongo, docs = _sender(
+        [{"rule_id": "a"}, {"rule_id": "b"}, {}],
+        [Resp(200, {"results": [
+            {"status_code": 200, "result": "created"},
+            {"status_code": 502, "error": "correlator down"},
+            {"status_code": 400, "error": "Missing rule_id"},
+        ]})],
+    )
+
+    assert sender.send_due() == 3
+
+    assert len(sender.session.posts) == 1
+    assert sender.session.posts[0][1] == {"detections": [d["payload"] for d in docs]}
+
+    sent, retry, dead = mongo.writes
+    assert isinstance(sent, DeleteOne)
+    assert isinstance(retry, UpdateOne) and "next_attempt_at" in retry._doc["$set"]
+    assert retry._doc["$set"]["attempts"] == 1
+    assert dead._doc["$set"]["state"] == "dead"
+    stats = sender.stats()
+    assert (stats["sent"], stats["retries"], stats["dead"], stats["batches"]) == (1, 1, 1, 1)
+
+
+def test_connection_error_retries_whole_batch():
+    sender, mongo, _ = _sender([{"rule_id": "a"}, {"rule_id": "b"}], [ConnectionError("refused")])
+
+    sender.send_due()
+
+    assert [op._doc["$set"]["last_error"] for op in mongo.writes] == ["refused", "refused"]
+    assert all("next_attempt_at" in op._doc["$set"] for op in mongo.writes)
+
+
+def test_falls_back_to_single_posts_without_batch_endpoint():
+    from pymongo import DeleteOne
+
+    sender, mongo, _ = _sender([{"rule_id": "a"}, {"rule_id": "b"}], [Resp(404), Resp(200), Resp(200)])
+
+    sender.send_due()
+
+    assert [url.rsplit("/", 1)[1] for url, _ in sender.session.posts] == [
+        "process_detections", "process_detection", "process_detection",
+    ]
+    assert sender.batch_url is None
+    assert all(isinstance(op, DeleteOne) for op in mongo.writes)
+
+
+def test_gives_up_after_max_attempts():
+    sender, mongo, docs = _sender([{"rule_id": "a"}], [Resp(503)], max_attempts=3)
+    docs[0]["attempts"] = 2
+
+    sender.send_due()
+
+    assert mongo.writes[0]._doc["$set"]["state"] == "dead"
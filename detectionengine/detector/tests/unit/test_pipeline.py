@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import deque
+
+
+class FakeClaims:
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.lock = threading.Lock()
+
+    def __call__(self, mongo):
+        with self.lock:
+            return self.batches.pop(0) if self.batches else []
+
+
+def _docs(start, n):
+    return [{"event": {"_id": f"e{i}", "raw": f"line {i}"}, "status": {"_id": i}} for i in range(start, start + n)]
+
+
+def _run(monkeypatch, batches, **kwargs):
+    from app import pipeline
+
+    persisted = []
+    lock = threading.Lock()
+
+    def persist(outcome):
+        with lock:
+            persisted.append(outcome)
+        return {"status": True}
+
+    monkeypatch.setattr(pipeline, "claim_undetected", FakeClaims(batches))
+    monkeypatch.setattr(pipeline, "persist_outcome", persist)
+    monkeypatch.setattr(pipeline, "get_rules_with_version", lambda: (1, []))
+
+    total = sum(len(b) for b in batches)
+    p = pipeline.DetectorPipeline(None, lambda mongo: time.sleep(0.01), **kwargs)
+    p.start()
+
+    deadline = time.time() + 30
+    while len(persisted) < total and time.time() < deadline:
+        time.sleep(0.01)
+
+    p.stop(timeout=10)
+    return p, persisted
+
+
+def test_pipeline_inline_evaluation_persists_every_claimed_event(monkeypatch):
+    p, persisted = _run(monkeypatch, [_docs(0, 3), _docs(3, 2), _docs(5, 4)], eval_workers=0, write_workers=3)
+
+    assert sorted(o["event_id"] for o in persisted) == sorted(f"e{i}" for i in range(9))
+    assert all(o["kind"] == "analyzed" for o in persisted)
+    assert not any(t.is_alive() for t in p._threads)
+
+
+def test_pipeline_process_pool_evaluation(monkeypatch):
+    p, persisted = _run(monkeypatch, [_docs(0, 5), _docs(5, 5)], eval_workers=1, write_workers=2)
+
+    assert sorted(o["event_id"] for o in persisted) == sorted(f"e{i}" for i in range(10))
+    assert p._pool is None
+
+
+def test_pipeline_orphans_reach_the_writer(monkeypatch):
+    batch = [{"event": None, "status": {"_id": 7, "event_id": "gone"}}]
+
+    _, persisted = _run(monkeypatch, [batch], eval_workers=0, write_workers=1)
+
+    assert persisted == [{"kind": "orphan", "status": {"_id": 7, "event_id": "gone"}}]
+
+
+def test_stage_stats_in_heartbeat(monkeypatch, capsys):
+    from app import pipeline, processor
+
+    p = pipeline.DetectorPipeline(None, lambda mongo: None, eval_workers=0, write_workers=1, queue_size=2)
+    p.eval_queue.put(_docs(0, 1))
+    monkeypatch.setitem(processor._metrics, "last_log", 0.0)
+
+    processor.register_stage_stats(p.stats)
+    try:
+        processor._maybe_log()
+    finally:
+        processor.register_stage_stats(None)
+
+    out = capsys.readouterr().out
+    assert "eval_queue=1" in out
+    assert "write_queue=0" in out
+
+
+def test_claimed_states_stay_leased_until_persisted(monkeypatch):
+    from modules.database.leases import LeaseKeeper
+
+    leases = LeaseKeeper(None, "event_state", owner="me", lease_field="detect_lease", lease_seconds=60)
+
+    # persist_outcome is faked here, so nothing releases the states
+    p, persisted = _run(monkeypatch, [_docs(0, 3), _docs(3, 2)], eval_workers=0, write_workers=1, leases=leases)
+
+    assert len(persisted) == 5
+    assert leases.held() == 5
+
+
+def test_workers_get_rules_only_when_the_version_changes():
+    from app import pipeline
+
+    docs = _docs(0, 1)
+    saved = pipeline._worker_rules
+    try:
+        pipeline._worker_rules = (None, None)
+
+        assert pipeline._evaluate_batch(1, None, docs) is None
+        assert [o["kind"] for o in pipeline._evaluate_batch(1, [], docs)] == ["analyzed"]
+        assert [o["kind"] for o in pipeline._evaluate_batch(1, None, docs)] == ["analyzed"]
+        assert pipeline._evaluate_batch(2, None, docs) is None
+    finally:
+        pipeline._worker_rules = saved
+
+
+def test_only_the_first_batches_after_a_change_carry_rules(monkeypatch):
+    from app import pipeline
+
+    sent = []
+
+    class RecordingPool:
+        def submit(self, fn, version, rules, docs):
+            sent.append(rules is not None)
+            raise RuntimeError("stop here")
+
+    p = pipeline.DetectorPipeline(None, lambda mongo: None, eval_workers=2, write_workers=1, queue_size=10)
+    p._pool = RecordingPool()
+    monkeypatch.setattr(p, "_restart_pool", lambda broken: None)
+    monkeypatch.setattr(pipeline, "evaluate_doc", lambda doc, rules: {})
+
+    version = [1]
+    monkeypatch.setattr(pipeline, "get_rules_with_version", lambda: (version[0], []))
+
+    for _ in range(4):
+        p._submit(deque(), _docs(0, 1))
+    version[0] = 2
+    for _ in range(3):
+        p._submit(deque(), _docs(0, 1))
+
+    assert sent == [True, True, False, False, True, True, False]
@@ -0,0 +1,126 @@
+from pymongo.errors import BulkWriteError
+
+
+class FakeMongo:
+    def __init__(self):
+        self.writes = []
+        self.fail = []
+
+    def bulk_write(self, collection, operations, *, ordered=False):
+        operations = list(operations)
+        assert ordered is False
+
+        if self.fail:
+            raise self.fail.pop(0)
+
+        self.writes.append((collection, operations))
+
+
+def _writer(mongo, **kwargs):
+    from app.result_writer import ResultWriter
+
+    kwargs.setdefault("flush_interval", 0.01)
+    kwargs.setdefault("retry_delay", 0.01)
+    return ResultWriter(mongo, "event_state", "detections", "detection_outbox", **kwargs)
+
+
+def test_results_flush_as_one_bulk_write_per_collection():
+    mongo = FakeMongo()
+    writer = _writer(mongo, batch_size=10, flush_interval=5.0)
+
+    for i in range(10):
+        writer.put({"event_id": i}, {"detected": True}, detection={"event_id": i})
+
+    writer.start()
+    writer.stop()
+
+    assert [(c, len(ops)) for c, ops in mongo.writes] == [("event_state", 10), ("detections", 10)]
+    assert writer.stats()["batches"] == 1
+    assert writer.stats()["flushed"] == 10
+
+
+def test_stop_flushes_pending_results():
+    mongo = FakeMongo()
+    writer = _writer(mongo, batch_size=1000, flush_interval=60.0).start()
+
+    writer.put({"event_id": 1}, {"detected": True})
+    writer.stop()
+
+    assert [c for c, _ in mongo.writes] == ["event_state"]
+
+
+def test_connection_failure_retries_batch_with_same_detection_ids():
+    mongo = FakeMongo()
+    mongo.fail.append(RuntimeError("MongoDB operation failed: down"))
+    writer = _writer(mongo).start()
+
+    detection = {"event_id": 1}
+    writer.put({"event_id": 1}, {"detected": True}, detection=detection)
+    writer.stop()
+
+    assert writer.stats()["flush_failures"] == 1
+    assert [c for c, _ in mongo.writes] == ["event_state", "detections"]
+    assert mongo.writes[1][1][0]._doc["_id"] == detection["_id"]
+
+
+def test_failed_state_update_skips_detection_and_notification():
+    mongo = FakeMongo()
+    err = BulkWriteError({"writeErrors": [{"index": 0, "code": 121, "errmsg": "invalid"}]})
+    mongo.fail.append(RuntimeError("MongoDB operation failed"))
+    mongo.fail[0].__cause__ = err
+    writer = _writer(mongo, batch_size=2, flush_interval=5.0)
+
+    for i in (1, 2):
+        writer.put({"event_id": i}, {"detected": True}, detection={"event_id": i}, notification={"_id": i, "payload": {}})
+    writer.start()
+    writer.stop()
+
+    assert [(c, [op._doc.get("event_id", op._doc["_id"]) for op in ops]) for c, ops in mongo.writes] == [
+        ("detections", [2]),
+        ("detection_outbox", [2]),
+    ]
+    assert writer.stats()["write_errors"] == 1
+
+
+def test_updater_routes_through_started_writer(monkeypatch):
+    from app import updater
+
+    mongo = FakeMongo()
+    writer = _writer(mongo, batch_size=100, flush_interval=60.0)
+    monkeypatch.setattr(updater, "_writer", writer)
+    monkeypatch.setattr(updater, "ORCHESTRATOR_URL", "http://orchestrator.local")
+
+    updater.apply_result("e1", {"detection": True, "details": [{"matched": True, "severity": 80}]}, "r1")
+    updater.set_failed("e2", "boom")
+    updater.set_state_failed(7, "no event_id")
+
+    assert writer.stats()["queue_depth"] == 3
+
+    writer.start()
+    writer.stop()
+
+    states = mongo.writes[0][1]
+    assert [op._filter for op in states] == [{"event_id": "e1"}, {"event_id": "e2"}, {"_id": 7}]
+    assert [op._upsert for op in states] == [True, True, False]
+    assert states[0]._doc["$set"]["severity"] == 80
+
+    outbox = dict(mongo.writes)["detection_outbox"]
+    assert [op._doc["payload"]["rule_id"] for op in outbox] == ["r1"]
+    assert outbox[0]._doc["payload"]["priority"] == "high"
+
+
+def test_states_are_released_once_written():
+    from modules.database.leases import LeaseKeeper
+
+    mongo = FakeMongo()
+    leases = LeaseKeeper(mongo, "event_state", owner="me", lease_field="detect_lease", lease_seconds=60)
+    leases.add([1, 2])
+
+    mongo.fail = [RuntimeError("connection reset")]
+    writer = _writer(mongo, leases=leases).start()
+    writer.put({"event_id": "a"}, {"detected": True}, release=1)
+    writer.stop()
+
+    # 2 was never handed to the writer, 1 was written after a retry
+    assert leases.held() == 1
+    assert len(mongo.writes) == 1
@@ -0,0 +1,77 @@
+class FakeMongo:
+    def __init__(self, rules, version=1):
+        self.rules = rules
+        self.version = version
+        self.finds = 0
+        self.down = False
+
+    def get_version(self, name):
+        if self.down:
+            raise RuntimeError("MongoDB operation failed: down")
+        return self.version
+
+    def find(self, collection, query):
+        self.finds += 1
+        return [dict(r, _id=i) for i, r in enumerate(self.rules)]
+
+
+def _cache(mongo, **kwargs):
+    from app.rule_cache import RuleCache
+
+    kwargs.setdefault("check_interval", 0)
+    kwargs.setdefault("full_reload_interval", 3600)
+    return RuleCache("rules", mongo=mongo, **kwargs)
+
+
+def test_reloads_only_when_version_moves():
+    mongo = FakeMongo([{"name": "a", "rule": {"key": "raw", "regex": "x"}}])
+    cache = _cache(mongo)
+
+    first = cache.current()
+    assert cache.current() is first
+    assert mongo.finds == 1
+    assert first.rules == [{"name": "a", "rule": {"key": "raw", "regex": "x"}}]
+
+    mongo.rules.append({"name": "b", "rule": {"key": "raw", "regex": "y"}})
+    mongo.version = 2
+
+    second = cache.current()
+    assert mongo.finds == 2
+    assert (second.generation, second.version, len(second.rules)) == (first.generation + 1, 2, 2)
+
+
+def test_check_interval_limits_version_reads():
+    mongo = FakeMongo([])
+    cache = _cache(mongo, check_interval=60)
+
+    cache.current()
+    mongo.version = 2
+
+    assert cache.current().version == 1
+
+
+def test_failed_reload_keeps_current_rules():
+    mongo = FakeMongo([{"name": "a", "rule": {"key": "raw", "regex": "x"}}])
+    cache = _cache(mongo)
+    snapshot = cache.current()
+
+    mongo.down = True
+
+    assert cache.current() is snapshot
+    assert cache.stats()["reload_failures"] == 1
+
+
+def test_local_mode_compiles_on_swap(monkeypatch):
+    from app import analyzer
+
+    monkeypatch.setattr(analyzer, "DETECTOR_MATCH_MODE", "local")
+    mongo = FakeMongo([{"name": "a", "rule": {"key": "raw", "regex": "x"}}])
+    cache = _cache(mongo)
+
+    rules = cache.current().rules
+
+    assert analyzer._local_ruleset[0] is rules
+    stats = cache.stats()
+    assert stats["rules_version"] == 1
+    assert stats["rules"] == 1
+    assert stats["rules_compile_ms"] >= 0
@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field, ConfigDict
-from typing import Dict, Any
+from pydantic import BaseModel, Field, ConfigDict, model_validator
+from typing import Dict, Any, List, Optional
+import os
 
 from app.matchengine import MatchEngine
+from app.rulesets import RulesetCache, rule_id
 
 from modules.auth.auth import require_scopes
 from modules.audit.logger import AuditLogger
+from modules.matching.regex_guard import regex_guard
 
 
 run_matchengine = require_scopes("detectionengine:run")
@@ -17,8 +20,11 @@ router = APIRouter(
 )
 
 matchengine = MatchEngine()
+rulesets = RulesetCache()
 audit = AuditLogger()
 
+MAX_BATCH_LOGS = int(os.environ.get("MATCHER_MAX_BATCH_LOGS", 1000))
+
 
 class RuleMatchRequest(BaseModel):
     """
@@ -41,8 +47,11 @@ class RuleMatchResponse(BaseModel):
     log_data: Dict[str, Any]
 
 
+# Handlers are plain defs: regex searches block on the sandbox and rule
+# evaluation is CPU-bound, so FastAPI runs them on its threadpool.
+
 @router.post("/find_match", response_model=RuleMatchResponse)
-async def find_match(
+def find_match(
     payload: RuleMatchRequest,
     request: Request,
     identity=Depends(run_matchengine),
@@ -91,6 +100,132 @@ async def find_match(
         raise
 
 
+class _RulesetSource(BaseModel):
+    """
+    A ruleset given inline, or by the ruleset_id an earlier response
+    returned. Each entry is a stored rule document ({"name", "rule", ...})
+    or a bare rule ({"key", "regex"}).
+    """
+    rules: Optional[List[Dict[str, Any]]] = Field(default=None, description="Rules to evaluate")
+    ruleset_id: Optional[str] = Field(default=None, description="Id of a ruleset sent earlier")
+
+    @model_validator(mode="after")
+    def _one_source(self):
+        if self.rules is None and not self.ruleset_id:
+            raise ValueError("Provide either 'rules' or 'ruleset_id'")
+        return self
+
+
+class RulesetMatchRequest(_RulesetSource):
+    log_data: Dict[str, Any] = Field(..., description="Log JSON to evaluate")
+
+
+class RulesetBatchMatchRequest(_RulesetSource):
+    logs: List[Dict[str, Any]] = Field(..., description="Logs to evaluate")
+
+
+def _resolve_ruleset(payload: _RulesetSource):
+    if payload.rules is not None:
+        return rulesets.put(payload.rules)
+
+    entry = rulesets.get(payload.ruleset_id)
+    if entry is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Unknown ruleset_id; send the rules again",
+        )
+    return payload.ruleset_id, entry
+
+
+def _evaluate_ruleset(rules: List[Dict[str, Any]], compiled, log_data: Dict[str, Any]) -> dict:
+    matched, failed = compiled.evaluate(log_data)
+
+    errors = [
+        {
+            "rule_id": rule_id(rules[index], index),
+            "index": index,
+            "details": result["details"],
+        }
+        for index, result in failed
+    ]
+
+    return {
+        "matched": [rule_id(rules[i], i) for i in matched],
+        "matched_index": matched,
+        "errors": errors,
+    }
+
+
+@router.post("/find_matches")
+def find_matches(
+    payload: RulesetMatchRequest,
+    request: Request,
+    identity=Depends(run_matchengine),
+):
+    """
+    Evaluates a whole ruleset against one log and returns the ids of the
+    rules that matched.
+    """
+    ruleset_id, (rules, compiled) = _resolve_ruleset(payload)
+    result = _evaluate_ruleset(rules, compiled, payload.log_data)
+
+    audit.log(
+        event="matcher_ruleset_evaluated",
+        identity=identity,
+        request=request,
+        metadata={
+            "ruleset_id": ruleset_id,
+            "rules": len(rules),
+            "matched": len(result["matched"]),
+            "errors": len(result["errors"]),
+        },
+    )
+
+    return {"ruleset_id": ruleset_id, **result}
+
+
+@router.post("/find_matches_batch")
+def find_matches_batch(
+    payload: RulesetBatchMatchRequest,
+    request: Request,
+    identity=Depends(run_matchengine),
+):
+    """
+    Evaluates a whole ruleset against each log in the batch; results are
+    in input order.
+    """
+    if len(payload.logs) > MAX_BATCH_LOGS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch exceeds {MAX_BATCH_LOGS} logs",
+        )
+
+    ruleset_id, (rules, compiled) = _resolve_ruleset(payload)
+    results = [_evaluate_ruleset(rules, compiled, log_data) for log_data in payload.logs]
+
+    audit.log(
+        event="matcher_ruleset_batch_evaluated",
+        identity=identity,
+        request=request,
+        metadata={
+            "ruleset_id": ruleset_id,
+            "rules": len(rules),
+            "logs": len(payload.logs),
+            "matched": sum(len(r["matched"]) for r in results),
+        },
+    )
+
+    return {"ruleset_id": ruleset_id, "results": results}
+
+
+@router.get("/stats")
+async def stats(identity=Depends(run_matchengine)):
+    """
+    Per-pattern regex latency, slowest first.
+    """
+    return {"regex": regex_guard.stats()}
+
+
 @router.get("/livez")
 async def livez():
     """
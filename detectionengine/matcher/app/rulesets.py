@@ -0,0 +1,74 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+from modules.matching.matchengine import CompiledRuleset
+
+
+RULESET_CACHE_SIZE = int(os.environ.get("MATCHER_RULESET_CACHE_SIZE", 16))
+
+
+def ruleset_key(rules: List[Dict[str, Any]]) -> str:
+    """
+    Content hash of a ruleset; clients send it back instead of the rules.
+    """
+    blob = json.dumps(rules, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def rule_id(rule: Dict[str, Any], index: int) -> str:
+    """
+    A rule's _id or id, else its name, else its position in the ruleset.
+    """
+    for field in ("_id", "id", "name"):
+        value = rule.get(field)
+        if value is not None:
+            return str(value)
+    return str(index)
+
+
+Entry = Tuple[List[Dict[str, Any]], CompiledRuleset]
+
+
+class RulesetCache:
+    """
+    Thread-safe LRU of compiled rulesets keyed by ruleset_key().
+    """
+
+    def __init__(self, maxsize: int = RULESET_CACHE_SIZE):
+        self.maxsize = max(1, maxsize)
+        self._entries: "OrderedDict[str, Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, rules: List[Dict[str, Any]]) -> Tuple[str, Entry]:
+        key = ruleset_key(rules)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return key, entry
+
+        # Each entry is a stored rule document or a bare rule
+        entry = (rules, CompiledRuleset(r.get("rule", r) for r in rules))
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+        return key, entry
+
+    def get(self, key: str) -> Entry | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def __len__(self) -> int:
+        return len(self._entries)
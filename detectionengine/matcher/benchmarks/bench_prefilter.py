@@ -0,0 +1,110 @@
+"""
+Events/sec for a 1k-rule synthetic ruleset: one regex search per rule vs
+the compiled ruleset with and without the literal prefilter.
+
+    cd detectionengine/matcher
+    PYTHONPATH=.:../../modules python benchmarks/bench_prefilter.py [--rules N] [--events N] [--rounds N]
+"""
+import argparse
+import random
+import time
+
+from modules.matching.matchengine import CompiledRuleset, MatchEngine
+
+
+KEYS = ["raw", "raw", "raw", "process.command_line", "user.name", "http.url"]
+
+TOOLS = ["mimikatz", "procdump", "psexec", "certutil", "bitsadmin", "rundll32", "regsvr32", "mshta", "wmic", "vssadmin"]
+USERS = ["alice", "bob", "carol", "svc-backup", "administrator", "root"]
+
+
+def rule(rng: random.Random, n: int) -> dict:
+    tool = rng.choice(TOOLS)
+    kind = n % 10
+
+    if kind < 4:
+        regex = rf"{tool}(\.exe)?\s+.*ioc{n}\b"
+    elif kind < 6:
+        regex = rf"(?i)suspicious_{tool}_{n}"
+    elif kind < 8:
+        regex = rf"(GET|POST) /api/v1/item{n}/(delete|export)"
+    elif kind < 9:
+        regex = rf"failed password for (invalid user )?{rng.choice(USERS)}{n}"
+    else:
+        # Nothing literal to filter on; always evaluated
+        regex = rf"\b\d{{1,3}}(\.\d{{1,3}}){{3}}:\d{{{n % 3 + 3}}}\b"
+
+    return {"key": rng.choice(KEYS), "regex": regex}
+
+
+def event(rng: random.Random, n_rules: int) -> dict:
+    n = rng.randrange(n_rules)
+    tool = rng.choice(TOOLS)
+    user = rng.choice(USERS)
+
+    raw = (
+        f"2024-05-01T12:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}Z host-{rng.randint(1, 40)} "
+        f"sshd[{rng.randint(1000, 9999)}]: Accepted publickey for {user} from "
+        f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(0, 255)} port {rng.randint(1024, 65535)} ssh2"
+    )
+
+    if rng.random() < 0.05:
+        raw += f" {tool}.exe -a ioc{n}"
+
+    return {
+        "raw": raw,
+        "process": {"command_line": f"C:\\Windows\\System32\\{tool}.exe /c whoami"},
+        "user": {"name": user},
+        "http": {"url": f"GET /api/v1/item{rng.randint(0, 5000)}/view"},
+    }
+
+
+def run(evaluate, events: list, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for e in events:
+            evaluate(e)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rules", type=int, default=1000)
+    ap.add_argument("--events", type=int, default=300)
+    ap.add_argument("--rounds", type=int, default=3)
+    args = ap.parse_args()
+
+    rng = random.Random(7)
+    rules = [rule(rng, n) for n in range(args.rules)]
+    events = [event(rng, args.rules) for _ in range(args.events)]
+
+    engine = MatchEngine()
+    plain = CompiledRuleset(rules, prefilter=False)
+
+    started = time.perf_counter()
+    filtered = CompiledRuleset(rules, prefilter=True)
+    t_compile = time.perf_counter() - started
+
+    def per_rule(e):
+        return [i for i, r in enumerate(rules) if engine.match(r, e)["is_matched"]]
+
+    for e in events:
+        expected = per_rule(e)
+        assert plain.evaluate(e)[0] == expected
+        assert filtered.evaluate(e)[0] == expected
+
+    filtered_rules = sum(len(g.rules) - len(g.always) for g in filtered._groups.values())
+
+    t_rule = run(per_rule, events, args.rounds)
+    t_plain = run(plain.evaluate, events, args.rounds)
+    t_filtered = run(filtered.evaluate, events, args.rounds)
+
+    print(f"{len(rules)} rules ({filtered_rules} with a literal prefilter), {len(events)} events, compile={t_compile * 1e3:.0f}ms")
+    for name, t in (("per-rule match", t_rule), ("compiled", t_plain), ("compiled+prefilter", t_filtered)):
+        print(f"  {name:<20} {len(events) / t:10.0f} events/s  speedup={t_rule / t:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Events/sec for a small ruleset under each regex guard mode: "inline",
+"auto" (the default; only flagged or slow patterns are sandboxed) and
+"sandbox" (every search sent to a sandbox process).
+
+    cd detectionengine/matcher
+    PYTHONPATH=.:../../modules python benchmarks/bench_regex_guard.py [--rules N] [--events N] [--rounds N]
+"""
+import argparse
+import random
+import time
+
+from modules.matching import matchengine
+from modules.matching.matchengine import CompiledRuleset
+from modules.matching.regex_guard import RegexGuard
+
+
+TOOLS = ["mimikatz", "procdump", "psexec", "certutil", "bitsadmin", "rundll32", "regsvr32"]
+USERS = ["alice", "bob", "carol", "svc-backup", "administrator", "root"]
+
+
+def rule(rng: random.Random, n: int) -> dict:
+    tool = rng.choice(TOOLS)
+    kind = n % 3
+
+    if kind == 0:
+        regex = rf"{tool}(\.exe)?\s+.*ioc{n}\b"
+    elif kind == 1:
+        regex = rf"failed password for (invalid user )?{rng.choice(USERS)}"
+    else:
+        regex = rf"\b\d{{1,3}}(\.\d{{1,3}}){{3}}:\d{{{n % 3 + 3}}}\b"
+
+    return {"key": "raw", "regex": regex}
+
+
+def event(rng: random.Random) -> dict:
+    return {
+        "raw": (
+            f"2024-05-01T12:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}Z host-{rng.randint(1, 40)} "
+            f"sshd[{rng.randint(1000, 9999)}]: Failed password for {rng.choice(USERS)} from "
+            f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(0, 255)} port {rng.randint(1024, 65535)} ssh2"
+        ),
+    }
+
+
+def run(evaluate, events: list, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for e in events:
+            evaluate(e)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rules", type=int, default=21)
+    ap.add_argument("--events", type=int, default=2000)
+    ap.add_argument("--rounds", type=int, default=3)
+    args = ap.parse_args()
+
+    rng = random.Random(7)
+    rules = [rule(rng, n) for n in range(args.rules)]
+    events = [event(rng) for _ in range(args.events)]
+
+    expected = None
+    baseline = None
+
+    for mode in ("inline", "auto", "sandbox"):
+        guard = RegexGuard(mode=mode)
+        matchengine.regex_guard = guard
+        try:
+            # No prefilter: every rule's regex is searched for every event
+            compiled = CompiledRuleset(rules, prefilter=False)
+
+            results = [compiled.evaluate(e)[0] for e in events]
+            if expected is None:
+                expected = results
+            assert results == expected, f"{mode} matched differently"
+
+            t = run(compiled.evaluate, events, args.rounds)
+            patterns = guard.stats(top=None)["patterns"]
+            sandboxed = f"{sum(gp['sandboxed'] for gp in patterns)}/{len(patterns)}"
+        finally:
+            guard.close()
+
+        baseline = baseline or t
+        print(
+            f"  {mode:<8} {len(events) / t:10.0f} events/s "
+            f"{t / (len(events) * len(rules)) * 1e6:7.1f}us/rule "
+            f"sandboxed={sandboxed} "
+            f"slowdown={t / baseline:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from detectionengine.matcher.app.routers.matcher import router, run_matchengine
+
+
+RULES = [
+    {"name": "failed-login", "rule": {"regex": "failed", "key": "msg"}},
+    {"name": "root", "rule": {"regex": "root", "key": "user"}},
+    {"_id": "r3", "rule": {"regex": "sshd", "key": "raw"}},
+]
+
+
+def _client():
+    app = FastAPI()
+    app.dependency_overrides[run_matchengine] = lambda: {
+        "scope": "detectionengine:run"
+    }
+    app.include_router(router)
+    return TestClient(app)
+
+
+def test_find_matches_returns_matched_rule_ids():
+    client = _client()
+
+    r = client.post(
+        "/detectionengine/matcher/find_matches",
+        json={"rules": RULES, "log_data": {"msg": "login failed", "user": "root", "raw": "x"}},
+    )
+
+    assert r.status_code == 200
+    body = r.json()
+    assert body["matched"] == ["failed-login", "root"]
+    assert body["matched_index"] == [0, 1]
+    assert body["errors"] == []
+    assert body["ruleset_id"]
+
+
+def test_find_matches_reuses_cached_ruleset():
+    client = _client()
+
+    first = client.post(
+        "/detectionengine/matcher/find_matches",
+        json={"rules": RULES, "log_data": {"raw": "sshd"}},
+    ).json()
+
+    r = client.post(
+        "/detectionengine/matcher/find_matches",
+        json={"ruleset_id": first["ruleset_id"], "log_data": {"raw": "sshd: accepted"}},
+    )
+
+    assert r.status_code == 200
+    assert r.json()["matched"] == ["r3"]
+
+
+def test_find_matches_unknown_ruleset_id_is_404():
+    r = _client().post(
+        "/detectionengine/matcher/find_matches",
+        json={"ruleset_id": "nope", "log_data": {}},
+    )
+
+    assert r.status_code == 404
+
+
+def test_find_matches_batch_keeps_log_order():
+    r = _client().post(
+        "/detectionengine/matcher/find_matches_batch",
+        json={
+            "rules": RULES,
+            "logs": [{"raw": "sshd"}, {"raw": "nothing"}, {"msg": "failed", "raw": ""}],
+        },
+    )
+
+    assert r.status_code == 200
+    assert [res["matched"] for res in r.json()["results"]] == [["r3"], [], ["failed-login"]]
+
+
+def test_find_matches_reports_rule_errors():
+    r = _client().post(
+        "/detectionengine/matcher/find_matches",
+        json={"rules": [{"name": "bad", "rule": {"key": "raw"}}], "log_data": {"raw": "x"}},
+    )
+
+    body = r.json()
+    assert body["matched"] == []
+    assert body["errors"][0]["rule_id"] == "bad"
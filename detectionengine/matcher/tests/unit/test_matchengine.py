@@ -8,3 +8,44 @@ def test_regex_match_true():
         {"raw": "hello world"},
     )
     assert result["is_matched"] is True
+
+
+def test_compiled_ruleset_matches_engine_per_rule():
+    from modules.matching.matchengine import CompiledRuleset
+
+    rules = [
+        {"regex": "fail", "key": "msg"},
+        {"regex": "^root$", "key": "user.name"},
+        {"regex": "sudo", "key": "missing.path"},
+        {"regex": "(", "key": "msg"},
+        {"regex": "x", "key": "count"},
+        {"standard": {}, "key": "msg"},
+        {"regex": "b", "key": "tags"},
+    ]
+    logs = [
+        {"raw": "sudo su", "msg": "login failed", "user": {"name": "root"}, "count": 3, "tags": ["a", "b"]},
+        {"raw": 7, "msg": "ok", "user": {"name": "alice"}, "tags": []},
+        {},
+    ]
+
+    engine = MatchEngine()
+    compiled = CompiledRuleset(rules)
+
+    for log in logs:
+        assert compiled.results(log) == [engine.match(rule, log) for rule in rules]
+
+
+def test_compiled_ruleset_evaluate_reports_positions():
+    from modules.matching.matchengine import CompiledRuleset
+
+    compiled = CompiledRuleset([
+        {"regex": "a", "key": "raw"},
+        {"regex": "z", "key": "raw"},
+        {"key": "raw"},
+        {"regex": "b", "key": "raw"},
+    ])
+
+    matched, errors = compiled.evaluate({"raw": "abc"})
+
+    assert matched == [0, 3]
+    assert [index for index, _ in errors] == [2]
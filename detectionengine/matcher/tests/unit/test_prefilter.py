@@ -0,0 +1,50 @@
+import pytest
+
+from modules.matching.literals import required_literals
+from modules.matching.matchengine import CompiledRuleset
+
+
+@pytest.mark.parametrize("pattern, literals, ignore_case", [
+    ("failed password for", {"failed password for"}, False),
+    (r"user=(\w+)", {"user="}, False),
+    (r"\bsudo\b.*COMMAND=", {"COMMAND="}, False),
+    ("(?i)Invalid user", {"Invalid user"}, True),
+    ("error|warning", {"error", "warning"}, False),
+    ("x{3}yz", {"xxxyz"}, False),
+])
+def test_required_literals(pattern, literals, ignore_case):
+    assert required_literals(pattern) == (frozenset(literals), ignore_case)
+
+
+@pytest.mark.parametrize("pattern", [
+    r"\d+\.\d+",
+    "abc?",
+    "ab(c|)de",
+    "(?i)straße",
+    "(",
+])
+def test_no_literals_when_none_are_required(pattern):
+    assert required_literals(pattern) == (None, False)
+
+
+def test_prefilter_does_not_change_results():
+    rules = [
+        {"regex": "failed password", "key": "raw"},
+        {"regex": "(?i)MIMIKATZ", "key": "raw"},
+        {"regex": r"\d{4}", "key": "raw"},
+        {"regex": "(GET|POST) /admin", "key": "url"},
+        {"regex": "(", "key": "raw"},
+    ]
+    logs = [
+        {"raw": "Failed password for root", "url": "GET /admin"},
+        {"raw": "ran mimikatz.exe 2024"},
+        {"raw": "ſ mimikatz"},
+        {"raw": ["nope", "failed password"], "url": "PUT /admin"},
+        {"raw": 3},
+    ]
+
+    filtered = CompiledRuleset(rules, prefilter=True)
+    plain = CompiledRuleset(rules, prefilter=False)
+
+    for log in logs:
+        assert filtered.results(log) == plain.results(log)
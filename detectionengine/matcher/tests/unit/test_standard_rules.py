@@ -0,0 +1,78 @@
+import pytest
+
+from detectionengine.matcher.app.matchengine import MatchEngine
+from modules.matching.matchengine import CompiledRuleset
+from modules.matching.predicates import InvalidStandardRule, StandardPredicate
+
+
+LOG = {
+    "user": {"name": "Root"},
+    "source": {"ip": "10.20.30.40"},
+    "http": {"status": 503, "bytes": "2048"},
+    "tags": ["edge", "auth"],
+    "parent": None,
+}
+
+
+@pytest.mark.parametrize("rule, expected", [
+    ({"key": "user.name", "standard": {"equals": "Root"}}, True),
+    ({"key": "user.name", "standard": {"equals": "root"}}, False),
+    ({"key": "user.name", "standard": {"equals": "root", "ignore_case": True}}, True),
+    ({"key": "user.name", "standard": {"in": ["admin", "Root"]}}, True),
+    ({"key": "tags", "standard": {"in": ["auth"]}}, True),
+    ({"key": "http.status", "standard": {"equals": 503.0}}, True),
+    ({"key": "http.status", "standard": {"equals": "503"}}, False),
+    ({"key": "source.ip", "standard": {"cidr": ["10.0.0.0/8"]}}, True),
+    ({"key": "source.ip", "standard": {"cidr": "192.168.0.0/16"}}, False),
+    ({"key": "source.ip", "standard": {"cidr": "fd00::/8"}}, False),
+    ({"key": "http.status", "standard": {"range": {"gte": 500, "lt": 600}}}, True),
+    ({"key": "http.status", "standard": {"range": {"gt": 503}}}, False),
+    ({"key": "http.bytes", "standard": {"range": [{"lt": 10}, {"gte": 1024, "lte": 4096}]}}, True),
+    ({"key": "http.bytes", "standard": {"range": {"lt": 2048}}}, False),
+    ({"key": "user.name", "standard": {"exists": True}}, True),
+    ({"key": "parent", "standard": {"exists": True}}, False),
+    ({"key": "missing.key", "standard": {"exists": False}}, True),
+    ({"key": "missing.key", "standard": {"in": ["x"]}}, False),
+    ({"key": "source.ip", "standard": {"exists": True, "cidr": "10.20.0.0/16"}}, True),
+])
+def test_standard_predicates(rule, expected):
+    result = MatchEngine().match(rule, LOG)
+
+    assert result["status"] == 200
+    assert result["is_matched"] is expected
+
+
+@pytest.mark.parametrize("spec", [
+    {},
+    {"regex": "x"},
+    {"in": "root"},
+    {"cidr": "not-a-network"},
+    {"range": {"between": [1, 2]}},
+    {"equals": "a", "in": ["b"]},
+    {"exists": "yes"},
+    {"equals": {"nested": 1}},
+])
+def test_invalid_specs_are_rejected(spec):
+    with pytest.raises(InvalidStandardRule):
+        StandardPredicate(spec)
+
+    result = MatchEngine().match({"key": "x", "standard": spec}, {"x": 1})
+    assert result["status"] == 400
+    assert result["details"].startswith("Invalid standard rule")
+
+
+def test_ruleset_indexes_standard_rules():
+    rules = [
+        {"key": "user.name", "standard": {"in": ["alice", "Root"]}},
+        {"key": "user.name", "standard": {"equals": "root", "ignore_case": True}},
+        {"key": "user.name", "standard": {"equals": "bob"}},
+        {"key": "source.ip", "standard": {"cidr": ["10.0.0.0/8", "172.16.0.0/12"]}},
+        {"key": "user.name", "regex": "^R"},
+        {"key": "http.status", "standard": {"range": {"gte": 500}}},
+    ]
+
+    compiled = CompiledRuleset(rules)
+    engine = MatchEngine()
+
+    assert compiled.evaluate(LOG) == ([0, 1, 3, 4, 5], [])
+    assert compiled.results(LOG) == [engine.match(rule, LOG) for rule in rules]
@@ -47,6 +47,22 @@ def get_mongo():
     )
 
 
+def bump_rules_version(mongo):
+    """
+    Tell rule caches (detectors) that the rules changed. Caches still do
+    a periodic full reload, so a failure is not fatal.
+    """
+    try:
+        mongo.bump_version("rules")
+    except Exception as e:
+        audit.log(
+            event="rules_version_bump_failed",
+            severity="WARNING",
+            result="failure",
+            metadata={"error": str(e)},
+        )
+
+
 @router.post("/insert_rule")
 async def insert_rule(
     payload: RuleCreate,
@@ -77,6 +93,7 @@ async def insert_rule(
     try:
 
         mongo.insert_one("rules", data)
+        bump_rules_version(mongo)
 
         audit.log(
             event="rule_inserted",
@@ -160,6 +177,7 @@ async def delete_rule(
     try:
 
         mongo.delete_one("rules", {"_id": oid})
+        bump_rules_version(mongo)
 
         audit.log(
             event="rule_deleted",
@@ -234,6 +252,7 @@ async def update_rule(
     try:
 
         mongo.upsert_one("rules", {"_id": oid}, data)
+        bump_rules_version(mongo)
 
         audit.log(
             event="rule_updated",
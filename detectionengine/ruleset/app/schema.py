@@ -1,5 +1,8 @@
 from jsonschema import validate, ValidationError
 
+from modules.matching.predicates import check_standard
+from modules.matching.regex_guard import analyze_pattern
+
 class RuleSchema:
     def __init__(self):
         self.schema = {
@@ -47,6 +50,20 @@ class RuleSchema:
     def validate(self, data: dict) -> dict:
         try:
             validate(instance=data, schema=self.schema)
-            return {"valid": True, "error": None}
         except ValidationError as e:
             return {"valid": False, "error": e.message}
+
+        # Regex rules run against every log; reject patterns that cannot
+        # compile or are prone to catastrophic backtracking up front.
+        regex = data["rule"].get("regex")
+        if regex is not None:
+            issues = analyze_pattern(regex)
+            if issues:
+                return {"valid": False, "error": f"Unsafe regex: {issues[0]}"}
+
+        if "standard" in data["rule"]:
+            error = check_standard(data["rule"]["standard"])
+            if error:
+                return {"valid": False, "error": f"Invalid standard rule: {error}"}
+
+        return {"valid": True, "error": None}
@@ -34,4 +34,16 @@ def test_ruleset_insert(client):
     assert res.status_code == 200
 
     body = res.json()
-    assert body["inserted"] is True
\ No newline at end of file
+    assert body["inserted"] is True
+
+def test_ruleset_insert_bumps_rules_version(client, fake_mongo):
+    payload = {
+        "name": "versioned_rule",
+        "severity": 10,
+        "rule": {"key": "raw", "regex": "error"},
+    }
+
+    res = client.post("/detectionengine/ruleset/insert_rule", json=payload)
+
+    assert res.status_code == 200
+    assert fake_mongo.version == 1
@@ -19,6 +19,11 @@ from app.routers.ruleset import (
 class FakeMongo:
     def __init__(self):
         self.rules = []
+        self.version = 0
+
+    def bump_version(self, name):
+        self.version += 1
+        return self.version
 
     def insert_one(self, collection, doc):
         self.rules.append(doc)
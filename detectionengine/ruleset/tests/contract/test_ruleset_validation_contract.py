@@ -7,3 +7,33 @@ def test_insert_rule_invalid_schema(client):
     assert res.status_code == 400
     body = res.json()
     assert "detail" in body
+
+
+def test_insert_rule_rejects_catastrophic_regex(client):
+    res = client.post(
+        "/detectionengine/ruleset/insert_rule",
+        json={
+            "name": "redos",
+            "severity": 10,
+            "description": "nested quantifier",
+            "rule": {"key": "raw", "regex": "(a+)+$"},
+        },
+    )
+
+    assert res.status_code == 400
+    assert "Unsafe regex" in str(res.json()["detail"])
+
+
+def test_insert_rule_rejects_invalid_standard_rule(client):
+    res = client.post(
+        "/detectionengine/ruleset/insert_rule",
+        json={
+            "name": "bad-cidr",
+            "severity": 10,
+            "description": "unparseable network",
+            "rule": {"key": "source.ip", "standard": {"cidr": "10.0.0.0/33"}},
+        },
+    )
+
+    assert res.status_code == 400
+    assert "Invalid standard rule" in str(res.json()["detail"])
@@ -2,6 +2,21 @@ db = db.getSiblingDB("herringbone");
 
 db.scopes.createIndex({ scope: 1 }, { unique: true });
 
+// Work-queue claims scan pending states in _id order
+db.event_state.createIndex({ event_id: 1 });
+db.event_state.createIndex({ parsed: 1, _id: 1 });
+db.event_state.createIndex({ parsed: 1, detected: 1, _id: 1 });
+
+// A detection opens at most one incident; incidents without detections
+// are left out of the index
+db.incidents.createIndex(
+  { detections: 1 },
+  { unique: true, partialFilterExpression: { detections: { $type: "string" } } }
+);
+
+// Detector -> orchestrator notification outbox, drained in _id order
+db.detection_outbox.createIndex({ state: 1, next_attempt_at: 1, _id: 1 });
+
 export const defaultScopes = [
 
   // Logs
@@ -4,6 +4,7 @@ from pydantic import BaseModel, Field, ConfigDict
 from datetime import datetime, timezone
 from bson import ObjectId
 from bson.json_util import dumps
+from pymongo.errors import DuplicateKeyError
 
 from modules.database.mongo_db import HerringboneMongoDatabase
 from modules.auth.auth import require_scopes
@@ -53,6 +54,12 @@ def incidents_collection():
     return os.environ.get("COLLECTION_NAME", "incidents")
 
 
+def _is_duplicate_key(exc: Exception) -> bool:
+    # HerringboneMongoDatabase wraps driver errors in RuntimeError
+    cause = exc if isinstance(exc, DuplicateKeyError) else exc.__cause__
+    return isinstance(cause, DuplicateKeyError)
+
+
 @router.post("/insert_incident")
 async def insert_incident(
     payload: IncidentCreate,
@@ -83,6 +90,11 @@ async def insert_incident(
 
         raise HTTPException(status_code=400, detail=validation)
 
+    # A detection opens at most one incident, however often it is resent;
+    # the unique index on incidents.detections turns a resend into a
+    # duplicate key error
+    detections = [d for d in data.get("detections") or [] if d]
+
     try:
 
         mongo.insert_one(incidents_collection(), data)
@@ -97,6 +109,18 @@ async def insert_incident(
 
     except Exception as e:
 
+        if detections and _is_duplicate_key(e):
+
+            audit.log(
+                event="incident_insert_duplicate",
+                identity=identity,
+                request=request,
+                target=data.get("title"),
+                metadata={"detections": detections},
+            )
+
+            return {"inserted": False, "duplicate": True}
+
         audit.log(
             event="incident_insert_failed",
             identity=identity,
@@ -154,10 +178,14 @@ async def update_incident(
     }
 
     push_fields = {}
+    add_fields = {}
 
     for key, value in payload.items():
 
-        if key in ("events", "detections", "notes") and isinstance(value, list):
+        # Events and detections are sets, so re-sending an attach is harmless
+        if key in ("events", "detections") and isinstance(value, list):
+            add_fields[key] = {"$each": value}
+        elif key == "notes" and isinstance(value, list):
             push_fields[key] = {"$each": value}
         else:
             set_fields[key] = value
@@ -167,6 +195,9 @@ async def update_incident(
     if push_fields:
         update_doc["$push"] = push_fields
 
+    if add_fields:
+        update_doc["$addToSet"] = add_fields
+
     try:
 
         client, db = mongo.open_mongo_connection()
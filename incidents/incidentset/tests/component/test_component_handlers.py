@@ -2,6 +2,7 @@ import anyio
 from fastapi import HTTPException
 from starlette.requests import Request
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
 from routers import incidentset
 
@@ -118,4 +119,69 @@ def test_update_incident_builds_set_and_push(fake_mongo):
     update = col.last_update_one["update"]
 
     assert "$set" in update
-    assert "$push" in update
\ No newline at end of file
+    assert "$push" in update
+    assert update["$addToSet"]["events"] == {"$each": ["e1", "e2"]}
+    assert "events" not in update["$push"]
+
+
+def test_insert_incident_skips_known_detection(fake_mongo):
+
+    # What the unique index on incidents.detections raises, as wrapped by
+    # HerringboneMongoDatabase
+    try:
+        raise RuntimeError("MongoDB operation failed: E11000") from DuplicateKeyError("E11000", 11000)
+    except RuntimeError as e:
+        fake_mongo.exc = e
+
+    async def run():
+
+        payload = incidentset.IncidentCreate.model_validate(
+            {
+                "title": "T",
+                "priority": "low",
+                "status": "open",
+                "detections": ["d1"],
+            }
+        )
+
+        return await incidentset.insert_incident(
+            payload=payload,
+            request=fake_request(),
+            mongo=fake_mongo,
+            identity=fake_identity,
+        )
+
+    resp = anyio.run(run)
+
+    assert resp == {"inserted": False, "duplicate": True}
+    assert fake_mongo.inserted == []
+
+
+def test_insert_incident_other_errors_still_fail(fake_mongo):
+
+    fake_mongo.exc = RuntimeError("MongoDB operation failed: timed out")
+
+    async def run():
+
+        payload = incidentset.IncidentCreate.model_validate(
+            {
+                "title": "T",
+                "priority": "low",
+                "status": "open",
+                "detections": ["d1"],
+            }
+        )
+
+        return await incidentset.insert_incident(
+            payload=payload,
+            request=fake_request(),
+            mongo=fake_mongo,
+            identity=fake_identity,
+        )
+
+    try:
+        anyio.run(run)
+    except HTTPException as e:
+        assert e.status_code == 500
+    else:
+        assert False, "Expected HTTPException"
@@ -1,8 +1,12 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import APIRouter, HTTPException, Depends, Request
 from modules.auth.auth import require_scopes
 from modules.audit.logger import AuditLogger
 import requests
 import os
+import threading
+import time
 
 
 orchestrator_run = require_scopes("incidents:orchestrate")
@@ -26,6 +30,13 @@ INCIDENTSET_API = os.environ.get(
     "http://127.0.0.1:7011/incidents/incidentset",
 )
 
+ORCHESTRATOR_MAX_BATCH = int(os.environ.get("ORCHESTRATOR_MAX_BATCH", 500))
+# Detections of one batch handled at once; each makes up to two 5s calls
+ORCHESTRATOR_BATCH_WORKERS = int(os.environ.get("ORCHESTRATOR_BATCH_WORKERS", 8))
+# How long a handled detection_id is remembered, and how many are
+ORCHESTRATOR_IDEMPOTENCY_TTL = float(os.environ.get("ORCHESTRATOR_IDEMPOTENCY_TTL", 3600.0))
+ORCHESTRATOR_IDEMPOTENCY_SIZE = int(os.environ.get("ORCHESTRATOR_IDEMPOTENCY_SIZE", 100000))
+
 _service_token_cache: str | None = None
 
 
@@ -45,12 +56,121 @@ def service_auth_headers():
     return {"Authorization": f"Bearer {_service_token_cache}"}
 
 
+class DetectionLedger:
+    """
+    Results of recently handled detections, keyed by detection_id.
+
+    The detector resends a detection when its request failed or timed out,
+    which can happen after the orchestrator already acted on it. A resent
+    detection_id is answered with the recorded result instead of creating
+    or attaching an incident again; one that arrives while the first copy
+    is still being handled waits for it. Failed detections are not
+    recorded, so they can be retried.
+    """
+
+    def __init__(self, ttl: float = ORCHESTRATOR_IDEMPOTENCY_TTL, maxsize: int = ORCHESTRATOR_IDEMPOTENCY_SIZE):
+        self.ttl = ttl
+        self.maxsize = max(1, maxsize)
+        self._done: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+        self._running: dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def run(self, key: str | None, handle) -> dict:
+        if key is None:
+            return handle()
+
+        while True:
+            with self._lock:
+                entry = self._done.get(key)
+                if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                    return {**entry[1], "duplicate": True}
+
+                running = self._running.get(key)
+                if running is None:
+                    running = self._running[key] = threading.Event()
+                    break
+
+            running.wait()
+
+        try:
+            result = handle()
+        except BaseException:
+            with self._lock:
+                self._running.pop(key, None)
+            running.set()
+            raise
+
+        with self._lock:
+            self._done[key] = (time.monotonic(), result)
+            self._done.move_to_end(key)
+            while len(self._done) > self.maxsize:
+                self._done.popitem(last=False)
+            self._running.pop(key, None)
+        running.set()
+
+        return result
+
+
+ledger = DetectionLedger()
+_batch_pool = ThreadPoolExecutor(max_workers=max(1, ORCHESTRATOR_BATCH_WORKERS), thread_name_prefix="orchestrator-batch")
+
+
+# Handlers are plain defs: the correlator and incidentset calls block, so
+# FastAPI runs them on its threadpool instead of the event loop.
+
 @router.post("/process_detection")
-async def process_detection(
+def process_detection(
     payload: dict,
     request: Request,
     identity=Depends(orchestrator_run),
 ):
+    return _process(payload, identity, request)
+
+
+@router.post("/process_detections")
+def process_detections(
+    payload: dict,
+    request: Request,
+    identity=Depends(orchestrator_run),
+):
+    """
+    Batch form of /process_detection: {"detections": [...]}. Detections are
+    handled concurrently (ORCHESTRATOR_BATCH_WORKERS at a time), each on
+    its own, and get a result in the same position carrying the status code
+    the single endpoint would have answered with, so one bad detection does
+    not fail the batch.
+    """
+    detections = payload.get("detections")
+
+    if not isinstance(detections, list):
+        raise HTTPException(status_code=400, detail="detections must be a list")
+
+    if len(detections) > ORCHESTRATOR_MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {ORCHESTRATOR_MAX_BATCH} detections per batch")
+
+    def one(detection) -> dict:
+        try:
+            if not isinstance(detection, dict):
+                raise HTTPException(status_code=400, detail="detection must be an object")
+            return {"status_code": 200, **_process(detection, identity, request)}
+        except HTTPException as e:
+            return {"status_code": e.status_code, "error": e.detail}
+
+    return {"results": list(_batch_pool.map(one, detections))}
+
+
+def _process(payload: dict, identity, request: Request) -> dict:
+    """
+    _handle_detection() at most once per detection_id.
+    """
+    key = payload.get("detection_id")
+    return ledger.run(
+        str(key) if key is not None else None,
+        lambda: _handle_detection(payload, identity, request),
+    )
+
+
+def _handle_detection(payload: dict, identity, request: Request) -> dict:
 
     if "rule_id" not in payload:
 
@@ -1,4 +1,3 @@
-import anyio
 from fastapi import HTTPException
 from starlette.requests import Request
 
@@ -27,16 +26,90 @@ fake_identity = {
 
 def test_missing_rule_id_400():
 
-    async def run():
-        await orchestrator.process_detection(
+    try:
+        orchestrator.process_detection(
             payload={},
             request=fake_request(),
             identity=fake_identity,
         )
-
-    try:
-        anyio.run(run)
     except HTTPException as e:
         assert e.status_code == 400
     else:
-        assert False, "Expected HTTPException"
\ No newline at end of file
+        assert False, "Expected HTTPException"
+
+def test_batch_reports_each_detection(monkeypatch):
+
+    class Resp:
+        def __init__(self, body):
+            self.body = body
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return self.body
+
+    calls = []
+
+    def fake_post(url, json, headers, timeout):
+        calls.append(url)
+        if url == orchestrator.CORRELATOR_URL:
+            return Resp({"action": "create"})
+        return Resp({})
+
+    monkeypatch.setattr(orchestrator, "_service_token_cache", "token")
+    monkeypatch.setattr(orchestrator.requests, "post", fake_post)
+
+    monkeypatch.setattr(orchestrator, "ledger", orchestrator.DetectionLedger())
+
+    out = orchestrator.process_detections(
+        payload={"detections": [{"rule_id": "r1", "detection_id": "d1"}, {}, "bad"]},
+        request=fake_request(),
+        identity=fake_identity,
+    )
+
+    assert [r["status_code"] for r in out["results"]] == [200, 400, 400]
+    assert out["results"][0]["result"] == "created"
+    assert calls == [orchestrator.CORRELATOR_URL, f"{orchestrator.INCIDENTSET_API}/insert_incident"]
+
+
+def test_resent_detection_does_not_create_a_second_incident(monkeypatch):
+
+    class Resp:
+        def __init__(self, body):
+            self.body = body
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return self.body
+
+    calls = []
+
+    def fake_post(url, json, headers, timeout):
+        calls.append(url)
+        if url == orchestrator.CORRELATOR_URL:
+            return Resp({"action": "create"})
+        if len(calls) == 2:
+            raise orchestrator.requests.ConnectionError("incidentset down")
+        return Resp({})
+
+    monkeypatch.setattr(orchestrator, "_service_token_cache", "token")
+    monkeypatch.setattr(orchestrator.requests, "post", fake_post)
+    monkeypatch.setattr(orchestrator, "ledger", orchestrator.DetectionLedger())
+
+    def send():
+        return orchestrator.process_detections(
+            payload={"detections": [{"rule_id": "r1", "detection_id": "d1"}]},
+            request=fake_request(),
+            identity=fake_identity,
+        )["results"][0]
+
+    # A failed attempt is not remembered, so the retry is handled
+    assert send()["status_code"] == 502
+    assert send() == {"status_code": 200, "result": "created"}
+
+    # The detector resending after a timeout gets the first result back
+    assert send() == {"status_code": 200, "result": "created", "duplicate": True}
+    assert calls.count(f"{orchestrator.INCIDENTSET_API}/insert_incident") == 2
@@ -0,0 +1,310 @@
+import codecs
+import gzip
+import json
+import os
+import re
+import time
+import zlib
+from datetime import datetime
+from typing import Any, BinaryIO, Iterator
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from app.ingest_buffer import INITIAL_STATE
+
+
+BULK_MAX_ITEMS = int(os.environ.get("BULK_MAX_ITEMS", 10000))
+BULK_READ_SIZE = 64 * 1024
+BULK_WRITE_ATTEMPTS = int(os.environ.get("BULK_WRITE_ATTEMPTS", 3))
+BULK_RETRY_DELAY = float(os.environ.get("BULK_RETRY_DELAY", 0.2))
+
+NDJSON_TYPES = {
+    "application/x-ndjson",
+    "application/ndjson",
+    "application/jsonl",
+    "application/json-lines",
+    "application/x-jsonlines",
+}
+
+_SIGNIFICANT = re.compile(r"[^ \t\r\n]")
+
+
+class BulkParseError(Exception):
+    """Raised when the body cannot be read as NDJSON or a JSON array."""
+    pass
+
+
+class _Reader:
+    """
+    Decodes a byte stream to text chunk by chunk, keeping only the
+    unparsed tail of the body in memory.
+
+    Parsers advance `pos` through `buf`; the consumed head is dropped only
+    when the next chunk is appended, so each item costs no copy of the
+    rest of the buffer.
+    """
+
+    def __init__(self, stream: BinaryIO, read_size: int = BULK_READ_SIZE):
+        self.stream = stream
+        self.read_size = read_size
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def more(self) -> bool:
+        if self.eof:
+            return False
+
+        try:
+            chunk = self.stream.read(self.read_size)
+        except (OSError, EOFError, zlib.error) as e:
+            # A corrupt gzip body fails here, on the first read that inflates it
+            raise BulkParseError(f"Unreadable request body: {e}") from e
+
+        if not chunk:
+            self.eof = True
+            text = self.decoder.decode(b"", final=True)
+        else:
+            text = self.decoder.decode(chunk)
+
+        self.buf = self.buf[self.pos:] + text
+        self.pos = 0
+        return bool(chunk)
+
+    def lstrip(self) -> str:
+        """
+        Skip whitespace, reading more as needed; returns the next
+        significant character or "" at end of stream.
+        """
+        while True:
+            m = _SIGNIFICANT.search(self.buf, self.pos)
+            if m:
+                self.pos = m.start()
+                return self.buf[self.pos]
+
+            self.pos = len(self.buf)
+            if not self.more():
+                return ""
+
+
+def _iter_ndjson(reader: _Reader) -> Iterator[tuple[Any, str | None]]:
+    while True:
+        nl = reader.buf.find("\n", reader.pos)
+        while nl == -1:
+            # Only the newly read text can hold the newline
+            scanned = len(reader.buf) - reader.pos
+            if not reader.more():
+                break
+            nl = reader.buf.find("\n", reader.pos + scanned)
+
+        if nl == -1:
+            line = reader.buf[reader.pos:]
+            reader.pos = len(reader.buf)
+        else:
+            line = reader.buf[reader.pos:nl]
+            reader.pos = nl + 1
+
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line), None
+            except ValueError as e:
+                yield None, f"Invalid JSON: {e}"
+
+        if nl == -1:
+            return
+
+
+def _iter_json_array(reader: _Reader) -> Iterator[tuple[Any, str | None]]:
+    decoder = json.JSONDecoder()
+
+    reader.pos += 1  # opening "["
+    first = True
+
+    while True:
+        ch = reader.lstrip()
+        if ch == "]":
+            return
+        if not ch:
+            raise BulkParseError("Unterminated JSON array")
+
+        if not first:
+            if ch != ",":
+                raise BulkParseError("Expected ',' between array items")
+            reader.pos += 1
+            reader.lstrip()
+        first = False
+
+        while True:
+            try:
+                item, end = decoder.raw_decode(reader.buf, reader.pos)
+                # A number cut at a chunk boundary still decodes; make sure
+                # the item really ends before the buffered text does.
+                if end == len(reader.buf) and reader.more():
+                    continue
+                break
+            except ValueError as e:
+                if not reader.more():
+                    raise BulkParseError(f"Invalid JSON array item: {e}") from e
+
+        reader.pos = end
+        yield item, None
+
+
+def request_body(req) -> BinaryIO:
+    """
+    The raw request stream, transparently gunzipped for Content-Encoding: gzip.
+
+    GzipFile inflates lazily, so a corrupt body is reported by the reader
+    as a BulkParseError rather than raised here.
+    """
+    if (req.headers.get("Content-Encoding") or "").strip().lower() == "gzip":
+        return gzip.GzipFile(fileobj=req.stream, mode="rb")
+    return req.stream
+
+
+def iter_bulk_items(stream: BinaryIO, content_type: str | None = None) -> Iterator[tuple[Any, str | None]]:
+    """
+    Stream (item, error) pairs out of an NDJSON body or a JSON array body.
+
+    A body is treated as a JSON array when its first significant character
+    is "[" and the content type is not an NDJSON type. An NDJSON line that
+    fails to parse yields (None, error) and parsing continues. A malformed
+    array raises BulkParseError because the remaining items cannot be
+    recovered.
+    """
+    reader = _Reader(stream)
+    mime = (content_type or "").split(";", 1)[0].strip().lower()
+
+    first = reader.lstrip()
+    if not first:
+        return
+
+    if first == "[" and mime not in NDJSON_TYPES:
+        yield from _iter_json_array(reader)
+    else:
+        yield from _iter_ndjson(reader)
+
+
+def new_event(data: Any, addr: str, kind: str, now: datetime) -> dict:
+    return {
+        "_id": ObjectId(),
+        "raw": data,
+        "source": {
+            "address": addr,
+            "kind": kind,
+        },
+        "event_time": now,
+        "ingested_at": now,
+    }
+
+
+def _rejected_items(exc: Exception) -> dict[int, str] | None:
+    """
+    {position: error} for the items an unordered insert rejected, or None
+    when the failure was not per item (connection, write concern) and the
+    insert should be retried. Duplicate keys are not rejections: with
+    _ids assigned up front they mean an earlier attempt wrote the event.
+    """
+    cause = exc if isinstance(exc, BulkWriteError) else exc.__cause__
+    if not isinstance(cause, BulkWriteError):
+        return None
+
+    details = cause.details or {}
+    if details.get("writeConcernErrors"):
+        return None
+
+    return {
+        err["index"]: err.get("errmsg", "Insert failed")
+        for err in details.get("writeErrors", [])
+        if err.get("code") != 11000
+    }
+
+
+def _insert_events(mongo, events: list[dict]) -> dict[int, str]:
+    for attempt in range(1, BULK_WRITE_ATTEMPTS + 1):
+        try:
+            mongo.insert_events(events)
+            return {}
+        except Exception as e:
+            rejected = _rejected_items(e)
+            if rejected is not None:
+                print(f"[✗] Mongo rejected {len(rejected)} of {len(events)} events: {e}")
+                return rejected
+
+            print(f"[✗] Mongo bulk insert failed (attempt {attempt}/{BULK_WRITE_ATTEMPTS}): {e}")
+            if attempt < BULK_WRITE_ATTEMPTS:
+                time.sleep(BULK_RETRY_DELAY * attempt)
+
+    return {i: "Insert failed; check server logs for details." for i in range(len(events))}
+
+
+def write_events(mongo, events: list[dict]) -> dict[int, str]:
+    """
+    One insert_many into events plus one bulk upsert into event_state for
+    the events that landed.
+
+    Event _ids are assigned by new_event(), so a retried insert skips the
+    events an earlier attempt already wrote instead of duplicating them.
+    Returns {position in events: error} for the events that were not
+    fully written; every other event has both its event and its state.
+    """
+    if not events:
+        return {}
+
+    failed = _insert_events(mongo, events)
+
+    landed = [(i, ev) for i, ev in enumerate(events) if i not in failed]
+    if not landed:
+        return failed
+
+    for attempt in range(1, BULK_WRITE_ATTEMPTS + 1):
+        try:
+            mongo.upsert_event_states([(ev["_id"], dict(INITIAL_STATE)) for _, ev in landed])
+            return failed
+        except Exception as e:
+            print(f"[✗] Mongo event_state upsert failed (attempt {attempt}/{BULK_WRITE_ATTEMPTS}): {e}")
+            if attempt < BULK_WRITE_ATTEMPTS:
+                time.sleep(BULK_RETRY_DELAY * attempt)
+
+    for i, _ in landed:
+        failed[i] = "Event state write failed; check server logs for details."
+    return failed
+
+
+def apply_write_failures(items: list[dict], events: list[dict], failed: dict[int, str]) -> None:
+    """
+    Mark the response items of events write_events() could not write.
+    """
+    if not failed:
+        return
+
+    by_id = {item.get("event_id"): item for item in items}
+    for i, error in failed.items():
+        item = by_id[str(events[i]["_id"])]
+        item.update(status=500, error=error)
+        item.pop("event_id", None)
+
+
+def bulk_response(items: list[dict], status: int | None = None):
+    accepted = sum(1 for i in items if i["status"] == 201)
+    rejected = len(items) - accepted
+
+    if status is None:
+        if accepted:
+            status = 200
+        elif any(i["status"] >= 500 for i in items):
+            status = 500
+        else:
+            status = 400
+
+    return (
+        {
+            "accepted": accepted,
+            "rejected": rejected,
+            "items": items,
+        },
+        status,
+    )
@@ -1,21 +1,529 @@
+import glob
+import gzip
+import json
+import os
+import queue
+import random
+import threading
+import time
+
 import requests
+from requests.adapters import HTTPAdapter
 
-def forward_data(route, data, source_addr):
+
+FORWARD_TIMEOUT = float(os.environ.get("FORWARD_TIMEOUT", 10.0))
+FORWARD_BATCH_SIZE = int(os.environ.get("FORWARD_BATCH_SIZE", 500))
+FORWARD_FLUSH_INTERVAL = float(os.environ.get("FORWARD_FLUSH_INTERVAL", 1.0))
+FORWARD_QUEUE_SIZE = int(os.environ.get("FORWARD_QUEUE_SIZE", 50000))
+FORWARD_MAX_RETRIES = int(os.environ.get("FORWARD_MAX_RETRIES", 5))
+FORWARD_BACKOFF_BASE = float(os.environ.get("FORWARD_BACKOFF_BASE", 0.5))
+FORWARD_BACKOFF_MAX = float(os.environ.get("FORWARD_BACKOFF_MAX", 30.0))
+FORWARD_PROBE_INTERVAL = float(os.environ.get("FORWARD_PROBE_INTERVAL", 5.0))
+FORWARD_COMPRESS = os.environ.get("FORWARD_COMPRESS", "true").lower() == "true"
+FORWARD_GZIP_LEVEL = int(os.environ.get("FORWARD_GZIP_LEVEL", 5))
+
+FORWARD_SPOOL_DIR = os.environ.get("FORWARD_SPOOL_DIR", "/tmp/herringbone-forward-spool")
+FORWARD_SPOOL_SEGMENT_BYTES = int(os.environ.get("FORWARD_SPOOL_SEGMENT_BYTES", 8 * 1024 * 1024))
+FORWARD_SPOOL_MAX_BYTES = int(os.environ.get("FORWARD_SPOOL_MAX_BYTES", 1024 * 1024 * 1024))
+
+# Outcomes of Forwarder._send
+_SENT = "sent"
+_REJECTED = "rejected"
+_FAILED = "failed"
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
     """
-    Forwards log to remote receiver route
+    Process-wide keep-alive session for talking to the remote receiver.
     """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
 
-    payload = {
+
+def _remote_item(data, source_addr) -> dict:
+    return {
         "remote_from": {"source_addr": source_addr},
-        "data": data
+        "data": data,
     }
 
+
+def forward_data(route, data, source_addr):
+    """
+    Forwards log to remote receiver route
+    """
+
+    payload = _remote_item(data, source_addr)
+
     try:
-        response = requests.post(route, json=payload)
+        response = get_session().post(route, json=payload, timeout=FORWARD_TIMEOUT)
+        response.raise_for_status()
         print(f"[*] Forwarded log to {route}")
-        print(f"[*] Response: {str(response.content)}")
         return True
 
     except Exception as e:
         print(f"[*] Something went wrong with forwarding to {route}\n{str(e)}")
-        return False
\ No newline at end of file
+        return False
+
+
+class PermanentForwardError(Exception):
+    """Raised when the upstream rejects a batch in a way retrying cannot fix."""
+    pass
+
+
+# ===========================
+# Disk Spool
+# ===========================
+
+class DiskSpool:
+    """
+    Append-only on-disk spool of NDJSON segments.
+
+    Batches that could not be delivered are appended to the newest segment.
+    Segments rotate at segment_bytes and are replayed oldest first; a
+    segment is deleted once every line in it has been delivered. Delivery
+    is at-least-once: lines from a partly replayed segment may be sent again
+    after a restart. When the spool exceeds max_bytes the oldest segment is
+    discarded.
+    """
+
+    def __init__(
+        self,
+        directory: str = FORWARD_SPOOL_DIR,
+        *,
+        segment_bytes: int = FORWARD_SPOOL_SEGMENT_BYTES,
+        max_bytes: int = FORWARD_SPOOL_MAX_BYTES,
+    ):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+
+        os.makedirs(directory, exist_ok=True)
+
+        # Segments left by a previous run are replayed first.
+        self._segments = sorted(glob.glob(os.path.join(directory, "*.ndjson")))
+        self._writer = None
+        self._writer_path: str | None = None
+        self._read_offset = 0
+
+        self.dropped_lines = 0
+
+    def has_data(self) -> bool:
+        return bool(self._segments)
+
+    def size_bytes(self) -> int:
+        total = 0
+        for path in self._segments:
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        return total
+
+    def append(self, lines: list[bytes]):
+        if not lines:
+            return
+
+        if self._writer is None or self._writer.tell() >= self.segment_bytes:
+            self._rotate()
+
+        self._writer.write(b"".join(lines))
+        self._writer.flush()
+        os.fsync(self._writer.fileno())
+
+        self._enforce_limit()
+
+    def peek(self, max_lines: int) -> tuple[list[bytes], int]:
+        """
+        Up to max_lines undelivered lines from the oldest segment, plus the
+        offset to pass to commit() once they are delivered.
+        """
+        if not self._segments:
+            return [], 0
+
+        path = self._segments[0]
+        if path == self._writer_path:
+            self._close_writer()
+
+        lines = []
+        with open(path, "rb") as f:
+            f.seek(self._read_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn write from a crash
+                lines.append(line)
+                if len(lines) >= max_lines:
+                    break
+            offset = f.tell() if len(lines) >= max_lines else os.path.getsize(path)
+
+        return lines, offset
+
+    def commit(self, offset: int):
+        path = self._segments[0]
+
+        if offset >= os.path.getsize(path):
+            self._remove_oldest()
+        else:
+            self._read_offset = offset
+
+    def close(self):
+        self._close_writer()
+
+    def _rotate(self):
+        self._close_writer()
+        path = os.path.join(self.directory, f"{time.time_ns():020d}.ndjson")
+        self._writer = open(path, "ab")
+        self._writer_path = path
+        self._segments.append(path)
+
+    def _close_writer(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self._writer_path = None
+
+    def _remove_oldest(self):
+        path = self._segments.pop(0)
+        if path == self._writer_path:
+            self._close_writer()
+        self._read_offset = 0
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _enforce_limit(self):
+        while len(self._segments) > 1 and self.size_bytes() > self.max_bytes:
+            path = self._segments[0]
+            try:
+                with open(path, "rb") as f:
+                    f.seek(self._read_offset)
+                    self.dropped_lines += sum(1 for _ in f)
+            except OSError:
+                pass
+            print(f"[✗] Forward spool over {self.max_bytes} bytes, discarding {path}")
+            self._remove_oldest()
+
+
+# ===========================
+# Batching Forwarder
+# ===========================
+
+class Forwarder:
+    """
+    Batching, retrying forwarder to a REMOTE receiver's bulk endpoint.
+
+    submit() only enqueues. A background thread groups messages into NDJSON
+    batches, gzips them and posts them over a keep-alive session, retrying
+    with exponential backoff. Items the remote failed to write are posted
+    again on their own; whatever still fails goes to the DiskSpool, and while the upstream is down new batches are spooled directly. The
+    spool is replayed as soon as a probe succeeds.
+    """
+
+    def __init__(
+        self,
+        route: str,
+        *,
+        bulk_route: str | None = None,
+        spool: DiskSpool | None = None,
+        batch_size: int = FORWARD_BATCH_SIZE,
+        flush_interval: float = FORWARD_FLUSH_INTERVAL,
+        max_queue: int = FORWARD_QUEUE_SIZE,
+        max_retries: int = FORWARD_MAX_RETRIES,
+        backoff_base: float = FORWARD_BACKOFF_BASE,
+        backoff_max: float = FORWARD_BACKOFF_MAX,
+        probe_interval: float = FORWARD_PROBE_INTERVAL,
+        compress: bool = FORWARD_COMPRESS,
+        timeout: float = FORWARD_TIMEOUT,
+    ):
+        self.route = route
+        self.bulk_route = bulk_route or os.environ.get("FORWARD_BULK_ROUTE") or route.rstrip("/") + "/bulk"
+        self.spool = spool or DiskSpool()
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_retries = max(1, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.probe_interval = probe_interval
+        self.compress = compress
+        self.timeout = timeout
+
+        self.session = get_session()
+        self.upstream_up = True
+        self._next_probe = 0.0
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        self._lock = threading.Lock()
+        self._metrics = {
+            "submitted": 0,
+            "sent": 0,
+            "batches": 0,
+            "retries": 0,
+            "spooled": 0,
+            "replayed": 0,
+            "rejected": 0,
+            "dropped": 0,
+            "last_log": 0.0,
+        }
+
+    # ===========================
+    # Lifecycle
+    # ===========================
+
+    def start(self) -> "Forwarder":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="forwarder", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float | None = 30.0):
+        """
+        Stop accepting messages; queued ones are sent or spooled.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.spool.close()
+
+    def submit(self, data, source_addr) -> bool:
+        if self._stop.is_set():
+            self._count("dropped")
+            return False
+
+        try:
+            self._queue.put_nowait((data, source_addr))
+        except queue.Full:
+            self._count("dropped")
+            return False
+
+        self._count("submitted")
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = {k: v for k, v in self._metrics.items() if k != "last_log"}
+        out["queue_depth"] = self._queue.qsize()
+        out["upstream_up"] = self.upstream_up
+        out["spool_bytes"] = self.spool.size_bytes()
+        out["spool_dropped"] = self.spool.dropped_lines
+        return out
+
+    # ===========================
+    # Sender side
+    # ===========================
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self._metrics[key] += n
+
+    def _fill(self, pending: list, deadline: float):
+        while len(pending) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0 and not self._stop.is_set():
+                    pending.append(self._queue.get(timeout=remaining))
+                else:
+                    pending.append(self._queue.get_nowait())
+            except queue.Empty:
+                return
+
+    @staticmethod
+    def _encode(batch: list) -> list[bytes]:
+        return [
+            json.dumps(_remote_item(data, addr), default=str).encode("utf-8") + b"\n"
+            for data, addr in batch
+        ]
+
+    @staticmethod
+    def _item_results(resp, lines: list[bytes]) -> tuple[list[bytes], int] | None:
+        """
+        Split a bulk response into the lines the remote failed to write
+        (item status >= 500, worth sending again) and the number of items it
+        rejected (4xx). None when the body has no per-item results.
+        """
+        try:
+            items = resp.json()["items"]
+        except Exception:
+            return None
+
+        failed = []
+        rejected = 0
+
+        for item in items:
+            index = item.get("index")
+            if not isinstance(index, int) or not 0 <= index < len(lines):
+                continue
+
+            status = item.get("status", 201)
+            if status >= 500:
+                failed.append(lines[index])
+            elif status >= 400:
+                rejected += 1
+
+        return failed, rejected
+
+    def _post(self, lines: list[bytes]) -> tuple[list[bytes], int]:
+        """
+        Post one batch. Returns the lines to send again and the number of
+        items the remote rejected.
+        """
+        body = b"".join(lines)
+        headers = {"Content-Type": "application/x-ndjson"}
+
+        if self.compress:
+            body = gzip.compress(body, compresslevel=FORWARD_GZIP_LEVEL)
+            headers["Content-Encoding"] = "gzip"
+
+        resp = self.session.post(self.bulk_route, data=body, headers=headers, timeout=self.timeout)
+
+        if 400 <= resp.status_code < 500 and resp.status_code not in (408, 429):
+            raise PermanentForwardError(f"{resp.status_code} {resp.text[:200]}")
+
+        # The remote answers 200 as soon as one item was written and 500 when
+        # none was; either way its items say which ones to send again.
+        results = self._item_results(resp, lines)
+        if results is None:
+            resp.raise_for_status()
+            return [], 0
+
+        return results
+
+    def _send(self, lines: list[bytes], *, retries: int) -> tuple[str, int, list[bytes]]:
+        """
+        Post one batch, retrying with backoff. Items the remote failed to
+        write are posted again on their own.
+
+        Returns (outcome, delivered, remaining): outcome is _SENT, _REJECTED
+        (the upstream refused the batch for good) or _FAILED, in which case
+        remaining holds the lines that should be spooled.
+        """
+        delivered = 0
+        last_error = None
+
+        for attempt in range(retries):
+            try:
+                failed, rejected = self._post(lines)
+                self.upstream_up = True
+
+            except PermanentForwardError as e:
+                # Resending the same body cannot succeed; don't spool it.
+                self._count("rejected", len(lines))
+                print(f"[✗] Remote receiver rejected batch of {len(lines)}: {e}")
+                return _REJECTED, delivered, []
+
+            except Exception as e:
+                last_error = e
+
+            else:
+                if rejected:
+                    self._count("rejected", rejected)
+                    print(f"[✗] Remote receiver rejected {rejected} of {len(lines)} items")
+
+                delivered += len(lines) - len(failed) - rejected
+                if not failed:
+                    return _SENT, delivered, []
+
+                last_error = f"remote failed to write {len(failed)} of {len(lines)} items"
+                lines = failed
+
+            if attempt + 1 < retries:
+                self._count("retries")
+                delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+                if self._stop.wait(delay * random.uniform(0.5, 1.0)):
+                    break
+
+        self.upstream_up = False
+        self._next_probe = time.monotonic() + self.probe_interval
+        print(f"[✗] Forward to {self.bulk_route} failed, spooling {len(lines)}: {last_error}")
+        return _FAILED, delivered, lines
+
+    def _deliver(self, batch: list):
+        lines = self._encode(batch)
+
+        if self.upstream_up:
+            outcome, delivered, lines = self._send(lines, retries=self.max_retries)
+
+            if delivered:
+                self._count("sent", delivered)
+                self._count("batches")
+            if outcome != _FAILED:
+                return
+
+        self.spool.append(lines)
+        self._count("spooled", len(lines))
+
+    def _replay(self, max_batches: int = 4):
+        for _ in range(max_batches):
+            if not self.spool.has_data():
+                return
+
+            if not self.upstream_up and time.monotonic() < self._next_probe:
+                return
+
+            lines, offset = self.spool.peek(self.batch_size)
+
+            outcome, delivered, remaining = self._send(lines, retries=1) if lines else (_SENT, 0, [])
+            if outcome == _FAILED and len(remaining) == len(lines):
+                return
+
+            self.spool.commit(offset)
+            self._count("replayed", delivered)
+
+            # Part of the batch went through; the rest goes back to the spool
+            if remaining:
+                self.spool.append(remaining)
+                return
+
+    def _run(self):
+        pending: list = []
+
+        while True:
+            self._fill(pending, time.monotonic() + self.flush_interval)
+
+            if pending:
+                self._deliver(pending)
+                pending = []
+
+            if not self._stop.is_set():
+                self._replay()
+
+            self._maybe_log()
+
+            if self._stop.is_set() and self._queue.empty():
+                return
+
+    def _maybe_log(self, interval: float = 5.0):
+        now = time.monotonic()
+
+        with self._lock:
+            if now - self._metrics["last_log"] < interval:
+                return
+            self._metrics["last_log"] = now
+
+        s = self.stats()
+        print(
+            f"[*] forwarder heartbeat "
+            f"upstream_up={s['upstream_up']} "
+            f"submitted={s['submitted']} "
+            f"sent={s['sent']} "
+            f"batches={s['batches']} "
+            f"retries={s['retries']} "
+            f"spooled={s['spooled']} "
+            f"replayed={s['replayed']} "
+            f"rejected={s['rejected']} "
+            f"dropped={s['dropped']} "
+            f"depth={s['queue_depth']} "
+            f"spool_bytes={s['spool_bytes']}"
+        )
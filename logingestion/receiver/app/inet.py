@@ -1,8 +1,19 @@
 from datetime import datetime, UTC
-import socket
+import asyncio
+import signal
+import sys
 import os
 from modules.database.mongo_db import HerringboneMongoDatabase
-from app.forwarder import forward_data
+from app.forwarder import FORWARD_SPOOL_DIR, DiskSpool, Forwarder
+from app.ingest_buffer import IngestBuffer
+from app.tcp_server import SyslogTCPServer
+from app.udp_server import (
+    UDP_PORT,
+    UDP_WORKERS,
+    DatagramBatchReader,
+    open_udp_socket,
+    run_worker_processes,
+)
 
 forward_route = os.environ.get("FORWARD_ROUTE", None)
 
@@ -23,95 +34,123 @@ def get_mongo():
         return None
 
 
+def build_event(data: str | bytes, addr: str, kind: str, now: datetime | None = None) -> dict:
+    now = now or datetime.now(UTC)
+    return {
+        "raw": data,
+        "source": {
+            "address": addr,
+            "kind": kind,
+        },
+        "event_time": now,
+        "ingested_at": now,
+    }
+
+
+def start_ingest_buffer() -> IngestBuffer | None:
+    mongo = get_mongo()
+    if not mongo:
+        return None
+
+    buffer = IngestBuffer(mongo).start()
+    _exit_on_sigterm()
+    return buffer
+
+
+def start_forwarder(worker_id: int = 0) -> Forwarder:
+    # Each worker process replays only its own spool directory.
+    spool = DiskSpool(os.path.join(FORWARD_SPOOL_DIR, f"worker-{worker_id}"))
+    forwarder = Forwarder(forward_route, spool=spool).start()
+    _exit_on_sigterm()
+    return forwarder
+
+
+def _exit_on_sigterm():
+    # SIGTERM normally kills the process without unwinding; turn it into
+    # SystemExit so the receiver loop's finally block flushes what is queued.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+
 def start_udp_receiver():
     print("Receiver type set to UDP...")
-    udp_receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    udp_receiver.bind(("0.0.0.0", 7004))
-    print("UDP receiver started on port 7004")
-
-    while True:
-        data, addr = udp_receiver.recvfrom(1024)
-        data = data.decode("utf-8")
-        print(f"[Source Address: {addr}] {data}")
-
-        if forward_route is None:
-            mongo = get_mongo()
-            if not mongo:
-                print("UDP receiver exiting due to database init failure.")
-                return
-
-            try:
-                event_id = mongo.insert_event({
-                    "raw": data,
-                    "source": {
-                        "address": addr[0],
-                        "kind": "udp",
-                    },
-                    "event_time": datetime.now(UTC),
-                    "ingested_at": datetime.now(UTC),
-                })
-
-                mongo.upsert_event_state(event_id, {
-                    "parsed": False,
-                    "enriched": False,
-                    "detected": False,
-                    "severity": None,
-                })
-
-                print("[✓] Data received and inserted into MongoDB 200")
-            except Exception as e:
-                print(f"[✗] Mongo insert operation failed: {e}")
-                return (f"Insert failed: {e}", 500)
-        else:
-            result = forward_data(forward_route, data, addr[0])
-            if result:
-                print("[✓] Forward succeed 200")
+
+    if UDP_WORKERS <= 1:
+        run_udp_worker(0, reuse_port=False)
+    else:
+        print(f"Starting {UDP_WORKERS} UDP workers with SO_REUSEPORT")
+        run_worker_processes(run_udp_worker, UDP_WORKERS)
+
+
+def run_udp_worker(worker_id: int, reuse_port: bool = True):
+    udp_receiver = open_udp_socket(port=UDP_PORT, reuse_port=reuse_port)
+    print(f"UDP receiver {worker_id} started on port {UDP_PORT}")
+
+    buffer = None
+    forwarder = None
+
+    if forward_route is None:
+        buffer = start_ingest_buffer()
+        if not buffer:
+            print("UDP receiver exiting due to database init failure.")
+            return
+    else:
+        forwarder = start_forwarder(worker_id)
+
+    reader = DatagramBatchReader(udp_receiver)
+
+    try:
+        while True:
+            batch = reader.read_batch()
+            if not batch:
+                continue
+
+            if buffer is not None:
+                # raw stays as bytes here; IngestBuffer decodes it on flush.
+                now = datetime.now(UTC)
+                accepted = buffer.put_many([build_event(data, addr, "udp", now) for data, addr in batch])
+                if accepted < len(batch):
+                    print(f"[✗] Ingest buffer full, {len(batch) - accepted} events dropped")
             else:
-                print("[✗] Forward failed 500")
+                for data, addr in batch:
+                    if not forwarder.submit(data.decode("utf-8", errors="replace"), addr):
+                        print("[✗] Forward queue full, event dropped")
+    finally:
+        if buffer is not None:
+            buffer.stop()
+        if forwarder is not None:
+            forwarder.stop()
+        udp_receiver.close()
 
 
 def start_tcp_receiver():
     print("Receiver type set to TCP...")
-    tcp_receiver = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    tcp_receiver.bind(("0.0.0.0", 7004))
-    tcp_receiver.listen(5)
-    print("TCP receiver started on port 7004")
-
-    while True:
-        conn, addr = tcp_receiver.accept()
-        data = conn.recv(1024).decode("utf-8")
-        print(f"[Source Address: {addr}] {data}")
-
-        if forward_route is None:
-            mongo = get_mongo()
-            if not mongo:
-                print("TCP receiver exiting due to database init failure.")
-                return
-
-            try:
-                event_id = mongo.insert_event({
-                    "raw": data,
-                    "source": {
-                        "address": addr[0],
-                        "kind": "tcp",
-                    },
-                    "event_time": datetime.now(UTC),
-                    "ingested_at": datetime.now(UTC),
-                })
-
-                mongo.upsert_event_state(event_id, {
-                    "parsed": False,
-                    "enriched": False,
-                    "detected": False,
-                    "severity": None,
-                })
-            except Exception as e:
-                print(f"[✗] Mongo insert operation failed: {e}")
-        else:
-            result = forward_data(forward_route, data, addr[0])
-            if result:
-                return (f"Forward succeed", 200)
-            else:
-                return (f"Forward failed", 500)
 
-        conn.close()
+    buffer = None
+    forwarder = None
+
+    if forward_route is None:
+        buffer = start_ingest_buffer()
+        if not buffer:
+            print("TCP receiver exiting due to database init failure.")
+            return
+
+        def sink(data: str, addr: str):
+            if not buffer.put(build_event(data, addr, "tcp")):
+                print("[✗] Ingest buffer full, event dropped")
+    else:
+        forwarder = start_forwarder()
+
+        def sink(data: str, addr: str):
+            if not forwarder.submit(data, addr):
+                print("[✗] Forward queue full, event dropped")
+
+    server = SyslogTCPServer(sink)
+    print(f"TCP receiver started on port {server.port}")
+
+    try:
+        asyncio.run(server.serve_forever())
+    finally:
+        if buffer is not None:
+            buffer.stop()
+        if forwarder is not None:
+            forwarder.stop()
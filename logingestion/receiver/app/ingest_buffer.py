@@ -0,0 +1,241 @@
+import os
+import queue
+import threading
+import time
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+
+INGEST_BATCH_SIZE = int(os.environ.get("INGEST_BATCH_SIZE", 500))
+INGEST_FLUSH_INTERVAL = float(os.environ.get("INGEST_FLUSH_INTERVAL", 0.5))
+INGEST_QUEUE_SIZE = int(os.environ.get("INGEST_QUEUE_SIZE", 50000))
+INGEST_RETRY_DELAY = float(os.environ.get("INGEST_RETRY_DELAY", 1.0))
+SHUTDOWN_FLUSH_ATTEMPTS = 3
+
+INITIAL_STATE = {
+    "parsed": False,
+    "enriched": False,
+    "detected": False,
+    "severity": None,
+}
+
+
+def _only_duplicate_keys(exc: Exception) -> bool:
+    """
+    True when a bulk insert failed only because some events were already
+    written by a previous attempt of the same batch.
+    """
+    cause = exc if isinstance(exc, BulkWriteError) else exc.__cause__
+    if not isinstance(cause, BulkWriteError):
+        return False
+
+    details = cause.details or {}
+    write_errors = details.get("writeErrors", [])
+
+    return (
+        bool(write_errors)
+        and not details.get("writeConcernErrors")
+        and all(err.get("code") == 11000 for err in write_errors)
+    )
+
+
+class IngestBuffer:
+    """
+    Bounded in-process buffer between a receiver loop and MongoDB.
+
+    put() never blocks: events go onto a bounded queue and a background
+    thread flushes them with one insert_many into events and one bulk write
+    into event_state whenever batch_size events are pending or
+    flush_interval seconds have passed. When the queue is full the event is
+    dropped and counted, so a slow Mongo shows up as back-pressure metrics
+    instead of stalling recvfrom.
+
+    Event _ids are assigned on put() so a failed batch can be retried
+    without duplicating the events that did get written. A raw payload
+    passed as bytes is decoded on the flush thread.
+    """
+
+    def __init__(
+        self,
+        mongo,
+        *,
+        batch_size: int = INGEST_BATCH_SIZE,
+        flush_interval: float = INGEST_FLUSH_INTERVAL,
+        max_queue: int = INGEST_QUEUE_SIZE,
+        retry_delay: float = INGEST_RETRY_DELAY,
+    ):
+        self.mongo = mongo
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.retry_delay = retry_delay
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        self._lock = threading.Lock()
+        self._metrics = {
+            "accepted": 0,
+            "dropped": 0,
+            "flushed": 0,
+            "batches": 0,
+            "flush_failures": 0,
+            "last_flush_ms": 0.0,
+            "last_log": 0.0,
+        }
+
+    # ===========================
+    # Lifecycle
+    # ===========================
+
+    def start(self) -> "IngestBuffer":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ingest-buffer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float | None = 10.0):
+        """
+        Stop accepting work, flush what is queued and wait for the flusher.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # ===========================
+    # Producer side
+    # ===========================
+
+    def put(self, event: dict) -> bool:
+        if self._stop.is_set():
+            self._count("dropped")
+            return False
+
+        event.setdefault("_id", ObjectId())
+
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self._count("dropped")
+            return False
+
+        self._count("accepted")
+        return True
+
+    def put_many(self, events: list[dict]) -> int:
+        """
+        Queue a batch of events; returns how many were accepted.
+        """
+        accepted = 0
+        for event in events:
+            if not self.put(event):
+                break
+            accepted += 1
+
+        if accepted < len(events):
+            self._count("dropped", len(events) - accepted - 1)
+
+        return accepted
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = {k: v for k, v in self._metrics.items() if k != "last_log"}
+        out["queue_depth"] = self._queue.qsize()
+        out["queue_capacity"] = self._queue.maxsize
+        return out
+
+    # ===========================
+    # Flusher side
+    # ===========================
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self._metrics[key] += n
+
+    def _fill(self, pending: list, deadline: float):
+        while len(pending) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0 and not self._stop.is_set():
+                    pending.append(self._queue.get(timeout=remaining))
+                else:
+                    pending.append(self._queue.get_nowait())
+            except queue.Empty:
+                return
+
+    def _flush(self, batch: list) -> bool:
+        started = time.monotonic()
+
+        for ev in batch:
+            raw = ev.get("raw")
+            if isinstance(raw, (bytes, bytearray)):
+                ev["raw"] = raw.decode("utf-8", errors="replace")
+
+        try:
+            try:
+                self.mongo.insert_events(batch)
+            except Exception as e:
+                if not _only_duplicate_keys(e):
+                    raise
+
+            self.mongo.upsert_event_states([(ev["_id"], dict(INITIAL_STATE)) for ev in batch])
+
+        except Exception as e:
+            self._count("flush_failures")
+            print(f"[✗] Mongo bulk insert failed for {len(batch)} events: {e}")
+            return False
+
+        with self._lock:
+            self._metrics["flushed"] += len(batch)
+            self._metrics["batches"] += 1
+            self._metrics["last_flush_ms"] = round((time.monotonic() - started) * 1000, 2)
+
+        return True
+
+    def _run(self):
+        pending: list = []
+        shutdown_failures = 0
+
+        while True:
+            self._fill(pending, time.monotonic() + self.flush_interval)
+
+            if pending:
+                if self._flush(pending):
+                    pending = []
+                elif self._stop.is_set():
+                    shutdown_failures += 1
+                    if shutdown_failures >= SHUTDOWN_FLUSH_ATTEMPTS:
+                        self._count("dropped", len(pending))
+                        print(f"[✗] Dropping {len(pending)} events at shutdown after failed flush")
+                        pending = []
+                    else:
+                        time.sleep(self.retry_delay)
+                else:
+                    self._stop.wait(self.retry_delay)
+
+            self._maybe_log()
+
+            if self._stop.is_set() and not pending and self._queue.empty():
+                return
+
+    def _maybe_log(self, interval: float = 5.0):
+        now = time.monotonic()
+
+        with self._lock:
+            if now - self._metrics["last_log"] < interval:
+                return
+            self._metrics["last_log"] = now
+
+        s = self.stats()
+        print(
+            f"[*] ingest buffer heartbeat "
+            f"accepted={s['accepted']} "
+            f"dropped={s['dropped']} "
+            f"flushed={s['flushed']} "
+            f"batches={s['batches']} "
+            f"flush_failures={s['flush_failures']} "
+            f"depth={s['queue_depth']}/{s['queue_capacity']} "
+            f"last_flush_ms={s['last_flush_ms']}"
+        )
@@ -2,6 +2,16 @@ from flask import Flask, request
 from datetime import datetime, UTC
 import os
 from modules.database.mongo_db import HerringboneMongoDatabase
+from app.bulk import (
+    BULK_MAX_ITEMS,
+    BulkParseError,
+    bulk_response,
+    iter_bulk_items,
+    new_event,
+    request_body,
+    write_events,
+    apply_write_failures,
+)
 
 app = Flask(__name__)
 
@@ -15,19 +25,13 @@ def get_mongo():
         replica_set=os.environ.get("MONGO_REPLICA_SET", None),
     )
 
-@app.route("/logingestion/remote", methods=["POST"])
-def receiver_v2():
-    try:
-        mongo = get_mongo()
-    except Exception as e:
-        print(f"[✗] Mongo connection init failed: {e}")
-        return ("Database not initialized; check server logs for Mongo errors.", 500)
-
-    payload = request.get_json(silent=True) or None
-    print(f"[*] Payload received: {payload}")
 
-    if not payload:
-        return ("No data received", 400)
+def _validate_payload(payload):
+    """
+    Returns (source_addr, data, error) for one forwarded log.
+    """
+    if not payload or not isinstance(payload, dict):
+        return None, None, "No data received"
 
     remote = payload.get("remote_from")
     if (
@@ -35,13 +39,29 @@ def receiver_v2():
         or "source_addr" not in remote
         or not remote["source_addr"]
     ):
-        return ('Missing "remote_from.source_addr"', 400)
+        return None, None, 'Missing "remote_from.source_addr"'
 
-    addr = remote["source_addr"]
     data = payload.get("data")
-
     if data is None:
-        return ('Missing "data"', 400)
+        return None, None, 'Missing "data"'
+
+    return remote["source_addr"], data, None
+
+
+@app.route("/logingestion/remote", methods=["POST"])
+def receiver_v2():
+    try:
+        mongo = get_mongo()
+    except Exception as e:
+        print(f"[✗] Mongo connection init failed: {e}")
+        return ("Database not initialized; check server logs for Mongo errors.", 500)
+
+    payload = request.get_json(silent=True) or None
+    print(f"[*] Payload received: {payload}")
+
+    addr, data, error = _validate_payload(payload)
+    if error:
+        return (error, 400)
 
     print(f"[Source Address: {addr}] {data}")
 
@@ -70,6 +90,53 @@ def receiver_v2():
         return ("Insert failed; check server logs for details.", 500)
 
 
+@app.route("/logingestion/remote/bulk", methods=["POST"])
+def receiver_bulk():
+    """
+    Accepts an NDJSON or JSON array body of {remote_from, data} items and
+    returns per-item status.
+    """
+    try:
+        mongo = get_mongo()
+    except Exception as e:
+        print(f"[✗] Mongo connection init failed: {e}")
+        return ("Database not initialized; check server logs for Mongo errors.", 500)
+
+    now = datetime.now(UTC)
+
+    items = []
+    events = []
+
+    try:
+        for index, (payload, error) in enumerate(iter_bulk_items(request_body(request), request.content_type)):
+            if index >= BULK_MAX_ITEMS:
+                return (f"Too many items; limit is {BULK_MAX_ITEMS}", 413)
+
+            if error is None:
+                addr, data, error = _validate_payload(payload)
+
+            if error:
+                items.append({"index": index, "status": 400, "error": error})
+                continue
+
+            event = new_event(data, addr, "remote", now)
+            events.append(event)
+            items.append({"index": index, "status": 201, "event_id": str(event["_id"])})
+
+    except BulkParseError as e:
+        return (f"Invalid bulk body: {e}", 400)
+
+    if not items:
+        return ("No data received", 400)
+
+    print(f"[*] Bulk payload received: {len(items)} items, {len(events)} valid")
+
+    failed = write_events(mongo, events)
+    apply_write_failures(items, events, failed)
+
+    return bulk_response(items)
+
+
 def start_remote_receiver():
     print("Receiver type set to REMOTE...")
     print("Started on container port 7004")
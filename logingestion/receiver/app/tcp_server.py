@@ -0,0 +1,236 @@
+import asyncio
+import os
+import time
+from typing import Callable, Dict
+
+
+TCP_PORT = int(os.environ.get("TCP_PORT", 7004))
+TCP_BACKLOG = int(os.environ.get("TCP_BACKLOG", 1024))
+TCP_MAX_CONNECTIONS = int(os.environ.get("TCP_MAX_CONNECTIONS", 10000))
+TCP_READ_SIZE = int(os.environ.get("TCP_READ_SIZE", 65536))
+MAX_MESSAGE_SIZE = int(os.environ.get("SYSLOG_MAX_MESSAGE_SIZE", 65536))
+
+# MSG-LEN is at most this many digits before the SP (RFC 6587 3.4.1)
+_MAX_LEN_DIGITS = 10
+
+
+class FramingError(Exception):
+    """Raised when a stream cannot be split into syslog messages."""
+    pass
+
+
+class SyslogFramer:
+    """
+    Incremental splitter for syslog over TCP (RFC 6587).
+
+    Each frame is detected independently, as rsyslog and syslog-ng do:
+      - octet-counted: "MSG-LEN SP SYSLOG-MSG", MSG-LEN starting with 1-9
+      - non-transparent: message terminated by LF (a trailing CR is dropped)
+
+    feed() returns every complete message in the bytes seen so far and
+    keeps any partial frame for the next call.
+    """
+
+    def __init__(self, max_message: int = MAX_MESSAGE_SIZE):
+        self.max_message = max_message
+        self._buf = bytearray()
+
+    def feed(self, data: bytes) -> list[bytes]:
+        self._buf += data
+        out = []
+
+        while self._buf:
+            msg = self._next()
+            if msg is None:
+                break
+            if msg:
+                out.append(msg)
+
+        return out
+
+    def flush(self) -> bytes | None:
+        """
+        Return a trailing unterminated message at end of stream, if any.
+        """
+        tail = bytes(self._buf).strip(b"\r\n\x00")
+        self._buf.clear()
+        return tail or None
+
+    def _next(self) -> bytes | None:
+        buf = self._buf
+
+        if 0x31 <= buf[0] <= 0x39:
+            sp = buf.find(b" ", 0, _MAX_LEN_DIGITS + 1)
+
+            if sp != -1 and buf[:sp].isdigit():
+                length = int(buf[:sp])
+                if length > self.max_message:
+                    raise FramingError(f"octet-counted frame of {length} bytes exceeds limit")
+
+                end = sp + 1 + length
+                if len(buf) < end:
+                    return None
+
+                msg = bytes(buf[sp + 1:end])
+                del buf[:end]
+                return msg
+
+            if sp == -1 and len(buf) <= _MAX_LEN_DIGITS and buf.isdigit():
+                # Could still be the start of a MSG-LEN; wait for more bytes.
+                return None
+
+        nl = buf.find(b"\n")
+        if nl == -1:
+            if len(buf) > self.max_message:
+                raise FramingError(f"unterminated message exceeds {self.max_message} bytes")
+            return None
+
+        msg = bytes(buf[:nl]).rstrip(b"\r\x00")
+        del buf[:nl + 1]
+        return msg
+
+
+class ConnectionStats:
+
+    def __init__(self, addr: str):
+        self.addr = addr
+        self.started = time.monotonic()
+        self.messages = 0
+        self.bytes = 0
+
+    def as_dict(self) -> dict:
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        return {
+            "source": self.addr,
+            "messages": self.messages,
+            "bytes": self.bytes,
+            "duration_sec": round(elapsed, 2),
+            "messages_per_sec": round(self.messages / elapsed, 2),
+            "bytes_per_sec": round(self.bytes / elapsed, 2),
+        }
+
+
+class SyslogTCPServer:
+    """
+    asyncio TCP syslog server.
+
+    Every framed message is passed to sink(message, source_addr); the sink
+    must not block (e.g. IngestBuffer.put).
+    """
+
+    def __init__(
+        self,
+        sink: Callable[[str, str], object],
+        *,
+        host: str = "0.0.0.0",
+        port: int = TCP_PORT,
+        max_connections: int = TCP_MAX_CONNECTIONS,
+        max_message: int = MAX_MESSAGE_SIZE,
+    ):
+        self.sink = sink
+        self.host = host
+        self.port = port
+        self.max_connections = max_connections
+        self.max_message = max_message
+
+        self.connections: Dict[int, ConnectionStats] = {}
+        self._server: asyncio.AbstractServer | None = None
+        self._metrics = {
+            "accepted": 0,
+            "rejected": 0,
+            "framing_errors": 0,
+            "messages": 0,
+        }
+
+    async def start(self):
+        self._server = await asyncio.start_server(
+            self._handle,
+            self.host,
+            self.port,
+            backlog=TCP_BACKLOG,
+            reuse_address=True,
+        )
+        return self._server
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+
+        async with self._server:
+            heartbeat = asyncio.create_task(self._heartbeat())
+            try:
+                await self._server.serve_forever()
+            finally:
+                heartbeat.cancel()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+
+    def connection_stats(self) -> list[dict]:
+        return [c.as_dict() for c in self.connections.values()]
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = writer.get_extra_info("peername") or ("unknown", 0)
+        addr = peer[0]
+
+        if len(self.connections) >= self.max_connections:
+            self._metrics["rejected"] += 1
+            writer.close()
+            return
+
+        self._metrics["accepted"] += 1
+        stats = ConnectionStats(addr)
+        self.connections[id(writer)] = stats
+        framer = SyslogFramer(self.max_message)
+
+        try:
+            while True:
+                chunk = await reader.read(TCP_READ_SIZE)
+                if not chunk:
+                    break
+
+                stats.bytes += len(chunk)
+                for msg in framer.feed(chunk):
+                    self._emit(msg, stats)
+
+            tail = framer.flush()
+            if tail:
+                self._emit(tail, stats)
+
+        except FramingError as e:
+            self._metrics["framing_errors"] += 1
+            print(f"[✗] TCP framing error from {addr}: {e}")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections.pop(id(writer), None)
+            writer.close()
+
+            s = stats.as_dict()
+            print(
+                f"[*] TCP connection closed "
+                f"source={s['source']} "
+                f"messages={s['messages']} "
+                f"bytes={s['bytes']} "
+                f"duration={s['duration_sec']}s "
+                f"rate={s['messages_per_sec']}/s"
+            )
+
+    def _emit(self, msg: bytes, stats: ConnectionStats):
+        stats.messages += 1
+        self._metrics["messages"] += 1
+        self.sink(msg.decode("utf-8", errors="replace"), stats.addr)
+
+    async def _heartbeat(self, interval: float = 5.0):
+        while True:
+            await asyncio.sleep(interval)
+
+            print(
+                f"[*] TCP receiver heartbeat "
+                f"active={len(self.connections)} "
+                f"accepted={self._metrics['accepted']} "
+                f"rejected={self._metrics['rejected']} "
+                f"framing_errors={self._metrics['framing_errors']} "
+                f"messages={self._metrics['messages']}"
+            )
@@ -0,0 +1,129 @@
+import multiprocessing
+import multiprocessing.connection
+import os
+import select
+import signal
+import socket
+import sys
+from typing import Callable
+
+
+UDP_PORT = int(os.environ.get("UDP_PORT", 7004))
+UDP_WORKERS = int(os.environ.get("UDP_WORKERS", 1))
+UDP_BATCH_SIZE = int(os.environ.get("UDP_BATCH_SIZE", 256))
+UDP_RCVBUF = int(os.environ.get("UDP_RCVBUF", 8 * 1024 * 1024))
+
+# Largest UDP payload over IPv4; syslog over UDP can legitimately reach it.
+MAX_DATAGRAM_SIZE = 65535
+
+
+def open_udp_socket(host: str = "0.0.0.0", port: int = UDP_PORT, *, reuse_port: bool = False) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    if reuse_port:
+        # Every worker binds its own socket; the kernel spreads datagrams
+        # across them by flow hash.
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_RCVBUF)
+    except OSError as e:
+        print(f"[!] Could not set SO_RCVBUF={UDP_RCVBUF}: {e}")
+
+    sock.bind((host, port))
+    sock.setblocking(False)
+    return sock
+
+
+class DatagramBatchReader:
+    """
+    Reads datagrams in batches, in the spirit of recvmmsg().
+
+    read_batch() waits until the socket is readable, then drains up to
+    batch_size datagrams with recvfrom_into() into buffers allocated once
+    up front. Payloads are returned as raw bytes; decoding is left to the
+    consumer so it happens off the receive loop.
+    """
+
+    def __init__(self, sock: socket.socket, *, batch_size: int = UDP_BATCH_SIZE, max_datagram: int = MAX_DATAGRAM_SIZE):
+        self.sock = sock
+        self.batch_size = max(1, batch_size)
+        self._buffers = [bytearray(max_datagram) for _ in range(self.batch_size)]
+        self._views = [memoryview(b) for b in self._buffers]
+
+        self._poller = select.poll()
+        self._poller.register(sock.fileno(), select.POLLIN)
+
+        self.datagrams = 0
+        self.batches = 0
+
+    def read_batch(self, timeout: float = 1.0) -> list[tuple[bytes, str]]:
+        if not self._poller.poll(int(timeout * 1000)):
+            return []
+
+        out = []
+        recv_into = self.sock.recvfrom_into
+
+        for view in self._views:
+            try:
+                n, addr = recv_into(view)
+            except (BlockingIOError, InterruptedError):
+                break
+            out.append((view[:n].tobytes(), addr[0]))
+
+        if out:
+            self.datagrams += len(out)
+            self.batches += 1
+
+        return out
+
+
+def _worker_main(target: Callable[[int], None], worker_id: int):
+    # Replace the supervisor's handlers inherited through fork.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    target(worker_id)
+
+
+def run_worker_processes(target: Callable[[int], None], count: int):
+    """
+    Run target(worker_id) in count forked processes and restart any that
+    die until SIGTERM/SIGINT, which is passed on to the workers.
+    """
+    ctx = multiprocessing.get_context("fork")
+    procs: dict[int, multiprocessing.Process] = {}
+    stopping = False
+
+    def spawn(worker_id: int):
+        proc = ctx.Process(
+            target=_worker_main,
+            args=(target, worker_id),
+            name=f"udp-worker-{worker_id}",
+        )
+        proc.start()
+        procs[worker_id] = proc
+        print(f"[*] Started UDP worker {worker_id} (pid {proc.pid})")
+
+    def shutdown(*_):
+        nonlocal stopping
+        stopping = True
+        for proc in procs.values():
+            if proc.is_alive():
+                proc.terminate()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for worker_id in range(count):
+        spawn(worker_id)
+
+    while not stopping:
+        multiprocessing.connection.wait([p.sentinel for p in procs.values()], timeout=1.0)
+
+        for worker_id, proc in list(procs.items()):
+            if not proc.is_alive() and not stopping:
+                print(f"[✗] UDP worker {worker_id} exited with code {proc.exitcode}, restarting")
+                spawn(worker_id)
+
+    for proc in procs.values():
+        proc.join()
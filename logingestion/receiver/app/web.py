@@ -1,14 +1,29 @@
 from flask import Flask, request
 from datetime import datetime, UTC
+import atexit
 import os
+import threading
 
 from modules.database.mongo_db import HerringboneMongoDatabase
-from app.forwarder import forward_data
+from app.forwarder import Forwarder
+from app.bulk import (
+    BULK_MAX_ITEMS,
+    BulkParseError,
+    bulk_response,
+    iter_bulk_items,
+    new_event,
+    request_body,
+    write_events,
+    apply_write_failures,
+)
 
 app = Flask(__name__)
 
 forward_route = os.environ.get("FORWARD_ROUTE", None)
 
+_forwarder = None
+_forwarder_lock = threading.Lock()
+
 
 def get_mongo():
     return HerringboneMongoDatabase(
@@ -21,6 +36,15 @@ def get_mongo():
     )
 
 
+def get_forwarder() -> Forwarder:
+    global _forwarder
+    with _forwarder_lock:
+        if _forwarder is None:
+            _forwarder = Forwarder(forward_route).start()
+            atexit.register(_forwarder.stop)
+        return _forwarder
+
+
 def _client_ip():
     xff = request.headers.getlist("X-Forwarded-For")
     if xff:
@@ -68,11 +92,67 @@ def receiver():
             print(f"[✗] Mongo insert operation failed: {e}")
             return ("Insert failed; check server logs for details.", 500)
     else:
-        result = forward_data(forward_route, data, addr)
-        if result:
-            return ("Forward succeed", 200)
+        if get_forwarder().submit(data, addr):
+            return ("Forward queued", 200)
         else:
-            return ("Forward failed", 500)
+            return ("Forward queue full", 503)
+
+
+@app.route("/logingestion/receiver/bulk", methods=["POST"])
+def receiver_bulk():
+    """
+    Accepts an NDJSON or JSON array body of logs and returns per-item status.
+    """
+    mongo = None
+    if forward_route is None:
+        try:
+            mongo = get_mongo()
+        except Exception as e:
+            return ("Database not initialized; check server logs for Mongo errors.", 500)
+
+    addr = _client_ip()
+    now = datetime.now(UTC)
+
+    items = []
+    events = []
+
+    try:
+        for index, (data, error) in enumerate(iter_bulk_items(request_body(request), request.content_type)):
+            if index >= BULK_MAX_ITEMS:
+                return (f"Too many items; limit is {BULK_MAX_ITEMS}", 413)
+
+            if error is None and not data:
+                error = "No data received"
+
+            if error:
+                items.append({"index": index, "status": 400, "error": error})
+                continue
+
+            event = new_event(data, addr, "http", now)
+            events.append(event)
+            items.append({"index": index, "status": 201, "event_id": str(event["_id"])})
+
+    except BulkParseError as e:
+        return (f"Invalid bulk body: {e}", 400)
+
+    if not items:
+        return ("No data received", 400)
+
+    print(f"[Source Address: {addr}] bulk of {len(items)} items, {len(events)} valid")
+
+    if forward_route is None:
+        failed = write_events(mongo, events)
+        apply_write_failures(items, events, failed)
+    else:
+        forwarder = get_forwarder()
+        by_id = {item.get("event_id"): item for item in items}
+        for event in events:
+            if not forwarder.submit(event["raw"], addr):
+                item = by_id[str(event["_id"])]
+                item.update(status=503, error="Forward queue full")
+                item.pop("event_id", None)
+
+    return bulk_response(items)
 
 
 def start_http_receiver():
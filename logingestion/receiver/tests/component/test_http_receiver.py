@@ -6,3 +6,25 @@ def test_http_receiver_ok(web_client):
 def test_http_receiver_no_body(web_client):
     r = web_client.post("/logingestion/receiver")
     assert r.status_code == 400
+
+
+def test_http_receiver_bulk_ndjson(web_client, fake_mongo):
+    body = '{"msg": "a"}\n{}\n{"msg": "b"}\n'
+    r = web_client.post(
+        "/logingestion/receiver/bulk",
+        data=body,
+        content_type="application/x-ndjson",
+    )
+
+    assert r.status_code == 200
+    out = r.get_json()
+    assert out["accepted"] == 2
+    assert out["rejected"] == 1
+    assert [i["status"] for i in out["items"]] == [201, 400, 201]
+    assert len(fake_mongo.events) == 2
+    assert len(fake_mongo.states) == 2
+
+
+def test_http_receiver_bulk_empty(web_client):
+    r = web_client.post("/logingestion/receiver/bulk", data="[]", content_type="application/json")
+    assert r.status_code == 400
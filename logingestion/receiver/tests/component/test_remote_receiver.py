@@ -10,3 +10,36 @@ def test_remote_receiver_ok(remote_client):
 def test_remote_receiver_missing_source(remote_client):
     r = remote_client.post("/logingestion/remote", json={"data": "x"})
     assert r.status_code == 400
+
+
+def test_remote_receiver_bulk_array(remote_client, fake_mongo):
+    payload = [
+        {"remote_from": {"source_addr": "1.1.1.1"}, "data": "one"},
+        {"data": "missing source"},
+        {"remote_from": {"source_addr": "2.2.2.2"}, "data": "two"},
+    ]
+    r = remote_client.post("/logingestion/remote/bulk", json=payload)
+
+    assert r.status_code == 200
+    out = r.get_json()
+    assert out["accepted"] == 2
+    assert out["items"][1] == {"index": 1, "status": 400, "error": 'Missing "remote_from.source_addr"'}
+    assert [doc["source"]["address"] for _, doc in fake_mongo.events] == ["1.1.1.1", "2.2.2.2"]
+
+
+def test_remote_receiver_bulk_gzip_ndjson(remote_client, fake_mongo):
+    import gzip
+
+    body = gzip.compress(
+        b'{"remote_from": {"source_addr": "3.3.3.3"}, "data": "x"}\n'
+        b'{"remote_from": {"source_addr": "3.3.3.3"}, "data": "y"}\n'
+    )
+    r = remote_client.post(
+        "/logingestion/remote/bulk",
+        data=body,
+        headers={"Content-Encoding": "gzip", "Content-Type": "application/x-ndjson"},
+    )
+
+    assert r.status_code == 200
+    assert r.get_json()["accepted"] == 2
+    assert len(fake_mongo.events) == 2
@@ -0,0 +1,36 @@
+import asyncio
+
+from tcp_server import SyslogTCPServer
+
+
+def test_tcp_server_handles_concurrent_framed_connections():
+    received = []
+
+    async def scenario():
+        server = SyslogTCPServer(lambda msg, addr: received.append((msg, addr)), host="127.0.0.1", port=0)
+        srv = await server.start()
+        port = srv.sockets[0].getsockname()[1]
+
+        async def send(payload: bytes):
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(payload)
+            await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+
+        await asyncio.gather(*[
+            send(b"<13>conn%d a\n<13>conn%d b\n" % (i, i)) for i in range(20)
+        ] + [send(b"9 <13>octet")])
+
+        for _ in range(100):
+            if len(received) == 41 and not server.connections:
+                break
+            await asyncio.sleep(0.01)
+
+        server.close()
+        await srv.wait_closed()
+
+    asyncio.run(scenario())
+
+    assert len(received) == 41
+    assert ("<13>octet", "127.0.0.1") in received
@@ -0,0 +1,37 @@
+import socket
+
+from udp_server import DatagramBatchReader, open_udp_socket
+
+
+def test_batch_reader_drains_full_size_datagrams():
+    sock = open_udp_socket("127.0.0.1", 0, reuse_port=True)
+    port = sock.getsockname()[1]
+    reader = DatagramBatchReader(sock, batch_size=8)
+
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    payloads = [b"<13>small", b"x" * 60000, b"<13>last"]
+    for p in payloads:
+        sender.sendto(p, ("127.0.0.1", port))
+
+    got = []
+    for _ in range(10):
+        got.extend(reader.read_batch(timeout=0.5))
+        if len(got) == len(payloads):
+            break
+
+    sender.close()
+    sock.close()
+
+    assert [data for data, _ in got] == payloads
+    assert all(addr == "127.0.0.1" for _, addr in got)
+
+
+def test_reuse_port_allows_multiple_worker_sockets():
+    first = open_udp_socket("127.0.0.1", 0, reuse_port=True)
+    port = first.getsockname()[1]
+    second = open_udp_socket("127.0.0.1", port, reuse_port=True)
+
+    assert second.getsockname()[1] == port
+
+    first.close()
+    second.close()
@@ -26,6 +26,16 @@ class FakeMongo:
     def upsert_event_state(self, event_id, state):
         self.states.append((event_id, state))
 
+    def insert_events(self, docs):
+        ids = []
+        for doc in docs:
+            self.events.append((doc["_id"], doc))
+            ids.append(doc["_id"])
+        return ids
+
+    def upsert_event_states(self, states):
+        self.states.extend(states)
+
 @pytest.fixture
 def fake_mongo():
     return FakeMongo()
@@ -0,0 +1,143 @@
+import io
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+import bulk
+from bulk import BulkParseError, iter_bulk_items
+
+
+class ChunkedStream(io.BytesIO):
+    """Returns at most n bytes per read, like a socket-backed body."""
+
+    def __init__(self, data: bytes, n: int):
+        super().__init__(data)
+        self.n = n
+
+    def read(self, size=-1):
+        return super().read(min(self.n, size if size > 0 else self.n))
+
+
+def test_ndjson_items_and_bad_line():
+    body = b'{"a": 1}\n\nnot json\n{"b": "caf\xc3\xa9"}'
+    items = list(iter_bulk_items(io.BytesIO(body), "application/x-ndjson"))
+
+    assert items[0] == ({"a": 1}, None)
+    assert items[1][0] is None and items[1][1].startswith("Invalid JSON")
+    assert items[2] == ({"b": "café"}, None)
+
+
+def test_json_array_split_across_small_reads():
+    body = b'[ {"msg": "caf\xc3\xa9"}, 12345, "x", [1, 2] ]'
+    items = list(iter_bulk_items(ChunkedStream(body, 3), "application/json"))
+
+    assert [i for i, _ in items] == [{"msg": "café"}, 12345, "x", [1, 2]]
+
+
+def test_malformed_array_raises():
+    with pytest.raises(BulkParseError):
+        list(iter_bulk_items(io.BytesIO(b'[{"a": 1} {"b": 2}]')))
+
+    with pytest.raises(BulkParseError):
+        list(iter_bulk_items(io.BytesIO(b'[{"a": 1},')))
+
+
+def test_corrupt_gzip_body_is_a_parse_error():
+    import gzip
+
+    body = gzip.compress(b'{"a": 1}\n' * 1000)
+    corrupt = body[:20] + bytes(b ^ 0xFF for b in body[20:60]) + body[60:]
+
+    with pytest.raises(BulkParseError):
+        list(iter_bulk_items(gzip.GzipFile(fileobj=io.BytesIO(corrupt), mode="rb"), "application/x-ndjson"))
+
+    with pytest.raises(BulkParseError):
+        list(iter_bulk_items(gzip.GzipFile(fileobj=io.BytesIO(body[:-30]), mode="rb"), "application/x-ndjson"))
+
+
+def test_many_items_across_chunks():
+    ndjson = b"".join(b'{"n": %d}\n' % i for i in range(5000))
+    array = b"[" + b",".join(b'{"n": %d}' % i for i in range(5000)) + b"]"
+
+    for body, mime in ((ndjson, "application/x-ndjson"), (array, "application/json")):
+        items = list(iter_bulk_items(ChunkedStream(body, 1000), mime))
+        assert [i["n"] for i, _ in items] == list(range(5000))
+
+
+# ===========================
+# write_events
+# ===========================
+
+
+class WriteMongo:
+    def __init__(self, fail_inserts=(), fail_states=0):
+        self.fail_inserts = list(fail_inserts)
+        self.fail_states = fail_states
+        self.events = {}
+        self.states = []
+
+    def insert_events(self, docs):
+        failure = self.fail_inserts.pop(0) if self.fail_inserts else None
+        errors = []
+        for i, doc in enumerate(docs):
+            if failure == "partial" and i == 1:
+                errors.append({"index": i, "code": 121, "errmsg": "Document failed validation"})
+            elif doc["_id"] in self.events:
+                errors.append({"index": i, "code": 11000, "errmsg": "duplicate key"})
+            else:
+                self.events[doc["_id"]] = doc
+            if failure == "connection" and i == 0:
+                raise RuntimeError("MongoDB operation failed: connection reset")
+        if errors:
+            raise RuntimeError("MongoDB operation failed") from BulkWriteError({"writeErrors": errors})
+
+    def upsert_event_states(self, states):
+        if self.fail_states:
+            self.fail_states -= 1
+            raise RuntimeError("MongoDB operation failed: down")
+        self.states.extend(event_id for event_id, _ in states)
+
+
+def _events(n):
+    from datetime import datetime, UTC
+
+    now = datetime.now(UTC)
+    return [bulk.new_event(f"line {i}", "10.0.0.1", "http", now) for i in range(n)]
+
+
+def test_write_events_reports_rejected_items_and_states_the_rest(monkeypatch):
+    monkeypatch.setattr(bulk, "BULK_RETRY_DELAY", 0)
+    mongo = WriteMongo(fail_inserts=["partial"])
+    events = _events(3)
+
+    failed = bulk.write_events(mongo, events)
+
+    assert list(failed) == [1]
+    assert mongo.states == [events[0]["_id"], events[2]["_id"]]
+
+
+def test_write_events_retry_skips_events_already_written(monkeypatch):
+    monkeypatch.setattr(bulk, "BULK_RETRY_DELAY", 0)
+    mongo = WriteMongo(fail_inserts=["connection"])
+    events = _events(3)
+
+    assert bulk.write_events(mongo, events) == {}
+    assert len(mongo.events) == 3
+    assert mongo.states == [ev["_id"] for ev in events]
+
+
+def test_write_events_state_failure_marks_landed_events(monkeypatch):
+    monkeypatch.setattr(bulk, "BULK_RETRY_DELAY", 0)
+    mongo = WriteMongo(fail_states=bulk.BULK_WRITE_ATTEMPTS)
+    events = _events(2)
+
+    failed = bulk.write_events(mongo, events)
+
+    assert sorted(failed) == [0, 1]
+    assert all("state" in error for error in failed.values())
+
+    items = [{"index": i, "status": 201, "event_id": str(ev["_id"])} for i, ev in enumerate(events)]
+    bulk.apply_write_failures(items, events, failed)
+    body, status = bulk.bulk_response(items)
+    assert status == 500
+    assert body["accepted"] == 0
@@ -1,25 +1,194 @@
+import gzip
+import json
+
 import forwarder
 
-def test_forward_data_success(monkeypatch):
-    class FakeResp:
-        content = b"ok"
 
-    monkeypatch.setattr(
-        forwarder.requests,
-        "post",
-        lambda *a, **kw: FakeResp(),
-    )
+class FakeResp:
+    content = b"ok"
+    text = "ok"
+
+    def __init__(self, status_code=200, body=None):
+        self.status_code = status_code
+        self.body = body
+
+    def json(self):
+        if self.body is None:
+            raise ValueError("not json")
+        return self.body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f"HTTP {self.status_code}")
+
+
+class FakeSession:
+    def __init__(self, fail=0, status_code=200, responses=None):
+        self.fail = fail
+        self.status_code = status_code
+        self.responses = list(responses or [])
+        self.bodies = []
+
+    def post(self, url, data=None, headers=None, **kw):
+        if self.fail:
+            self.fail -= 1
+            raise Exception("connection refused")
+        if headers and headers.get("Content-Encoding") == "gzip":
+            data = gzip.decompress(data)
+        self.bodies.append((url, data))
+        if self.responses:
+            return self.responses.pop(0)
+        return FakeResp(self.status_code)
+
+
+def _items(body):
+    return [json.loads(line) for line in body.splitlines()]
+
+
+def test_forward_data_success(monkeypatch):
+    monkeypatch.setattr(forwarder, "get_session", lambda: FakeSession())
 
     ok = forwarder.forward_data("http://example", {"a": 1}, "1.1.1.1")
     assert ok is True
 
 
 def test_forward_data_failure(monkeypatch):
-    monkeypatch.setattr(
-        forwarder.requests,
-        "post",
-        lambda *a, **kw: (_ for _ in ()).throw(Exception("boom")),
-    )
+    monkeypatch.setattr(forwarder, "get_session", lambda: FakeSession(fail=1))
 
     ok = forwarder.forward_data("http://example", {"a": 1}, "1.1.1.1")
     assert ok is False
+
+
+def test_forwarder_batches_and_compresses(monkeypatch, tmp_path):
+    session = FakeSession()
+    monkeypatch.setattr(forwarder, "get_session", lambda: session)
+
+    fwd = forwarder.Forwarder(
+        "http://remote/logingestion/remote",
+        spool=forwarder.DiskSpool(str(tmp_path)),
+        batch_size=3,
+        flush_interval=0.05,
+    ).start()
+
+    for i in range(5):
+        assert fwd.submit(f"line {i}", "10.0.0.1") is True
+    fwd.stop()
+
+    urls = {url for url, _ in session.bodies}
+    assert urls == {"http://remote/logingestion/remote/bulk"}
+
+    sent = [item for _, body in session.bodies for item in _items(body)]
+    assert [i["data"] for i in sent] == [f"line {i}" for i in range(5)]
+    assert sent[0]["remote_from"] == {"source_addr": "10.0.0.1"}
+    assert fwd.stats()["sent"] == 5
+
+
+def test_forwarder_spools_when_upstream_down_and_replays(monkeypatch, tmp_path):
+    session = FakeSession(fail=2)
+    monkeypatch.setattr(forwarder, "get_session", lambda: session)
+
+    fwd = forwarder.Forwarder(
+        "http://remote/logingestion/remote",
+        spool=forwarder.DiskSpool(str(tmp_path)),
+        flush_interval=0.01,
+        max_retries=2,
+        backoff_base=0.0,
+    )
+
+    fwd._deliver([("first", "10.0.0.1")])
+
+    assert fwd.upstream_up is False
+    assert fwd.stats()["spooled"] == 1
+    assert session.bodies == []
+
+    # A new batch while down goes straight to the spool.
+    fwd._deliver([("second", "10.0.0.1")])
+    assert fwd.stats()["spooled"] == 2
+
+    fwd._next_probe = 0
+    fwd._replay()
+
+    assert fwd.upstream_up is True
+    assert fwd.spool.has_data() is False
+    replayed = [item["data"] for _, body in session.bodies for item in _items(body)]
+    assert replayed == ["first", "second"]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_spool_survives_restart(tmp_path):
+    spool = forwarder.DiskSpool(str(tmp_path))
+    spool.append([b'{"n": 1}\n', b'{"n": 2}\n'])
+    spool.close()
+
+    reopened = forwarder.DiskSpool(str(tmp_path))
+    lines, offset = reopened.peek(1)
+    assert lines == [b'{"n": 1}\n']
+
+    reopened.commit(offset)
+    lines, offset = reopened.peek(10)
+    assert lines == [b'{"n": 2}\n']
+
+    reopened.commit(offset)
+    assert reopened.has_data() is False
+
+
+def test_forwarder_drops_permanently_rejected_batch(monkeypatch, tmp_path):
+    session = FakeSession(status_code=400)
+    monkeypatch.setattr(forwarder, "get_session", lambda: session)
+
+    fwd = forwarder.Forwarder("http://remote/x", spool=forwarder.DiskSpool(str(tmp_path)))
+    fwd._deliver([("bad", "1.1.1.1")])
+
+    assert fwd.stats()["rejected"] == 1
+    assert fwd.stats()["sent"] == 0
+    assert fwd.stats()["batches"] == 0
+    assert fwd.spool.has_data() is False
+
+
+def _bulk_resp(*statuses):
+    items = [{"index": i, "status": status} for i, status in enumerate(statuses)]
+    accepted = sum(1 for status in statuses if status == 201)
+    return FakeResp(200 if accepted else 500, {"accepted": accepted, "items": items})
+
+
+def test_forwarder_resends_items_the_remote_failed_to_write(monkeypatch, tmp_path):
+    # 200 for the batch, but the remote could not write "b" and refused "c"
+    session = FakeSession(responses=[_bulk_resp(201, 500, 400, 201), _bulk_resp(201)])
+    monkeypatch.setattr(forwarder, "get_session", lambda: session)
+
+    fwd = forwarder.Forwarder(
+        "http://remote/x",
+        spool=forwarder.DiskSpool(str(tmp_path)),
+        backoff_base=0.0,
+    )
+    fwd._deliver([(d, "1.1.1.1") for d in ("a", "b", "c", "d")])
+
+    posted = [[item["data"] for item in _items(body)] for _, body in session.bodies]
+    assert posted == [["a", "b", "c", "d"], ["b"]]
+
+    s = fwd.stats()
+    assert s["sent"] == 3
+    assert s["rejected"] == 1
+    assert s["retries"] == 1
+    assert s["spooled"] == 0
+    assert fwd.spool.has_data() is False
+
+
+def test_forwarder_spools_items_the_remote_keeps_failing(monkeypatch, tmp_path):
+    session = FakeSession(responses=[_bulk_resp(201, 500), _bulk_resp(500)])
+    monkeypatch.setattr(forwarder, "get_session", lambda: session)
+
+    fwd = forwarder.Forwarder(
+        "http://remote/x",
+        spool=forwarder.DiskSpool(str(tmp_path)),
+        max_retries=2,
+        backoff_base=0.0,
+    )
+    fwd._deliver([("a", "1.1.1.1"), ("b", "1.1.1.1")])
+
+    assert fwd.upstream_up is False
+    assert fwd.stats()["sent"] == 1
+    assert fwd.stats()["spooled"] == 1
+
+    lines, _ = fwd.spool.peek(10)
+    assert [json.loads(line)["data"] for line in lines] == ["b"]
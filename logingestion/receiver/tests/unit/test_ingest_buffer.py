@@ -0,0 +1,58 @@
+from ingest_buffer import IngestBuffer
+
+
+def test_buffer_flushes_events_and_states_in_batches(fake_mongo):
+    buf = IngestBuffer(fake_mongo, batch_size=2, flush_interval=0.05).start()
+
+    for i in range(5):
+        assert buf.put({"raw": f"line {i}"}) is True
+
+    buf.stop()
+
+    assert len(fake_mongo.events) == 5
+    assert len(fake_mongo.states) == 5
+    assert [eid for eid, _ in fake_mongo.events] == [eid for eid, _ in fake_mongo.states]
+    assert all(state["parsed"] is False for _, state in fake_mongo.states)
+
+    stats = buf.stats()
+    assert stats["flushed"] == 5
+    assert stats["batches"] >= 3
+    assert stats["dropped"] == 0
+
+
+def test_buffer_drops_when_queue_full(fake_mongo):
+    buf = IngestBuffer(fake_mongo, max_queue=1)
+
+    assert buf.put({"raw": "a"}) is True
+    assert buf.put({"raw": "b"}) is False
+    assert buf.stats()["dropped"] == 1
+
+
+def test_buffer_retries_failed_flush(fake_mongo):
+    calls = {"n": 0}
+    insert_events = fake_mongo.insert_events
+
+    def flaky(docs):
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise RuntimeError("MongoDB operation failed: down")
+        return insert_events(docs)
+
+    fake_mongo.insert_events = flaky
+
+    buf = IngestBuffer(fake_mongo, batch_size=10, flush_interval=0.01, retry_delay=0.01).start()
+    buf.put({"raw": "a"})
+    buf.stop()
+
+    assert len(fake_mongo.events) == 1
+    assert buf.stats()["flush_failures"] == 1
+
+
+def test_put_many_decodes_raw_bytes_on_flush(fake_mongo):
+    buf = IngestBuffer(fake_mongo, flush_interval=0.01).start()
+
+    assert buf.put_many([{"raw": b"<13>caf\xc3\xa9"}, {"raw": b"\xff"}]) == 2
+    buf.stop()
+
+    raws = [doc["raw"] for _, doc in fake_mongo.events]
+    assert raws == ["<13>café", "�"]
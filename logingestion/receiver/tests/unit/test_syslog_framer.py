@@ -0,0 +1,36 @@
+import pytest
+
+from tcp_server import FramingError, SyslogFramer
+
+
+def test_newline_framing_strips_crlf():
+    framer = SyslogFramer()
+    assert framer.feed(b"<13>one\r\n<13>two\n") == [b"<13>one", b"<13>two"]
+
+
+def test_octet_counted_framing_across_chunks():
+    framer = SyslogFramer()
+    msg = b"<13>hello\nworld"
+
+    assert framer.feed(b"1") == []
+    assert framer.feed(b"5 " + msg[:4]) == []
+    assert framer.feed(msg[4:] + b"4 <1>") == [msg]
+    assert framer.feed(b"x") == [b"<1>x"]
+
+
+def test_mixed_framing_and_trailing_message():
+    framer = SyslogFramer()
+    out = framer.feed(b"4 <1>a<13>line\n<13>tail")
+
+    assert out == [b"<1>a", b"<13>line"]
+    assert framer.flush() == b"<13>tail"
+
+
+def test_oversized_frame_rejected():
+    framer = SyslogFramer(max_message=8)
+
+    with pytest.raises(FramingError):
+        framer.feed(b"100 <13>")
+
+    with pytest.raises(FramingError):
+        SyslogFramer(max_message=8).feed(b"<13>no newline here")
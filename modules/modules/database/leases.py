@@ -0,0 +1,139 @@
+import threading
+
+
+class LeaseKeeper:
+    """
+    Keeps leases taken with HerringboneMongoDatabase.claim_batch() alive
+    while their documents are being worked on.
+
+    A background thread renews every held lease each lease_seconds / 3
+    seconds, so a batch that takes longer than one lease (slow extractor,
+    backed-up queues) is not claimed again by another worker halfway
+    through. Documents are held with add() and let go with discard() once
+    their result is written; hold() does both around a block.
+
+    A renewal that fails is retried on the next tick; leases that already
+    passed to another worker are reported in stats() as lost.
+    """
+
+    def __init__(self, mongo, collection: str, *, owner: str, lease_field: str, lease_seconds: float):
+        self.mongo = mongo
+        self.collection = collection
+        self.owner = owner
+        self.lease_field = lease_field
+        self.lease_seconds = lease_seconds
+        self.interval = max(0.1, lease_seconds / 3)
+
+        self._held = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        self._metrics = {
+            "renewals": 0,
+            "renew_failures": 0,
+            "lost": 0,
+        }
+
+    # ===========================
+    # Lifecycle
+    # ===========================
+
+    def start(self) -> "LeaseKeeper":
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f"{self.lease_field}-keeper", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float | None = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    # ===========================
+    # Held documents
+    # ===========================
+
+    def add(self, ids):
+        with self._lock:
+            self._held.update(ids)
+
+    def discard(self, ids):
+        with self._lock:
+            self._held.difference_update(ids)
+
+    def hold(self, ids):
+        return _Held(self, list(ids))
+
+    def held(self) -> int:
+        with self._lock:
+            return len(self._held)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._metrics, "held": len(self._held)}
+
+    # ===========================
+    # Renewal
+    # ===========================
+
+    def renew(self) -> int:
+        with self._lock:
+            ids = list(self._held)
+
+        if not ids:
+            return 0
+
+        try:
+            renewed = self.mongo.renew_leases(
+                self.collection,
+                ids,
+                owner=self.owner,
+                lease_field=self.lease_field,
+                lease_seconds=self.lease_seconds,
+            )
+        except Exception as e:
+            with self._lock:
+                self._metrics["renew_failures"] += 1
+            print(f"[✗] Failed to renew {len(ids)} {self.lease_field} leases: {e}")
+            return 0
+
+        # Documents finished meanwhile were released, not lost; only count
+        # the shortfall among those still held
+        with self._lock:
+            self._metrics["renewals"] += 1
+            still_held = sum(1 for i in ids if i in self._held)
+            lost = max(0, still_held - renewed)
+            self._metrics["lost"] += lost
+
+        if lost:
+            print(f"[!] {lost} {self.lease_field} leases expired before they could be renewed")
+
+        return renewed
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.renew()
+
+
+class _Held:
+    def __init__(self, keeper: LeaseKeeper, ids: list):
+        self.keeper = keeper
+        self.ids = ids
+
+    def __enter__(self):
+        self.keeper.add(self.ids)
+        return self
+
+    def __exit__(self, *exc):
+        self.keeper.discard(self.ids)
+        return False
@@ -1,14 +1,140 @@
 from __future__ import annotations
 
+import atexit
 import inspect
 import ipaddress
+import os
+import re
+import threading
+import time
+import uuid
 from urllib.parse import quote_plus
 from functools import wraps
-from typing import Any, Dict, Iterable, Tuple
-from datetime import datetime, UTC
+from typing import Any, Dict, Iterable, List, Tuple
+from datetime import datetime, timedelta, UTC
 import codecs
 
-from pymongo import MongoClient, errors
+from pymongo import MongoClient, ReturnDocument, UpdateOne, errors
+
+
+# ===========================
+# Client Pool
+# ===========================
+
+MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", 50))
+MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", 0))
+MAX_IDLE_TIME_MS = int(os.environ.get("MONGO_MAX_IDLE_TIME_MS", 60000))
+HEALTH_CHECK_INTERVAL = float(os.environ.get("MONGO_HEALTH_CHECK_INTERVAL", 30.0))
+
+# Per-collection change counters used by services that cache a collection
+VERSIONS_COLLECTION = "collection_versions"
+
+
+class _PooledClient:
+    """
+    One shared MongoClient per (uri, max pool size), plus health bookkeeping.
+
+    PyMongo clients are thread-safe and own their own connection pool, so a
+    single instance is reused by every HerringboneMongoDatabase in the process.
+    Idle sockets are reaped by the driver via maxIdleTimeMS.
+    """
+
+    def __init__(self, uri: str, max_pool_size: int):
+        self.client = MongoClient(
+            uri,
+            serverSelectionTimeoutMS=5000,
+            retryWrites=True,
+            maxPoolSize=max_pool_size,
+            minPoolSize=min(MIN_POOL_SIZE, max_pool_size),
+            maxIdleTimeMS=MAX_IDLE_TIME_MS,
+            connect=False,
+        )
+        self.max_pool_size = max_pool_size
+        self.created_at = time.monotonic()
+        self.healthy = False
+        self.last_ping = 0.0
+        self.failures = 0
+        self.last_error: str | None = None
+
+    def needs_ping(self) -> bool:
+        return not self.healthy or time.monotonic() - self.last_ping > HEALTH_CHECK_INTERVAL
+
+    def mark_healthy(self):
+        self.healthy = True
+        self.last_ping = time.monotonic()
+
+    def mark_failed(self, error: Exception):
+        self.healthy = False
+        self.failures += 1
+        self.last_error = str(error)
+
+
+_pool_lock = threading.Lock()
+_pools: Dict[Tuple[str, int], _PooledClient] = {}
+
+
+def _get_pooled_client(uri: str, max_pool_size: int) -> _PooledClient:
+    key = (uri, max_pool_size)
+
+    with _pool_lock:
+        entry = _pools.get(key)
+        if entry is None:
+            entry = _PooledClient(uri, max_pool_size)
+            _pools[key] = entry
+        return entry
+
+
+def _reset_pools_after_fork():
+    # Sockets inherited from the parent must not be reused (or closed) in
+    # the child; drop the references and let each process build its own.
+    global _pool_lock
+    _pool_lock = threading.Lock()
+    _pools.clear()
+
+
+def close_all_pools():
+    with _pool_lock:
+        entries = list(_pools.values())
+        _pools.clear()
+
+    for entry in entries:
+        try:
+            entry.client.close()
+        except Exception:
+            pass
+
+
+def _redact_uri(uri: str) -> str:
+    return re.sub(r"//[^@/]*@", "//***@", uri)
+
+
+def pool_stats() -> List[Dict[str, Any]]:
+    """
+    Snapshot of every pooled client in this process, with credentials redacted.
+    """
+    now = time.monotonic()
+
+    with _pool_lock:
+        items = list(_pools.items())
+
+    return [
+        {
+            "uri": _redact_uri(uri),
+            "max_pool_size": entry.max_pool_size,
+            "healthy": entry.healthy,
+            "failures": entry.failures,
+            "last_error": entry.last_error,
+            "age_sec": round(now - entry.created_at, 1),
+            "since_last_ping_sec": round(now - entry.last_ping, 1) if entry.last_ping else None,
+        }
+        for (uri, _), entry in items
+    ]
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pools_after_fork)
+
+atexit.register(close_all_pools)
 
 
 # ===========================
@@ -31,6 +157,10 @@ def with_connection(method):
 
             return method(self, *args, **kwargs)
 
+        except errors.ConnectionFailure as e:
+            if self._pool is not None:
+                self._pool.mark_failed(e)
+            raise RuntimeError(f"MongoDB operation failed: {e}") from e
         except errors.PyMongoError as e:
             raise RuntimeError(f"MongoDB operation failed: {e}") from e
         finally:
@@ -92,6 +222,9 @@ class HerringboneMongoDatabase:
       - parse_results
       - enrichment_results
       - detections
+
+    Connections come from a process-wide client pool keyed by URI, so
+    creating many instances (e.g. one per request) is cheap.
     """
 
     def __init__(
@@ -104,6 +237,7 @@ class HerringboneMongoDatabase:
         port: int = 27017,
         auth_source: str = "admin",
         replica_set: str | None = None,
+        max_pool_size: int | None = None,
     ):
         host_only, parsed_port = _split_host_port_if_present(host)
         port_final = parsed_port if parsed_port is not None else port
@@ -132,37 +266,41 @@ class HerringboneMongoDatabase:
         self.uri = f"mongodb://{auth_block}{host_fmt}:{port_final}/{quote_plus(database)}{qp}"
 
         self.database = database
+        self.max_pool_size = max_pool_size or MAX_POOL_SIZE
 
         self.client: MongoClient | None = None
         self.db = None
+        self._pool: _PooledClient | None = None
 
     # ===========================
     # Connection Management
     # ===========================
 
     def open_mongo_connection(self):
-        try:
-            self.client = MongoClient(
-                self.uri,
-                serverSelectionTimeoutMS=5000,
-                retryWrites=True,
-            )
-            self.client.admin.command("ping")
-            self.db = self.client[self.database]
-            return self.client, self.db
-
-        except errors.ServerSelectionTimeoutError as e:
-            raise RuntimeError(f"MongoDB server unreachable: {e}") from e
-        except errors.OperationFailure as e:
-            raise RuntimeError(f"MongoDB authentication failed: {e}") from e
+        pool = _get_pooled_client(self.uri, self.max_pool_size)
+        self._pool = pool
 
-    def close_mongo_connection(self):
-        if self.client:
+        # Ping only on first use, after a failure, or once per health interval
+        # instead of on every operation.
+        if pool.needs_ping():
             try:
-                self.client.close()
-            finally:
-                self.client = None
-                self.db = None
+                pool.client.admin.command("ping")
+                pool.mark_healthy()
+            except errors.ServerSelectionTimeoutError as e:
+                pool.mark_failed(e)
+                raise RuntimeError(f"MongoDB server unreachable: {e}") from e
+            except errors.OperationFailure as e:
+                pool.mark_failed(e)
+                raise RuntimeError(f"MongoDB authentication failed: {e}") from e
+
+        self.client = pool.client
+        self.db = self.client[self.database]
+        return self.client, self.db
+
+    def close_mongo_connection(self):
+        # The client is shared by the process pool; only drop our references.
+        self.client = None
+        self.db = None
 
     # ===========================
     # Sanitization
@@ -195,9 +333,13 @@ class HerringboneMongoDatabase:
         return mongo_db[collection].insert_one(payload).inserted_id
 
     @with_connection
-    def insert_many(self, collection: str, docs: Iterable[dict], *, clean_codec: bool = False, mongo_db):
+    def insert_many(self, collection: str, docs: Iterable[dict], *, clean_codec: bool = False, ordered: bool = True, mongo_db):
         payload = [self._sanitize_payload(d) if clean_codec else dict(d) for d in docs]
-        return mongo_db[collection].insert_many(payload).inserted_ids
+        return mongo_db[collection].insert_many(payload, ordered=ordered).inserted_ids
+
+    @with_connection
+    def bulk_write(self, collection: str, operations: Iterable, *, ordered: bool = False, mongo_db):
+        return mongo_db[collection].bulk_write(list(operations), ordered=ordered)
 
     @with_connection
     def upsert_one(self, collection: str, filter_query: dict, update_fields: dict, *, clean_codec: bool = False, mongo_db):
@@ -234,6 +376,101 @@ class HerringboneMongoDatabase:
     ):
         return mongo_db[collection].update_one(filter_query, update_query)
 
+    @with_connection
+    def claim_batch(
+        self,
+        collection: str,
+        filter_query: dict,
+        *,
+        owner: str,
+        lease_field: str,
+        lease_seconds: float,
+        limit: int,
+        sort: list | None = None,
+        mongo_db,
+    ):
+        """
+        Lease up to `limit` documents matching filter_query to `owner`.
+
+        A document is claimable while `lease_field` is unset/None or its
+        lease has expired. Candidates are read first, then leased with one
+        update_many that re-checks claimability per document, so concurrent
+        workers never receive the same document. Workers release a lease by
+        setting `lease_field` to None when they are done.
+        """
+        coll = mongo_db[collection]
+        now = datetime.now(UTC)
+
+        claimable = {
+            "$and": [
+                filter_query,
+                {"$or": [
+                    {lease_field: None},
+                    {f"{lease_field}.expires": {"$lt": now}},
+                ]},
+            ]
+        }
+
+        cur = coll.find(claimable, {"_id": 1})
+        if sort:
+            cur = cur.sort(sort)
+        ids = [d["_id"] for d in cur.limit(limit)]
+
+        if not ids:
+            return []
+
+        claim_id = uuid.uuid4().hex
+        coll.update_many(
+            {"$and": [{"_id": {"$in": ids}}, claimable]},
+            {"$set": {lease_field: {
+                "owner": owner,
+                "claim_id": claim_id,
+                "expires": now + timedelta(seconds=lease_seconds),
+            }}},
+        )
+
+        cur = coll.find({f"{lease_field}.claim_id": claim_id})
+        if sort:
+            cur = cur.sort(sort)
+        return list(cur)
+
+    @with_connection
+    def renew_leases(
+        self,
+        collection: str,
+        ids: Iterable,
+        *,
+        owner: str,
+        lease_field: str,
+        lease_seconds: float,
+        mongo_db,
+    ) -> int:
+        """
+        Push back the expiry of leases `owner` still holds on the given _ids.
+
+        Documents whose lease has passed to another worker (or was released)
+        are left alone; returns how many leases were extended.
+        """
+        ids = list(ids)
+        if not ids:
+            return 0
+
+        res = mongo_db[collection].update_many(
+            {"_id": {"$in": ids}, f"{lease_field}.owner": owner},
+            {"$set": {f"{lease_field}.expires": datetime.now(UTC) + timedelta(seconds=lease_seconds)}},
+        )
+        return res.modified_count
+
+    @with_connection
+    def wait_for_change(self, collection: str, *, pipeline: list | None = None, timeout: float = 1.0, mongo_db) -> bool:
+        """
+        Block up to `timeout` seconds for a change on collection.
+
+        Needs a replica set; raises RuntimeError on a standalone server.
+        """
+        with mongo_db[collection].watch(pipeline or [], max_await_time_ms=int(timeout * 1000)) as stream:
+            return stream.try_next() is not None
+
     @with_connection
     def delete_one(
         self,
@@ -244,6 +481,24 @@ class HerringboneMongoDatabase:
     ):
         return mongo_db[collection].delete_one(filter_query)
 
+    @with_connection
+    def bump_version(self, name: str, *, mongo_db) -> int:
+        """
+        Increment and return the change counter for name (usually a collection).
+        """
+        doc = mongo_db[VERSIONS_COLLECTION].find_one_and_update(
+            {"_id": name},
+            {"$inc": {"version": 1}, "$set": {"last_updated": datetime.now(UTC)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return doc["version"]
+
+    @with_connection
+    def get_version(self, name: str, *, mongo_db) -> int | None:
+        doc = mongo_db[VERSIONS_COLLECTION].find_one({"_id": name}, {"version": 1})
+        return doc.get("version") if doc else None
+
     # ===========================
     # Canonical Herringbone APIs
     # ===========================
@@ -255,6 +510,19 @@ class HerringboneMongoDatabase:
         state["last_updated"] = datetime.now(UTC)
         return self.upsert_one("event_state", {"event_id": event_id}, state)
 
+    def insert_events(self, events: Iterable[dict]):
+        return self.insert_many("events", events, ordered=False)
+
+    def upsert_event_states(self, states: Iterable[Tuple[Any, dict]]):
+        now = datetime.now(UTC)
+        ops = [
+            UpdateOne({"event_id": event_id}, {"$set": {**state, "last_updated": now}}, upsert=True)
+            for event_id, state in states
+        ]
+        if not ops:
+            return None
+        return self.bulk_write("event_state", ops, ordered=False)
+
     def insert_parse_result(self, result: dict):
         return self.insert_one("parse_results", result)
 
@@ -0,0 +1,137 @@
+from collections import deque
+from typing import Dict, Hashable, Iterable, Iterator, List, Set, Tuple
+
+
+class AhoCorasick:
+    """
+    Aho–Corasick automaton for finding many literal substrings in one pass.
+
+    Patterns are added with add(pattern, key), then build() computes the
+    failure links. search(text) walks the text once and yields
+    (end_index, key) for every occurrence; keys(text) returns the set of
+    keys whose pattern occurs at least once. Several patterns may share a
+    key and one pattern may carry several keys.
+
+    Matching is case-sensitive unless ignore_case is set, in which case
+    both patterns and text are casefolded.
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, Hashable]] = (), *, ignore_case: bool = False):
+        self.ignore_case = ignore_case
+
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[Hashable, ...]] = [()]
+        self._empty: List[Hashable] = []
+        self._size = 0
+        self._built = True
+
+        for pattern, key in patterns:
+            self.add(pattern, key)
+
+        self.build()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, pattern: str, key: Hashable = None):
+        if key is None:
+            key = pattern
+
+        self._size += 1
+        self._built = False
+
+        if not pattern:
+            # The empty string occurs in every text.
+            self._empty.append(key)
+            return
+
+        if self.ignore_case:
+            pattern = pattern.casefold()
+
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            node = nxt
+
+        self._out[node] = self._out[node] + (key,)
+
+    def build(self) -> "AhoCorasick":
+        goto, fail, out = self._goto, self._fail, self._out
+
+        queue = deque()
+        for nxt in goto[0].values():
+            fail[nxt] = 0
+            queue.append(nxt)
+
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in goto[node].items():
+                queue.append(nxt)
+
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                f = goto[f].get(ch, 0)
+                fail[nxt] = f if f != nxt else 0
+
+                # Fold the suffix outputs in, so search() never walks the
+                # failure chain just to report matches.
+                if out[fail[nxt]]:
+                    out[nxt] = out[nxt] + out[fail[nxt]]
+
+        self._built = True
+        return self
+
+    def search(self, text: str) -> Iterator[Tuple[int, Hashable]]:
+        if not self._built:
+            self.build()
+
+        for key in self._empty:
+            yield 0, key
+
+        if self.ignore_case:
+            text = text.casefold()
+
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+
+            if out[node]:
+                for key in out[node]:
+                    yield i + 1, key
+
+    def keys(self, text: str) -> Set[Hashable]:
+        """
+        Distinct keys whose pattern occurs anywhere in text.
+        """
+        if not self._built:
+            self.build()
+
+        found = set(self._empty)
+
+        if self.ignore_case:
+            text = text.casefold()
+
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+
+            if out[node]:
+                found.update(out[node])
+
+        return found
@@ -0,0 +1,170 @@
+import re
+from typing import FrozenSet, List, Tuple
+
+try:
+    from re import _constants as _sre
+    from re import _parser as _sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants as _sre
+    import sre_parse as _sre_parse
+
+
+# Shorter literals occur in too many logs to be worth filtering on
+MIN_LITERAL_LENGTH = 3
+MAX_ALTERNATIVES = 32
+_MAX_LITERAL_LENGTH = 256
+
+_REPEATS = {_sre.MAX_REPEAT, _sre.MIN_REPEAT}
+_ZERO_WIDTH = {_sre.AT, _sre.ASSERT_NOT}
+
+
+def _single_char(node) -> str | None:
+    op, av = node
+
+    if op is _sre.LITERAL:
+        return chr(av)
+
+    if op is _sre.IN and len(av) == 1 and av[0][0] is _sre.LITERAL:
+        return chr(av[0][1])
+
+    return None
+
+
+def _score(alternatives: FrozenSet[str]) -> Tuple[int, int]:
+    # Longest shortest-alternative first, then fewest alternatives
+    return (min(len(s) for s in alternatives), -len(alternatives))
+
+
+def _best(candidates: List[FrozenSet[str]]) -> FrozenSet[str] | None:
+    usable = [c for c in candidates if c and len(c) <= MAX_ALTERNATIVES and all(c)]
+    return max(usable, key=_score) if usable else None
+
+
+def _analyze(seq) -> Tuple[str | None, FrozenSet[str] | None]:
+    """
+    (exact, required) for a parsed sequence: exact is the one string the
+    sequence always matches, if there is one; required is a set of strings
+    at least one of which occurs in every match (or None).
+    """
+    candidates: List[FrozenSet[str]] = []
+    run = ""
+    exact = True
+
+    def flush():
+        nonlocal run
+        if run:
+            candidates.append(frozenset([run]))
+        run = ""
+
+    for node in seq:
+        op, av = node
+
+        ch = _single_char(node)
+        if ch is not None:
+            run += ch
+            continue
+
+        if op in _ZERO_WIDTH:
+            # Consumes nothing, so the literals either side stay adjacent
+            continue
+
+        if op is _sre.ASSERT:
+            _, sub_required = _analyze(av[1])
+            if sub_required:
+                candidates.append(sub_required)
+            continue
+
+        if op is _sre.SUBPATTERN:
+            _, add_flags, _, body = av
+            if add_flags & _sre.SRE_FLAG_IGNORECASE:
+                flush()
+                exact = False
+                continue
+
+            sub_exact, sub_required = _analyze(body)
+            if sub_exact is not None:
+                run += sub_exact
+                continue
+
+            flush()
+            exact = False
+            if sub_required:
+                candidates.append(sub_required)
+            continue
+
+        if op in _REPEATS:
+            lo, hi, body = av
+            sub_exact, sub_required = _analyze(body)
+
+            if sub_exact is not None and lo == hi and len(sub_exact) * lo <= _MAX_LITERAL_LENGTH:
+                run += sub_exact * lo
+                continue
+
+            flush()
+            exact = False
+            if lo >= 1:
+                if sub_exact:
+                    candidates.append(frozenset([sub_exact]))
+                elif sub_required:
+                    candidates.append(sub_required)
+            continue
+
+        if op is _sre.BRANCH:
+            flush()
+            exact = False
+
+            alternatives = set()
+            for branch in av[1]:
+                sub_exact, sub_required = _analyze(branch)
+                if sub_exact:
+                    alternatives.add(sub_exact)
+                elif sub_required:
+                    alternatives.update(sub_required)
+                else:
+                    alternatives = None
+                    break
+
+            if alternatives:
+                candidates.append(frozenset(alternatives))
+            continue
+
+        flush()
+        exact = False
+
+    whole = run if exact else None
+    flush()
+
+    return whole, _best(candidates)
+
+
+def required_literals(pattern: str, flags: int = 0) -> Tuple[FrozenSet[str] | None, bool]:
+    """
+    Literal strings, at least one of which appears in any text the pattern
+    can match, and whether they must be compared case-insensitively.
+
+    Returns (None, False) when no useful set can be derived (no literal of
+    at least MIN_LITERAL_LENGTH characters is required). The result is only
+    a prefilter: a text containing a literal may still not match.
+    """
+    try:
+        parsed = _sre_parse.parse(pattern, flags)
+    except (re.error, OverflowError, RecursionError, TypeError):
+        return None, False
+
+    ignore_case = bool(parsed.state.flags & _sre.SRE_FLAG_IGNORECASE)
+
+    exact, required = _analyze(list(parsed))
+    if exact:
+        required = frozenset([exact])
+
+    if not required or min(len(s) for s in required) < MIN_LITERAL_LENGTH:
+        return None, False
+
+    if ignore_case:
+        # Unicode case folding has matches (e.g. "ſ" for "s") that a simple
+        # casefold comparison misses; callers skip the filter for
+        # non-ASCII text, and literals must be ASCII for that to hold.
+        if not all(s.isascii() for s in required):
+            return None, False
+
+    return required, ignore_case
@@ -0,0 +1,344 @@
+import os
+import re
+from typing import Any, Dict, Iterable, List, Tuple
+
+from modules.matching.aho_corasick import AhoCorasick
+from modules.matching.literals import required_literals
+from modules.matching.predicates import InvalidStandardRule, StandardPredicate, term
+from modules.matching.regex_guard import PatternTimeout, regex_guard
+
+
+# Skip a rule's regex unless a literal it requires occurs in the value
+MATCHER_PREFILTER = os.environ.get("MATCHER_PREFILTER", "true").lower() in ("1", "true", "yes")
+
+
+def _result(matched: bool, details: str, status: int) -> dict:
+    return {
+        "is_matched": matched,
+        "details": details,
+        "status": status,
+    }
+
+
+_NO_RULE_TYPE = _result(False, "Could not find valid rule type", 400)
+_NOT_STRINGS = _result(False, "Resolved value is not a string or list of strings", 400)
+_MATCHED = _result(True, "Regex evaluated successfully", 200)
+_NOT_MATCHED = _result(False, "Regex evaluated successfully", 200)
+_STANDARD_MATCHED = _result(True, "Standard rule evaluated successfully", 200)
+_STANDARD_NOT_MATCHED = _result(False, "Standard rule evaluated successfully", 200)
+
+_MISSING = object()
+
+
+def _key_parts(key_path: str | None) -> Tuple[str, ...] | None:
+    if not key_path:
+        return None
+    return tuple(p for p in key_path.strip(".").split(".") if p)
+
+
+def _lookup(parts: Tuple[str, ...] | None, log: dict) -> Any:
+    """
+    The value at a key path, or _MISSING.
+    """
+    if parts is None:
+        return _MISSING
+
+    value: Any = log
+    for part in parts:
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        else:
+            return _MISSING
+
+    return value
+
+
+def _as_strings(value: Any, log: dict) -> List[str]:
+    """
+    The strings a regex rule searches. A missing key (or no key) falls
+    back to the raw log; a value that is not a string or a list of strings
+    yields nothing.
+    """
+    if value is _MISSING or value is None:
+        value = log.get("raw")
+
+    if isinstance(value, str):
+        return [value]
+
+    if isinstance(value, list):
+        return [v for v in value if isinstance(v, str)]
+
+    return []
+
+
+class CompiledRule:
+    """
+    One rule with its key path split and its regex (compiled through the
+    regex guard) or standard predicate compiled once.
+    """
+
+    __slots__ = ("rule", "kind", "parts", "pattern", "standard", "error")
+
+    def __init__(self, rule: dict):
+        self.rule = rule
+        self.parts = _key_parts(rule.get("key"))
+        self.kind = None
+        self.pattern = None
+        self.standard = None
+        self.error = None
+
+        if "regex" in rule:
+            self.kind = "regex"
+            try:
+                self.pattern = regex_guard.compile(rule["regex"])
+            except (re.error, TypeError) as e:
+                self.error = _result(False, f"Regex error: {str(e)}", 500)
+
+        elif "standard" in rule:
+            try:
+                self.standard = StandardPredicate(rule["standard"])
+                self.kind = "standard"
+            except InvalidStandardRule as e:
+                self.error = _result(False, f"Invalid standard rule: {e}", 400)
+
+        else:
+            self.error = _NO_RULE_TYPE
+
+    @property
+    def is_valid(self) -> bool:
+        # A regex that failed to compile still reports per log, after its
+        # value is resolved
+        return self.kind is not None
+
+    @property
+    def unmatched(self) -> dict:
+        return _STANDARD_NOT_MATCHED if self.kind == "standard" else _NOT_MATCHED
+
+    @property
+    def matched(self) -> dict:
+        return _STANDARD_MATCHED if self.kind == "standard" else _MATCHED
+
+    def evaluate_standard(self, value: Any) -> dict:
+        present = value is not _MISSING
+        return _STANDARD_MATCHED if self.standard.test(present, value if present else None) else _STANDARD_NOT_MATCHED
+
+    def evaluate(self, values: List[str]) -> dict:
+        """
+        Result for already-resolved values, as MatchEngine.match returns it.
+        """
+        if not values:
+            return _NOT_STRINGS
+
+        if self.error is not None:
+            return self.error
+
+        try:
+            for v in values:
+                if self.pattern.search(v):
+                    return _MATCHED
+            return _NOT_MATCHED
+
+        except re.error as e:
+            return _result(False, f"Regex error: {str(e)}", 500)
+
+        except PatternTimeout as e:
+            return _result(False, f"Regex timeout: {str(e)}", 500)
+
+    def match(self, log: dict) -> dict:
+        if not self.is_valid:
+            return self.error
+
+        value = _lookup(self.parts, log)
+        if self.kind == "standard":
+            return self.evaluate_standard(value)
+        return self.evaluate(_as_strings(value, log))
+
+
+class _KeyGroup:
+    """
+    The rules reading one key path.
+
+    Regex rules sit behind an Aho–Corasick prefilter over the literals
+    they require: rules without a usable literal (or whose regex failed to
+    compile) are evaluated for every value, the rest only when one of
+    their literals occurs in a value. Case-insensitive literals are skipped
+    for non-ASCII values, where casefolding is not a safe stand-in for
+    re.IGNORECASE.
+
+    Standard rules that only test equality are indexed by term, so any
+    number of them costs one dict lookup per value; other standard rules
+    are tested one by one.
+    """
+
+    __slots__ = (
+        "rules", "regex", "always", "_cs", "_ci", "_ci_rules",
+        "_terms", "_terms_ci", "_standard",
+    )
+
+    def __init__(self, rules: List[Tuple[int, CompiledRule]], prefilter: bool):
+        self.rules = rules
+        self.regex: List[int] = []
+        self.always: List[int] = []
+        self._ci_rules: List[int] = []
+
+        self._terms: Dict[Any, List[int]] = {}
+        self._terms_ci: Dict[Any, List[int]] = {}
+        self._standard: List[int] = []
+
+        cs_patterns = []
+        ci_patterns = []
+
+        for pos, (_, compiled) in enumerate(rules):
+            if compiled.kind == "standard":
+                predicate = compiled.standard
+                if predicate.is_equality_only:
+                    index = self._terms_ci if predicate.ignore_case else self._terms
+                    for t in predicate.terms:
+                        index.setdefault(t, []).append(pos)
+                else:
+                    self._standard.append(pos)
+                continue
+
+            self.regex.append(pos)
+            literals, ignore_case = (None, False)
+            if prefilter and compiled.pattern is not None:
+                literals, ignore_case = required_literals(compiled.pattern.pattern, compiled.pattern.flags)
+
+            if literals is None:
+                self.always.append(pos)
+            elif ignore_case:
+                self._ci_rules.append(pos)
+                ci_patterns.extend((lit, pos) for lit in literals)
+            else:
+                cs_patterns.extend((lit, pos) for lit in literals)
+
+        self._cs = AhoCorasick(cs_patterns) if cs_patterns else None
+        self._ci = AhoCorasick(ci_patterns, ignore_case=True) if ci_patterns else None
+
+    def candidates(self, values: List[str]) -> List[int]:
+        if len(self.always) == len(self.regex):
+            return self.always
+
+        hits = set(self.always)
+
+        for v in values:
+            if self._cs is not None:
+                hits.update(self._cs.keys(v))
+            if self._ci is not None:
+                if v.isascii():
+                    hits.update(self._ci.keys(v))
+                else:
+                    hits.update(self._ci_rules)
+
+        return sorted(hits)
+
+    def standard_matches(self, value: Any) -> set:
+        """
+        Positions of the standard rules that hold for the value.
+        """
+        hits = set()
+
+        if (self._terms or self._terms_ci) and value is not _MISSING and value is not None:
+            for v in value if isinstance(value, list) else (value,):
+                if self._terms:
+                    hits.update(self._terms.get(term(v), ()))
+                if self._terms_ci:
+                    hits.update(self._terms_ci.get(term(v, True), ()))
+
+        for pos in self._standard:
+            if self.rules[pos][1].evaluate_standard(value) is _STANDARD_MATCHED:
+                hits.add(pos)
+
+        return hits
+
+
+class CompiledRuleset:
+    """
+    A list of rules compiled once and evaluated against a log in one pass.
+
+    Rules are grouped by key path so each field is resolved once per log,
+    whatever the number of rules reading it. Within a group, a rule's regex
+    only runs when a literal it requires occurs in the value (see
+    modules.matching.literals); a rule skipped that way could not have
+    matched. Standard rules are evaluated through the group's term index
+    and interval lookups (see _KeyGroup). Per-rule results are exactly
+    those of MatchEngine.match.
+    """
+
+    def __init__(self, rules: Iterable[dict], *, prefilter: bool = MATCHER_PREFILTER):
+        self.rules = [CompiledRule(rule) for rule in rules]
+
+        self._invalid: List[int] = []
+        grouped: Dict[Tuple[str, ...] | None, List[Tuple[int, CompiledRule]]] = {}
+
+        for index, compiled in enumerate(self.rules):
+            if not compiled.is_valid:
+                self._invalid.append(index)
+            else:
+                grouped.setdefault(compiled.parts, []).append((index, compiled))
+
+        self._groups = {parts: _KeyGroup(rules, prefilter) for parts, rules in grouped.items()}
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def evaluate(self, log: dict) -> Tuple[List[int], List[Tuple[int, dict]]]:
+        """
+        Positions of the rules that matched, and (position, result) for
+        every rule that could not be evaluated, both in rule order.
+        """
+        matched: List[int] = []
+        errors: List[Tuple[int, dict]] = [(i, self.rules[i].error) for i in self._invalid]
+
+        for parts, group in self._groups.items():
+            value = _lookup(parts, log)
+
+            if len(group.regex) < len(group.rules):
+                for pos in group.standard_matches(value):
+                    matched.append(group.rules[pos][0])
+
+            if not group.regex:
+                continue
+
+            values = _as_strings(value, log)
+
+            # Without values every regex rule reports the same error
+            positions = group.candidates(values) if values else group.regex
+
+            for pos in positions:
+                index, compiled = group.rules[pos]
+                result = compiled.evaluate(values)
+                if result["status"] >= 400:
+                    errors.append((index, result))
+                elif result["is_matched"]:
+                    matched.append(index)
+
+        matched.sort()
+        errors.sort(key=lambda e: e[0])
+        return matched, errors
+
+    def results(self, log: dict) -> List[dict]:
+        """
+        One MatchEngine.match-style result per rule, in rule order.
+        """
+        out: List[dict] = [compiled.unmatched for compiled in self.rules]
+        matched, errors = self.evaluate(log)
+
+        for index in matched:
+            out[index] = self.rules[index].matched
+        for index, result in errors:
+            out[index] = result
+
+        return [dict(r) for r in out]
+
+
+class MatchEngine:
+
+    def __call__(self, rule: dict, log: dict) -> dict:
+        return self.match(rule, log)
+
+    def match(self, rule: dict, log: dict) -> dict:
+        return dict(CompiledRule(rule).match(log))
+
+    def compile(self, rules: Iterable[dict]) -> CompiledRuleset:
+        return CompiledRuleset(rules)
@@ -0,0 +1,261 @@
+import ipaddress
+import math
+from bisect import bisect_right
+from typing import Any, Dict, Hashable, List, Tuple
+
+
+OPERATORS = ("equals", "in", "cidr", "range", "exists")
+
+_INF = math.inf
+
+
+class InvalidStandardRule(ValueError):
+    """Raised when a standard rule's predicate spec cannot be compiled."""
+    pass
+
+
+def term(value: Any, ignore_case: bool = False) -> Hashable | None:
+    """
+    Hashable form of a scalar for equality tests: numbers compare by value
+    (5 == 5.0), booleans only equal booleans, strings are optionally
+    casefolded. Anything else has no term and never equals anything.
+    """
+    if isinstance(value, bool):
+        return ("b", value)
+    if isinstance(value, (int, float)):
+        return ("n", value)
+    if isinstance(value, str):
+        return ("s", value.casefold() if ignore_case else value)
+    return None
+
+
+def _number(value: Any) -> float | None:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def _elements(value: Any) -> List[Any]:
+    return value if isinstance(value, list) else [value]
+
+
+class _Intervals:
+    """
+    Merged, sorted numeric intervals with binary-search membership.
+
+    Bounds are compared as (x, 0) against (bound, flag) tuples so open and
+    closed ends share one ordering: x >= lo is (x, 0) >= (lo, 0), x > lo is
+    (x, 0) >= (lo, 1), x <= hi is (x, 0) <= (hi, 0), x < hi is
+    (x, 0) <= (hi, -1).
+    """
+
+    __slots__ = ("starts", "ends")
+
+    def __init__(self, spans: List[Tuple[tuple, tuple]]):
+        merged: List[List[tuple]] = []
+
+        for lo, hi in sorted(spans):
+            if lo > hi:
+                continue
+            if merged and lo <= merged[-1][1]:
+                if hi > merged[-1][1]:
+                    merged[-1][1] = hi
+            else:
+                merged.append([lo, hi])
+
+        self.starts = [lo for lo, _ in merged]
+        self.ends = [hi for _, hi in merged]
+
+    def __contains__(self, x) -> bool:
+        point = (x, 0)
+        i = bisect_right(self.starts, point) - 1
+        return i >= 0 and point <= self.ends[i]
+
+
+def _range_span(spec: Dict[str, Any]) -> Tuple[tuple, tuple]:
+    unknown = set(spec) - {"gt", "gte", "lt", "lte"}
+    if unknown or not spec:
+        raise InvalidStandardRule(f"range bounds must be gt, gte, lt or lte, got {sorted(spec)}")
+
+    for name, bound in spec.items():
+        if _number(bound) is None or isinstance(bound, str):
+            raise InvalidStandardRule(f"range bound '{name}' must be a number")
+
+    lo: tuple = (-_INF, 0)
+    hi: tuple = (_INF, 0)
+
+    if "gte" in spec:
+        lo = (spec["gte"], 0)
+    if "gt" in spec:
+        lo = max(lo, (spec["gt"], 1))
+    if "lte" in spec:
+        hi = (spec["lte"], 0)
+    if "lt" in spec:
+        hi = min(hi, (spec["lt"], -1))
+
+    return lo, hi
+
+
+class _Networks:
+    """
+    CIDR blocks as sorted integer intervals per IP version.
+    """
+
+    __slots__ = ("_by_version",)
+
+    def __init__(self, cidrs: List[str]):
+        by_version: Dict[int, List] = {4: [], 6: []}
+
+        for cidr in cidrs:
+            try:
+                net = ipaddress.ip_network(cidr, strict=False)
+            except (ValueError, TypeError) as e:
+                raise InvalidStandardRule(f"invalid CIDR {cidr!r}: {e}")
+            by_version[net.version].append(net)
+
+        self._by_version = {}
+        for version, nets in by_version.items():
+            collapsed = list(ipaddress.collapse_addresses(nets))
+            self._by_version[version] = (
+                [int(n.network_address) for n in collapsed],
+                [int(n.broadcast_address) for n in collapsed],
+            )
+
+    def __contains__(self, value: Any) -> bool:
+        if not isinstance(value, str):
+            return False
+        try:
+            addr = ipaddress.ip_address(value.strip())
+        except ValueError:
+            return False
+
+        starts, ends = self._by_version[addr.version]
+        x = int(addr)
+        i = bisect_right(starts, x) - 1
+        return i >= 0 and x <= ends[i]
+
+
+class StandardPredicate:
+    """
+    A compiled "standard" rule: typed predicates over the value at the
+    rule's key, all of which must hold.
+
+        {"equals": "root"}                      value equals a scalar
+        {"in": ["root", "admin"]}               value is one of a set
+        {"cidr": ["10.0.0.0/8", "fd00::/8"]}    IP address inside any block
+        {"range": {"gte": 400, "lt": 600}}      number in range (or a list
+                                                of ranges); numeric strings
+                                                are compared as numbers
+        {"exists": true}                        key present and not null
+
+    "ignore_case": true makes equals/in compare strings casefolded. When
+    the value is a list, a predicate holds if any element satisfies it.
+    Equality and set membership are hash lookups; CIDR and range checks
+    are binary searches over merged intervals.
+    """
+
+    __slots__ = ("spec", "ignore_case", "terms", "networks", "intervals", "exists")
+
+    def __init__(self, spec: Any):
+        if not isinstance(spec, dict) or not spec:
+            raise InvalidStandardRule("standard rule must be a non-empty object of predicates")
+
+        unknown = set(spec) - set(OPERATORS) - {"ignore_case"}
+        if unknown:
+            raise InvalidStandardRule(f"unknown predicate(s): {', '.join(sorted(unknown))}")
+        if not set(spec) & set(OPERATORS):
+            raise InvalidStandardRule(f"standard rule needs one of: {', '.join(OPERATORS)}")
+
+        self.spec = spec
+        self.ignore_case = bool(spec.get("ignore_case", False))
+        self.terms = None
+        self.networks = None
+        self.intervals = None
+        self.exists = None
+
+        if "equals" in spec and "in" in spec:
+            raise InvalidStandardRule("use either 'equals' or 'in', not both")
+
+        if "equals" in spec:
+            self.terms = self._terms([spec["equals"]])
+        elif "in" in spec:
+            if not isinstance(spec["in"], list):
+                raise InvalidStandardRule("'in' must be a list")
+            self.terms = self._terms(spec["in"])
+
+        if "cidr" in spec:
+            cidrs = spec["cidr"] if isinstance(spec["cidr"], list) else [spec["cidr"]]
+            self.networks = _Networks(cidrs)
+
+        if "range" in spec:
+            ranges = spec["range"] if isinstance(spec["range"], list) else [spec["range"]]
+            if not all(isinstance(r, dict) for r in ranges):
+                raise InvalidStandardRule("'range' must be an object or a list of objects")
+            self.intervals = _Intervals([_range_span(r) for r in ranges])
+
+        if "exists" in spec:
+            if not isinstance(spec["exists"], bool):
+                raise InvalidStandardRule("'exists' must be true or false")
+            self.exists = spec["exists"]
+
+    def _terms(self, values: List[Any]) -> frozenset:
+        terms = set()
+        for v in values:
+            t = term(v, self.ignore_case)
+            if t is None:
+                raise InvalidStandardRule(f"cannot compare against {v!r}; use strings, numbers or booleans")
+            terms.add(t)
+        return frozenset(terms)
+
+    @property
+    def is_equality_only(self) -> bool:
+        """
+        True when the predicate is just equals/in, so a ruleset can index
+        it by term instead of testing it.
+        """
+        return self.terms is not None and self.networks is None and self.intervals is None and self.exists is None
+
+    def test(self, present: bool, value: Any) -> bool:
+        if self.exists is not None:
+            if self.exists != (present and value is not None):
+                return False
+
+        if self.terms is None and self.networks is None and self.intervals is None:
+            return True
+
+        if not present or value is None:
+            return False
+
+        elements = _elements(value)
+
+        if self.terms is not None:
+            if not any(term(v, self.ignore_case) in self.terms for v in elements):
+                return False
+
+        if self.networks is not None:
+            if not any(v in self.networks for v in elements):
+                return False
+
+        if self.intervals is not None:
+            if not any((n := _number(v)) is not None and n in self.intervals for v in elements):
+                return False
+
+        return True
+
+
+def check_standard(spec: Any) -> str | None:
+    """
+    The error a standard rule spec would fail to compile with, or None.
+    """
+    try:
+        StandardPredicate(spec)
+    except InvalidStandardRule as e:
+        return str(e)
+    return None
@@ -0,0 +1,637 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+try:
+    from re import _constants as _sre
+    from re import _parser as _sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants as _sre
+    import sre_parse as _sre_parse
+
+
+# "auto" runs patterns inline and sends the ones that static analysis flags,
+# or that exceed REGEX_SLOW_MS, to the sandbox; cards and rules are checked
+# with analyze_pattern() when saved, so flagged patterns are rare. "sandbox"
+# sends every search (about 25x slower per search); "inline" never does.
+REGEX_GUARD_MODE = os.environ.get("REGEX_GUARD_MODE", "auto").lower()
+REGEX_TIMEOUT_MS = float(os.environ.get("REGEX_TIMEOUT_MS", 250))
+# Sandbox processes; this many guarded searches can run at once
+REGEX_SANDBOX_WORKERS = int(os.environ.get("REGEX_SANDBOX_WORKERS", min(4, os.cpu_count() or 1)))
+REGEX_SLOW_MS = float(os.environ.get("REGEX_SLOW_MS", 20))
+REGEX_QUARANTINE_AFTER = int(os.environ.get("REGEX_QUARANTINE_AFTER", 3))
+REGEX_MAX_PATTERN_LENGTH = int(os.environ.get("REGEX_MAX_PATTERN_LENGTH", 4096))
+REGEX_GUARD_CACHE_SIZE = int(os.environ.get("REGEX_GUARD_CACHE_SIZE", 4096))
+
+# Bounded repeats above this are treated like unbounded ones when looking
+# for nested quantifiers.
+_LARGE_REPEAT = 100
+_REPEATS = {_sre.MAX_REPEAT, _sre.MIN_REPEAT}
+_PROBE_CHARS = [chr(c) for c in range(0x300)]
+_SANDBOX_START_TIMEOUT = 30.0
+
+
+class UnsafePatternError(ValueError):
+    """Raised when a pattern is rejected by analyze_pattern()."""
+    pass
+
+
+class PatternTimeout(RuntimeError):
+    """Raised when a guarded search exceeds its time budget."""
+    pass
+
+
+# ===========================
+# Static analysis
+# ===========================
+
+def _charset(node) -> List[str] | None:
+    """
+    Characters (from a probe range) that a single-character node can match,
+    or None when the node is not a single character.
+    """
+    op, av = node
+
+    if op is _sre.LITERAL:
+        return [chr(av)]
+    if op is _sre.ANY:
+        return _PROBE_CHARS
+    if op is _sre.NOT_LITERAL:
+        return [c for c in _PROBE_CHARS if ord(c) != av]
+    if op is _sre.IN:
+        try:
+            compiled = _sre_parse_compile([node])
+        except Exception:
+            return None
+        return [c for c in _PROBE_CHARS if compiled.fullmatch(c)]
+
+    return None
+
+
+def _sre_parse_compile(nodes):
+    # Rebuild a tiny pattern from a parsed character class so re can test it
+    op, av = nodes[0]
+    parts = []
+    negate = False
+
+    for item_op, item_av in av:
+        if item_op is _sre.NEGATE:
+            negate = True
+        elif item_op is _sre.LITERAL:
+            parts.append(re.escape(chr(item_av)))
+        elif item_op is _sre.RANGE:
+            parts.append(f"{re.escape(chr(item_av[0]))}-{re.escape(chr(item_av[1]))}")
+        elif item_op is _sre.CATEGORY:
+            parts.append(_CATEGORY_CLASSES[item_av])
+        else:
+            raise ValueError("unsupported class item")
+
+    return re.compile(f"[{'^' if negate else ''}{''.join(parts)}]")
+
+
+_CATEGORY_CLASSES = {
+    _sre.CATEGORY_DIGIT: r"\d",
+    _sre.CATEGORY_NOT_DIGIT: r"\D",
+    _sre.CATEGORY_SPACE: r"\s",
+    _sre.CATEGORY_NOT_SPACE: r"\S",
+    _sre.CATEGORY_WORD: r"\w",
+    _sre.CATEGORY_NOT_WORD: r"\W",
+}
+
+
+def _first_chars(seq) -> List[str] | None:
+    """
+    Characters the sequence can start with, when that is easy to tell.
+    """
+    for node in seq:
+        op, av = node
+
+        if op in _REPEATS:
+            lo, _, body = av
+            first = _first_chars(body)
+            if first is None or lo == 0:
+                return None
+            return first
+
+        if op is _sre.SUBPATTERN:
+            return _first_chars(av[-1])
+
+        if op is _sre.AT:
+            continue
+
+        return _charset(node)
+
+    return None
+
+
+def _is_unbounded(av) -> bool:
+    _, hi, _ = av
+    return hi is _sre.MAXREPEAT or hi == _sre.MAXREPEAT or hi > _LARGE_REPEAT
+
+
+def _overlaps(a: List[str] | None, b: List[str] | None, ignore_case: bool = False) -> bool:
+    if a is None or b is None:
+        return True
+    if ignore_case:
+        return not {c.lower() for c in a}.isdisjoint(c.lower() for c in b)
+    return not set(a).isdisjoint(b)
+
+
+def _inner_repeat_is_fenced(body, ignore_case: bool = False) -> bool:
+    """
+    True when every unbounded repeat in body is followed by a required
+    character it cannot match, e.g. ([a-z]+\\.)+: each outer iteration then
+    has only one way to split the input.
+    """
+    items = list(body)
+
+    # (...)+ : look inside the group
+    while len(items) == 1 and items[0][0] is _sre.SUBPATTERN:
+        items = list(items[0][1][-1])
+
+    for i, (op, av) in enumerate(items):
+        if op not in _REPEATS or not _is_unbounded(av):
+            if op is _sre.SUBPATTERN or op is _sre.BRANCH:
+                return False
+            continue
+
+        inner = _first_chars(av[2])
+        fence = _first_chars(items[i + 1:]) if i + 1 < len(items) else None
+
+        if inner is None or fence is None or _overlaps(inner, fence, ignore_case):
+            return False
+
+        if _contains_unbounded(av[2]):
+            return False
+
+    return True
+
+
+def _contains_unbounded(seq) -> bool:
+    for op, av in seq:
+        if op in _REPEATS:
+            if _is_unbounded(av):
+                return True
+            if _contains_unbounded(av[2]):
+                return True
+        elif op is _sre.SUBPATTERN:
+            if _contains_unbounded(av[-1]):
+                return True
+        elif op is _sre.BRANCH:
+            if any(_contains_unbounded(b) for b in av[1]):
+                return True
+        elif op in (_sre.ASSERT, _sre.ASSERT_NOT):
+            if _contains_unbounded(av[1]):
+                return True
+    return False
+
+
+def _walk(seq, issues: List[str], under_repeat: bool = False, ignore_case: bool = False):
+    for op, av in seq:
+
+        if op in _REPEATS:
+            lo, hi, body = av
+            repeats_many = _is_unbounded(av)
+
+            if repeats_many and _contains_unbounded(body) and not _inner_repeat_is_fenced(body, ignore_case):
+                issues.append("nested quantifier: a repeated group contains an unbounded repeat")
+
+            _walk(body, issues, under_repeat or repeats_many, ignore_case)
+
+        elif op is _sre.SUBPATTERN:
+            _walk(av[-1], issues, under_repeat, ignore_case)
+
+        elif op is _sre.BRANCH:
+            branches = av[1]
+
+            if under_repeat:
+                firsts = [_first_chars(b) for b in branches]
+                for i in range(len(firsts)):
+                    if any(_overlaps(firsts[i], firsts[j], ignore_case) for j in range(i + 1, len(firsts))):
+                        issues.append("repeated alternation whose branches can match the same text")
+                        break
+
+            for b in branches:
+                _walk(b, issues, under_repeat, ignore_case)
+
+        elif op in (_sre.ASSERT, _sre.ASSERT_NOT):
+            _walk(av[1], issues, under_repeat, ignore_case)
+
+        elif op is _sre.GROUPREF_EXISTS:
+            _, yes, no = av
+            _walk(yes, issues, under_repeat, ignore_case)
+            if no:
+                _walk(no, issues, under_repeat, ignore_case)
+
+
+def analyze_pattern(pattern: str, flags: int = 0) -> List[str]:
+    """
+    Static checks for patterns prone to catastrophic backtracking.
+
+    Returns a list of problems; an empty list means nothing was found.
+    Flags nested unbounded quantifiers such as (a+)+ or (\\w+\\s?)* unless
+    the inner repeat is fenced by a character it cannot match, and repeated
+    alternations whose branches overlap, such as (a|ab)*. Characters are
+    compared case-insensitively under re.IGNORECASE, so pass the flags the
+    pattern will be compiled with. Invalid and oversized patterns are
+    reported too.
+    """
+    if not isinstance(pattern, str):
+        return ["pattern must be a string"]
+
+    if len(pattern) > REGEX_MAX_PATTERN_LENGTH:
+        return [f"pattern is longer than {REGEX_MAX_PATTERN_LENGTH} characters"]
+
+    try:
+        parsed = _sre_parse.parse(pattern, flags)
+    except (re.error, OverflowError, RecursionError) as e:
+        return [f"invalid regex: {e}"]
+
+    issues: List[str] = []
+    _walk(list(parsed), issues, ignore_case=bool(flags & re.IGNORECASE))
+
+    # One report per kind is enough
+    return list(dict.fromkeys(issues))
+
+
+def check_pattern(pattern: str, flags: int = 0):
+    issues = analyze_pattern(pattern, flags)
+    if issues:
+        raise UnsafePatternError(f"{issues[0]}: {pattern[:200]}")
+
+
+# ===========================
+# Sandbox process
+# ===========================
+
+def _sandbox_main(conn):
+    cache: Dict[Tuple[str, int], re.Pattern] = {}
+    conn.send(("ready", None))
+
+    while True:
+        try:
+            pattern, flags, text, pos = conn.recv()
+        except (EOFError, OSError):
+            return
+
+        try:
+            compiled = cache.get((pattern, flags))
+            if compiled is None:
+                if len(cache) > 1024:
+                    cache.clear()
+                compiled = cache[(pattern, flags)] = re.compile(pattern, flags)
+
+            m = compiled.search(text, pos)
+            conn.send(("ok", None if m is None else (m.regs, m.lastindex)))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class SandboxMatch:
+    """
+    The parts of re.Match a caller needs, rebuilt from a sandbox result.
+    """
+
+    __slots__ = ("string", "re", "regs", "lastindex")
+
+    def __init__(self, string: str, compiled: re.Pattern, regs, lastindex):
+        self.string = string
+        self.re = compiled
+        self.regs = regs
+        self.lastindex = lastindex
+
+    def _index(self, group) -> int:
+        return self.re.groupindex[group] if isinstance(group, str) else group
+
+    def group(self, *groups):
+        if not groups:
+            groups = (0,)
+        out = []
+        for g in groups:
+            s, e = self.regs[self._index(g)]
+            out.append(None if s < 0 else self.string[s:e])
+        return out[0] if len(out) == 1 else tuple(out)
+
+    def groups(self, default=None):
+        return tuple(
+            default if s < 0 else self.string[s:e]
+            for s, e in self.regs[1:]
+        )
+
+    def start(self, group=0) -> int:
+        return self.regs[self._index(group)][0]
+
+    def end(self, group=0) -> int:
+        return self.regs[self._index(group)][1]
+
+    def span(self, group=0) -> Tuple[int, int]:
+        return self.regs[self._index(group)]
+
+    @property
+    def lastgroup(self):
+        if self.lastindex is None:
+            return None
+        for name, idx in self.re.groupindex.items():
+            if idx == self.lastindex:
+                return name
+        return None
+
+
+class _Sandbox:
+    """
+    One worker process that runs searches with a deadline. A search that
+    overruns is abandoned by killing the worker; the next search starts a
+    fresh one. The process is started on first use.
+    """
+
+    def __init__(self):
+        self._ctx = multiprocessing.get_context("spawn")
+        self._proc = None
+        self._conn = None
+        self._lock = threading.Lock()
+        self.restarts = 0
+
+    def _start(self):
+        parent, child = self._ctx.Pipe()
+        proc = self._ctx.Process(target=_sandbox_main, args=(child,), name="regex-sandbox", daemon=True)
+        proc.start()
+        child.close()
+        self._proc, self._conn = proc, parent
+
+        # Interpreter start-up must not count against the first search
+        if not parent.poll(_SANDBOX_START_TIMEOUT):
+            self._kill()
+            raise RuntimeError("regex sandbox failed to start")
+        parent.recv()
+
+    def _kill(self):
+        if self._proc is not None:
+            self._proc.kill()
+            self._proc.join(1.0)
+            self.restarts += 1
+        if self._conn is not None:
+            self._conn.close()
+        self._proc, self._conn = None, None
+
+    def search(self, pattern: str, flags: int, text: str, pos: int, timeout: float):
+        with self._lock:
+            if self._proc is None or not self._proc.is_alive():
+                self._kill()
+                self._start()
+
+            self._conn.send((pattern, flags, text, pos))
+
+            if not self._conn.poll(timeout):
+                self._kill()
+                raise PatternTimeout(f"regex exceeded {timeout * 1000:.0f}ms")
+
+            status, payload = self._conn.recv()
+
+        if status != "ok":
+            raise re.error(payload)
+
+        return payload
+
+    def close(self):
+        with self._lock:
+            self._kill()
+
+
+class _SandboxPool:
+    """
+    A fixed set of sandbox workers shared by every thread. A search
+    borrows an idle worker for its duration, so up to `size` searches run
+    in parallel and a timeout only restarts the worker it happened on.
+    Recently used workers are handed out first, so workers that are never
+    needed are never started.
+    """
+
+    def __init__(self, size: int = REGEX_SANDBOX_WORKERS):
+        self.size = max(1, size)
+        self._workers = [_Sandbox() for _ in range(self.size)]
+        self._idle: "queue.LifoQueue[_Sandbox]" = queue.LifoQueue()
+        for worker in self._workers:
+            self._idle.put(worker)
+
+    @property
+    def restarts(self) -> int:
+        return sum(w.restarts for w in self._workers)
+
+    def busy(self) -> int:
+        return self.size - self._idle.qsize()
+
+    def search(self, pattern: str, flags: int, text: str, pos: int, timeout: float):
+        worker = self._idle.get()
+        try:
+            return worker.search(pattern, flags, text, pos, timeout)
+        finally:
+            self._idle.put(worker)
+
+    def close(self):
+        for worker in self._workers:
+            worker.close()
+
+
+# ===========================
+# Guarded patterns
+# ===========================
+
+class PatternStats:
+
+    __slots__ = ("calls", "total_ms", "max_ms", "slow", "timeouts")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.slow = 0
+        self.timeouts = 0
+
+
+class GuardedPattern:
+    """
+    A compiled pattern whose searches are timed and, when sandboxed, run
+    in the guard's worker process under a deadline.
+    """
+
+    __slots__ = ("pattern", "flags", "compiled", "issues", "sandboxed", "quarantined", "stats", "_guard")
+
+    def __init__(self, guard: "RegexGuard", pattern: str, flags: int, issues: List[str]):
+        self._guard = guard
+        self.pattern = pattern
+        self.flags = flags
+        self.compiled = re.compile(pattern, flags)
+        self.issues = issues
+        self.sandboxed = guard.mode == "sandbox" or (guard.mode == "auto" and bool(issues))
+        self.quarantined = False
+        self.stats = PatternStats()
+
+    @property
+    def groups(self) -> int:
+        return self.compiled.groups
+
+    @property
+    def groupindex(self):
+        return self.compiled.groupindex
+
+    def search(self, text: str, pos: int = 0):
+        return self._guard._search(self, text, pos)
+
+    def finditer(self, text: str):
+        """
+        Inline only; callers must not use it on sandboxed patterns.
+        """
+        started = time.perf_counter()
+        try:
+            yield from self.compiled.finditer(text)
+        finally:
+            self._guard._record(self, (time.perf_counter() - started) * 1000)
+
+
+class RegexGuard:
+    """
+    Compiles patterns into GuardedPatterns (cached by pattern and flags)
+    and keeps per-pattern latency statistics.
+
+    Sandboxed searches run in a pool of worker processes, started on first
+    use, and are abandoned after timeout_ms; they block the calling thread,
+    so async code must call them off the event loop. In "sandbox" mode
+    every search goes there. In "auto" mode (the default) patterns that
+    static analysis flags run in the sandbox from the start, and a pattern
+    that takes longer than slow_ms inline is moved there for its following
+    searches. A sandboxed pattern that times out quarantine_after times is
+    quarantined: its searches fail at once instead of costing a timeout
+    each.
+    """
+
+    def __init__(
+        self,
+        *,
+        mode: str = REGEX_GUARD_MODE,
+        timeout_ms: float = REGEX_TIMEOUT_MS,
+        slow_ms: float = REGEX_SLOW_MS,
+        quarantine_after: int = REGEX_QUARANTINE_AFTER,
+        cache_size: int = REGEX_GUARD_CACHE_SIZE,
+        sandbox_workers: int = REGEX_SANDBOX_WORKERS,
+    ):
+        if mode not in ("inline", "auto", "sandbox"):
+            raise ValueError(f"Invalid regex guard mode '{mode}'")
+
+        self.mode = mode
+        self.timeout = timeout_ms / 1000
+        self.slow_ms = slow_ms
+        self.quarantine_after = quarantine_after
+        self.cache_size = max(1, cache_size)
+
+        self._patterns: "OrderedDict[Tuple[str, int], GuardedPattern]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._sandbox = _SandboxPool(sandbox_workers)
+
+    def compile(self, pattern: str, flags: int = 0) -> GuardedPattern:
+        key = (pattern, flags)
+
+        with self._lock:
+            gp = self._patterns.get(key)
+            if gp is not None:
+                self._patterns.move_to_end(key)
+                return gp
+
+        # re.error from an invalid pattern propagates to the caller
+        issues = analyze_pattern(pattern, flags) if self.mode != "inline" else []
+        gp = GuardedPattern(self, pattern, flags, issues)
+
+        with self._lock:
+            gp = self._patterns.setdefault(key, gp)
+            self._patterns.move_to_end(key)
+            while len(self._patterns) > self.cache_size:
+                self._patterns.popitem(last=False)
+
+        return gp
+
+    def _record(self, gp: GuardedPattern, elapsed_ms: float):
+        st = gp.stats
+        st.calls += 1
+        st.total_ms += elapsed_ms
+        if elapsed_ms > st.max_ms:
+            st.max_ms = elapsed_ms
+
+        if elapsed_ms > self.slow_ms:
+            st.slow += 1
+            if self.mode == "auto" and not gp.sandboxed:
+                gp.sandboxed = True
+                print(f"[!] Regex took {elapsed_ms:.1f}ms, sandboxing it: {gp.pattern[:200]}")
+
+    def _search(self, gp: GuardedPattern, text: str, pos: int):
+        if gp.quarantined:
+            raise PatternTimeout("regex quarantined after repeated timeouts")
+
+        started = time.perf_counter()
+
+        if not gp.sandboxed:
+            m = gp.compiled.search(text, pos)
+            self._record(gp, (time.perf_counter() - started) * 1000)
+            return m
+
+        try:
+            result = self._sandbox.search(gp.pattern, gp.flags, text, pos, self.timeout)
+        except PatternTimeout:
+            gp.stats.timeouts += 1
+            self._record(gp, (time.perf_counter() - started) * 1000)
+
+            if gp.stats.timeouts >= self.quarantine_after:
+                gp.quarantined = True
+                print(f"[✗] Regex quarantined after {gp.stats.timeouts} timeouts: {gp.pattern[:200]}")
+            raise
+
+        self._record(gp, (time.perf_counter() - started) * 1000)
+
+        if result is None:
+            return None
+
+        regs, lastindex = result
+        return SandboxMatch(text, gp.compiled, regs, lastindex)
+
+    def stats(self, top: int | None = 20) -> Dict[str, Any]:
+        with self._lock:
+            patterns = list(self._patterns.values())
+
+        patterns.sort(key=lambda gp: gp.stats.total_ms, reverse=True)
+        if top is not None:
+            patterns = patterns[:top]
+
+        return {
+            "mode": self.mode,
+            "timeout_ms": self.timeout * 1000,
+            "patterns_cached": len(self._patterns),
+            "sandbox_workers": self._sandbox.size,
+            "sandbox_busy": self._sandbox.busy(),
+            "sandbox_restarts": self._sandbox.restarts,
+            "patterns": [
+                {
+                    "pattern": gp.pattern[:200],
+                    "calls": gp.stats.calls,
+                    "total_ms": round(gp.stats.total_ms, 3),
+                    "max_ms": round(gp.stats.max_ms, 3),
+                    "avg_us": round(gp.stats.total_ms * 1000 / gp.stats.calls, 2) if gp.stats.calls else 0.0,
+                    "slow": gp.stats.slow,
+                    "timeouts": gp.stats.timeouts,
+                    "sandboxed": gp.sandboxed,
+                    "quarantined": gp.quarantined,
+                    "issues": gp.issues,
+                }
+                for gp in patterns
+            ],
+        }
+
+    def close(self):
+        self._sandbox.close()
+
+
+regex_guard = RegexGuard()
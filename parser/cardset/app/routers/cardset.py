@@ -82,6 +82,22 @@ def cards_collection():
     return os.environ.get("COLLECTION_NAME", "cards")
 
 
+def bump_cards_version(mongo: HerringboneMongoDatabase):
+    """
+    Tell card caches (enrichment workers) that the collection changed.
+    Caches still reload on their own interval, so a failure is not fatal.
+    """
+    try:
+        mongo.bump_version(cards_collection())
+    except Exception as e:
+        audit.log(
+            event="card_version_bump_failed",
+            severity="WARNING",
+            result="failure",
+            metadata={"error": str(e)},
+        )
+
+
 @router.post("/insert_card", response_model=InsertCardResponse)
 async def insert_card(
     card: CardModel,
@@ -137,6 +153,8 @@ async def insert_card(
         )
         raise HTTPException(status_code=500, detail=f"Insert failed: {e}")
 
+    bump_cards_version(mongo)
+
     audit.log(
         event="card_inserted",
         severity="INFO",
@@ -269,7 +287,7 @@ async def delete_cards(
         res = mongo.upsert_one(
             cards_collection(),
             {"selector.type": sel_type, "selector.value": sel_value},
-            {"deleted": True, "deleted_at": datetime.now(UTC)},
+            {"deleted": True, "deleted_at": datetime.now(UTC), "last_updated": datetime.now(UTC)},
         )
     except Exception as e:
         audit.log(
@@ -282,6 +300,8 @@ async def delete_cards(
         )
         raise HTTPException(status_code=500, detail=f"Delete failed: {e}")
 
+    bump_cards_version(mongo)
+
     audit.log(
         event="card_deleted",
         severity="INFO",
@@ -353,6 +373,8 @@ async def update_card(
         )
         raise HTTPException(status_code=500, detail=f"Update failed: {e}")
 
+    bump_cards_version(mongo)
+
     audit.log(
         event="card_updated",
         severity="INFO",
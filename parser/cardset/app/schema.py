@@ -1,5 +1,9 @@
+import re
+
 from jsonschema import validate, ValidationError
 
+from modules.matching.regex_guard import analyze_pattern
+
 class CardSchema:
     """Validates JSON data for a card entry supporting regex or jsonp definitions."""
 
@@ -57,6 +61,28 @@ class CardSchema:
         """
         try:
             validate(instance=data, schema=self.schema)
-            return {"valid": True, "error": None}
         except ValidationError as e:
             return {"valid": False, "error": e.message}
+
+        return self._check_patterns(data)
+
+    @staticmethod
+    def _check_patterns(data: dict) -> dict:
+        """
+        Reject regex rules that cannot compile or are prone to catastrophic
+        backtracking. Rules are either {"name": ..., "pattern": ...} or
+        {field: pattern}.
+        """
+        for rule in data.get("regex") or []:
+            if "pattern" in rule:
+                patterns = {rule.get("name", "pattern"): rule["pattern"]}
+            else:
+                patterns = rule
+
+            for field, pattern in patterns.items():
+                # The extractor compiles card patterns case-insensitively
+                issues = analyze_pattern(pattern, re.IGNORECASE)
+                if issues:
+                    return {"valid": False, "error": f"Unsafe regex for '{field}': {issues[0]}"}
+
+        return {"valid": True, "error": None}
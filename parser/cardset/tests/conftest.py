@@ -26,6 +26,9 @@ class FakeMongo:
     def upsert_one(self, *args, **kwargs):
         return "fake_id"
 
+    def bump_version(self, *args, **kwargs):
+        return 1
+
 
 def override_mongo():
     return FakeMongo()
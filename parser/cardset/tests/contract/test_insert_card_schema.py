@@ -12,3 +12,17 @@ def test_insert_card_response_shape(client):
     body = response.json()
     assert "ok" in body
     assert "message" in body
+
+
+def test_insert_card_rejects_catastrophic_regex(client):
+    response = client.post(
+        "/parser/cardset/insert_card",
+        json={
+            "name": "redos",
+            "selector": {"type": "raw", "value": "sshd"},
+            "regex": [{"pattern": r"(\w+\s?)*$", "name": "words"}],
+        },
+    )
+
+    assert response.status_code == 400
+    assert "Unsafe regex for 'words'" in response.json()["detail"]
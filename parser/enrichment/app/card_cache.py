@@ -0,0 +1,197 @@
+import os
+import re
+import time
+from typing import Any, Dict, List
+
+from app.selector_index import SelectorIndex
+
+
+CARD_COLLECTION = os.environ.get("CARD_COLLECTION", "parse_cards")
+CARD_CACHE_CHECK_INTERVAL = float(os.environ.get("CARD_CACHE_CHECK_INTERVAL", 1.0))
+CARD_CACHE_FULL_RELOAD = float(os.environ.get("CARD_CACHE_FULL_RELOAD", 300.0))
+
+
+class CompiledCard:
+    """
+    A parse card with its inline regex rules compiled once.
+
+    A pattern that fails to compile is kept as its error and raised when
+    the card is applied, so it is recorded against the event exactly as an
+    inline re.search failure was.
+    """
+
+    __slots__ = ("card", "name", "selector_type", "selector_value", "rules", "order")
+
+    def __init__(self, card: dict, order: int = 0):
+        self.card = card
+        self.name = card.get("name")
+        self.order = order
+
+        selector = card.get("selector") or {}
+        self.selector_type = selector.get("type")
+        self.selector_value = selector.get("value")
+
+        self.rules = []
+        for rule in card.get("regex") or []:
+            if "pattern" in rule and "name" in rule:
+                try:
+                    self.rules.append((rule["name"], re.compile(rule["pattern"])))
+                except re.error as e:
+                    self.rules.append((rule["name"], e))
+
+    def apply_regex(self, raw: str) -> Dict[str, List[str]]:
+        results = {}
+
+        for name, compiled in self.rules:
+            if isinstance(compiled, re.error):
+                raise compiled
+
+            m = compiled.search(raw)
+            if m:
+                results[name] = [m.group(0)]
+
+        return results
+
+
+class CardCache:
+    """
+    In-memory copy of the parse_cards collection, compiled and indexed by
+    selector (see SelectorIndex).
+
+    refresh() is cheap to call per batch: at most every check_interval
+    seconds it reads the collection's change counter (bumped by the
+    cardset service on every write) and, when it moved, loads only the
+    cards whose last_updated is at or after the newest one already seen.
+    A full reload still happens every full_reload_interval seconds to pick
+    up writes that bypassed the cardset service.
+    """
+
+    def __init__(
+        self,
+        collection: str = CARD_COLLECTION,
+        *,
+        check_interval: float = CARD_CACHE_CHECK_INTERVAL,
+        full_reload_interval: float = CARD_CACHE_FULL_RELOAD,
+    ):
+        self.collection = collection
+        self.check_interval = check_interval
+        self.full_reload_interval = full_reload_interval
+
+        self.version: int | None = None
+        self._cards: Dict[Any, CompiledCard] = {}
+        self._index = SelectorIndex()
+        self._watermark = None
+        self._next_order = 0
+        self._loaded = False
+
+        self._last_check = 0.0
+        self._last_full = 0.0
+
+        self._metrics = {
+            "full_loads": 0,
+            "incremental_loads": 0,
+            "cards_loaded": 0,
+        }
+
+    # ===========================
+    # Refresh
+    # ===========================
+
+    def refresh(self, mongo, *, force: bool = False) -> bool:
+        """
+        Bring the cache up to date if a check is due; returns True when
+        cards were (re)loaded.
+        """
+        t = time.monotonic()
+
+        if not force and self._loaded and t - self._last_check < self.check_interval:
+            return False
+
+        self._last_check = t
+
+        # Read the counter before the cards so a write racing with the load
+        # is picked up again on the next check.
+        version = self._read_version(mongo)
+
+        if force or not self._loaded or t - self._last_full >= self.full_reload_interval:
+            self._full_load(mongo)
+            self._last_full = t
+        elif version != self.version:
+            self._incremental_load(mongo)
+        else:
+            return False
+
+        self.version = version
+        return True
+
+    def _read_version(self, mongo):
+        get_version = getattr(mongo, "get_version", None)
+        if get_version is None:
+            return None
+        return get_version(self.collection)
+
+    def _full_load(self, mongo):
+        docs = mongo.find(self.collection, {"deleted": {"$ne": True}})
+
+        self._cards = {}
+        self._watermark = None
+        self._next_order = 0
+
+        self._merge(docs)
+        self._metrics["full_loads"] += 1
+
+    def _incremental_load(self, mongo):
+        if self._watermark is None:
+            self._full_load(mongo)
+            return
+
+        docs = mongo.find(self.collection, {"last_updated": {"$gte": self._watermark}})
+        self._merge(docs)
+        self._metrics["incremental_loads"] += 1
+
+    def _merge(self, docs: List[dict]):
+        for doc in docs:
+            # Stored cards always carry an _id; anything else is kept as-is.
+            key = doc.get("_id", ("unkeyed", self._next_order))
+
+            updated = doc.get("last_updated")
+            if updated is not None and (self._watermark is None or updated > self._watermark):
+                self._watermark = updated
+
+            if doc.get("deleted"):
+                self._cards.pop(key, None)
+                continue
+
+            existing = self._cards.get(key)
+            order = existing.order if existing else self._next_order
+            if existing is None:
+                self._next_order += 1
+
+            self._cards[key] = CompiledCard(doc, order)
+
+        self._metrics["cards_loaded"] += len(docs)
+        self._rebuild_index()
+        self._loaded = True
+
+    def _rebuild_index(self):
+        self._index = SelectorIndex(sorted(self._cards.values(), key=lambda c: c.order))
+
+    # ===========================
+    # Lookup
+    # ===========================
+
+    def match(self, event: dict) -> List[CompiledCard]:
+        """
+        Cards whose selector matches the event, in load order.
+        """
+        return self._index.match(event)
+
+    def __len__(self) -> int:
+        return len(self._cards)
+
+    def stats(self) -> dict:
+        return {
+            **self._metrics,
+            "cards": len(self._cards),
+            "version": self.version,
+        }
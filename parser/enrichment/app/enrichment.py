@@ -1,25 +1,48 @@
 from datetime import datetime, timezone
 import os
+import socket
 import time
 import requests
 from time import time as now
 
 from modules.database.mongo_db import HerringboneMongoDatabase
+from modules.database.leases import LeaseKeeper
 from modules.audit.logger import AuditLogger
 
+from app.card_cache import CardCache
+
 
 POLL_INTERVAL = float(os.environ.get("ENRICHMENT_POLL_INTERVAL", 1.0))
+BATCH_SIZE = int(os.environ.get("ENRICHMENT_BATCH_SIZE", 100))
+LEASE_SECONDS = float(os.environ.get("ENRICHMENT_LEASE_SECONDS", 60.0))
+# "poll" sleeps POLL_INTERVAL when idle; "changestream" wakes on event_state
+# writes instead (needs a replica set, falls back to polling otherwise).
+WAKE_MODE = os.environ.get("ENRICHMENT_WAKE_MODE", "poll").lower()
+
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}"
+LEASE_FIELD = "parse_lease"
 EXTRACTOR_SVC = os.environ.get("EXTRACTOR_SVC")
+# Defaults to the /parse_batch endpoint next to EXTRACTOR_SVC
+EXTRACTOR_BATCH_SVC = os.environ.get("EXTRACTOR_BATCH_SVC") or (
+    EXTRACTOR_SVC.rstrip("/") + "_batch" if EXTRACTOR_SVC else None
+)
+EXTRACTOR_BATCH_SIZE = int(os.environ.get("EXTRACTOR_BATCH_SIZE", 200))
+EXTRACTOR_TIMEOUT = float(os.environ.get("EXTRACTOR_TIMEOUT", 30.0))
+EXTRACTOR_POOL_SIZE = int(os.environ.get("EXTRACTOR_POOL_SIZE", 10))
 USE_TEST = EXTRACTOR_SVC == "test.service"
 
 SERVICE_TOKEN_PATH = "/run/secrets/service_token"
 
 audit = AuditLogger()
+card_cache = CardCache()
 
 _metrics = {
     "processed": 0,
     "matched_cards": 0,
     "failed": 0,
+    "claimed": 0,
+    "batches": 0,
+    "extractor_requests": 0,
     "last_log": 0.0,
 }
 
@@ -44,13 +67,21 @@ def _maybe_log(interval: float = 5.0):
             "processed": _metrics["processed"],
             "matched_cards": _metrics["matched_cards"],
             "failed": _metrics["failed"],
+            "claimed": _metrics["claimed"],
+            "batches": _metrics["batches"],
+            "extractor_requests": _metrics["extractor_requests"],
             "rate_per_sec": round(rate, 2),
+            "cards_cached": len(card_cache),
+            "cards_version": card_cache.version,
         },
     )
 
     _metrics["processed"] = 0
     _metrics["matched_cards"] = 0
     _metrics["failed"] = 0
+    _metrics["claimed"] = 0
+    _metrics["batches"] = 0
+    _metrics["extractor_requests"] = 0
     _metrics["last_log"] = t
 
 
@@ -79,17 +110,27 @@ def sanitize_card(card: dict) -> dict:
     }
 
 
-def selector_matches(selector: dict, event: dict) -> bool:
-    stype = selector.get("type")
-    value = selector.get("value")
+_session: requests.Session | None = None
+_batch_supported = True
+
 
-    if stype == "source_address":
-        return event.get("source", {}).get("address") == value
+def get_session() -> requests.Session:
+    """
+    Process-wide keep-alive session for extractor calls.
+    """
+    global _session
 
-    if stype == "raw":
-        return value in event.get("raw", "")
+    if _session is None:
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=EXTRACTOR_POOL_SIZE,
+            pool_maxsize=EXTRACTOR_POOL_SIZE,
+        )
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _session = session
 
-    return False
+    return _session
 
 
 def call_extractor(card: dict, raw_log: str) -> dict:
@@ -101,11 +142,13 @@ def call_extractor(card: dict, raw_log: str) -> dict:
         "input": raw_log,
     }
 
-    resp = requests.post(
+    _metrics["extractor_requests"] += 1
+
+    resp = get_session().post(
         EXTRACTOR_SVC,
         json=payload,
         headers=service_auth_headers(),
-        timeout=30,
+        timeout=EXTRACTOR_TIMEOUT,
     )
 
     resp.raise_for_status()
@@ -118,6 +161,122 @@ def call_extractor(card: dict, raw_log: str) -> dict:
     raise RuntimeError("Extractor returned invalid result shape")
 
 
+def extract_each(pairs: list) -> list:
+    """
+    One /parse call per (card, raw_log) pair; failures are returned in place.
+    """
+    out = []
+    for card, raw_log in pairs:
+        try:
+            out.append(call_extractor(card, raw_log))
+        except Exception as e:
+            out.append(e)
+    return out
+
+
+def _post_batch(pairs: list) -> list:
+    """
+    One /parse_batch request for many (card, raw_log) pairs. Each distinct
+    card and each distinct raw log is sent once; the extractor decodes
+    every raw log once for all the cards applied to it.
+    """
+    cards = {}
+    events = []
+    event_index = {}
+    slots = []
+
+    for card, raw_log in pairs:
+        key = str(card.get("_id") or card.get("name") or id(card))
+        if key not in cards:
+            cards[key] = sanitize_card(card)
+
+        n = event_index.get(raw_log) if isinstance(raw_log, str) else None
+        if n is None:
+            n = len(events)
+            events.append({"input": raw_log, "cards": []})
+            if isinstance(raw_log, str):
+                event_index[raw_log] = n
+
+        slots.append((n, len(events[n]["cards"])))
+        events[n]["cards"].append(key)
+
+    _metrics["extractor_requests"] += 1
+
+    resp = get_session().post(
+        EXTRACTOR_BATCH_SVC,
+        json={"cards": cards, "events": events},
+        headers=service_auth_headers(),
+        timeout=EXTRACTOR_TIMEOUT,
+    )
+
+    resp.raise_for_status()
+
+    data = resp.json()
+    results = data.get("results") if isinstance(data, dict) else None
+
+    if not isinstance(results, list) or len(results) != len(pairs):
+        raise RuntimeError("Extractor returned invalid batch result shape")
+
+    # Results come back event by event, cards in the order they were listed
+    offsets = []
+    total = 0
+    for ev in events:
+        offsets.append(total)
+        total += len(ev["cards"])
+
+    out = []
+    for n, pos in slots:
+        r = results[offsets[n] + pos]
+        if isinstance(r, dict) and isinstance(r.get("results"), dict):
+            out.append(r["results"])
+        elif isinstance(r, dict) and r.get("error"):
+            out.append(RuntimeError(r["error"]))
+        else:
+            out.append(RuntimeError("Extractor returned invalid result shape"))
+
+    return out
+
+
+def call_extractor_batch(pairs: list) -> list:
+    """
+    Extract many (card, raw_log) pairs with one /parse_batch request per
+    EXTRACTOR_BATCH_SIZE pairs. Returns a results dict or an exception per
+    pair, in order. Falls back to per-pair /parse calls when the extractor
+    has no batch endpoint.
+    """
+    global _batch_supported
+
+    if not EXTRACTOR_SVC:
+        raise RuntimeError("EXTRACTOR_SVC is not set")
+
+    if not _batch_supported or len(pairs) == 1:
+        return extract_each(pairs)
+
+    out = []
+
+    for start in range(0, len(pairs), EXTRACTOR_BATCH_SIZE):
+        chunk = pairs[start:start + EXTRACTOR_BATCH_SIZE]
+
+        try:
+            out.extend(_post_batch(chunk))
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code in (404, 405):
+                _batch_supported = False
+                audit.log(
+                    event="parser_batch_extract_unavailable",
+                    result="failure",
+                    severity="WARNING",
+                    metadata={"url": EXTRACTOR_BATCH_SVC},
+                )
+                out.extend(extract_each(pairs[start:]))
+                break
+            out.extend([e] * len(chunk))
+        except Exception as e:
+            out.extend([e] * len(chunk))
+
+    return out
+
+
 def normalize_results(results: dict) -> dict:
     normalized = {}
     for k, v in results.items():
@@ -125,109 +284,245 @@ def normalize_results(results: dict) -> dict:
     return normalized
 
 
-def process_event(mongo, state: dict):
-
-    event = mongo.find_one("events", {"_id": state["event_id"]})
+def _record_card(mongo, event: dict, card: dict, results: dict | None, error: Exception | None):
+    if error is None:
 
-    if not event:
-        mongo.upsert_event_state(state["event_id"], {"parsed": True})
+        mongo.insert_parse_result({
+            "event_id": event["_id"],
+            "card": card.get("name"),
+            "results": results,
+            "created_at": datetime.now(timezone.utc),
+        })
 
         _metrics["processed"] += 1
-        _metrics["failed"] += 1
-        _maybe_log()
+        _metrics["matched_cards"] += 1
+        return
+
+    mongo.insert_parse_result({
+        "event_id": event["_id"],
+        "card": card.get("name"),
+        "error": str(error),
+        "created_at": datetime.now(timezone.utc),
+    })
+
+    audit.log(
+        event="parser_card_failed",
+        result="failure",
+        severity="ERROR",
+        target=card.get("name"),
+        metadata={
+            "event_id": str(event["_id"]),
+            "error": str(error),
+        },
+    )
+
+    _metrics["processed"] += 1
+    _metrics["failed"] += 1
+
+
+def _processing_failed(state: dict, e: Exception):
+
+    audit.log(
+        event="parser_processing_failure",
+        result="failure",
+        severity="CRITICAL",
+        metadata={
+            "event_id": str(state.get("event_id")),
+            "error": str(e),
+        },
+    )
+
+    _metrics["failed"] += 1
+
+
+def process_batch(mongo, states: list, leases: LeaseKeeper | None = None):
+    """
+    Parse a batch of claimed event states.
+
+    Cards are matched and their inline regex rules applied per event; every
+    (card, raw) pair that still needs the extractor is then sent in one
+    batched call for the whole batch. A failure on one event leaves its
+    state unparsed (its lease expires and it is retried) without affecting
+    the others.
 
+    Extractor calls can take far longer than one lease, so with a
+    LeaseKeeper the batch's leases are renewed until it is done.
+    """
+
+    if leases is None:
+        _process_batch(mongo, states)
         return
 
-    cards = mongo.find("parse_cards", {})
+    with leases.hold(s["_id"] for s in states if "_id" in s):
+        _process_batch(mongo, states)
 
-    for card in cards:
 
-        if not selector_matches(card.get("selector", {}), event):
-            continue
+def _process_batch(mongo, states: list):
+
+    card_cache.refresh(mongo)
+
+    work = []
+
+    for state in states:
 
         try:
+            event = mongo.find_one("events", {"_id": state["event_id"]})
+        except Exception as e:
+            _processing_failed(state, e)
+            continue
+
+        if not event:
+            try:
+                mongo.upsert_event_state(state["event_id"], {"parsed": True, LEASE_FIELD: None})
+            except Exception as e:
+                _processing_failed(state, e)
+                continue
 
-            results = {}
+            _metrics["processed"] += 1
+            _metrics["failed"] += 1
+            continue
 
-            regex_rules = card.get("regex") or []
+        raw_log = event.get("raw", "")
+        entries = []
 
-            for rule in regex_rules:
-                if "pattern" in rule and "name" in rule:
-                    import re
-                    m = re.search(rule["pattern"], event.get("raw", ""))
-                    if m:
-                        results[rule["name"]] = [m.group(0)]
+        for compiled in card_cache.match(event):
+            try:
+                results = compiled.apply_regex(raw_log)
+                entries.append([compiled.card, results or None, None])
+            except Exception as e:
+                entries.append([compiled.card, None, e])
 
-            if not results:
+        work.append((state, event, entries))
 
-                raw_result = call_extractor(card, event.get("raw", ""))
+    # Cards whose inline regex found nothing go to the extractor
+    pending = [
+        (entry, event.get("raw", ""))
+        for _, event, entries in work
+        for entry in entries
+        if entry[1] is None and entry[2] is None
+    ]
 
-                if not isinstance(raw_result, dict):
-                    raise RuntimeError("Extractor returned invalid result shape")
+    if pending:
+        try:
+            outcomes = call_extractor_batch([(entry[0], raw_log) for entry, raw_log in pending])
+        except Exception as e:
+            outcomes = [e] * len(pending)
 
-                results = normalize_results(raw_result)
+        for (entry, _), outcome in zip(pending, outcomes):
+            if isinstance(outcome, Exception):
+                entry[2] = outcome
+            elif not isinstance(outcome, dict):
+                entry[2] = RuntimeError("Extractor returned invalid result shape")
+            else:
+                entry[1] = normalize_results(outcome)
 
-            mongo.insert_parse_result({
-                "event_id": event["_id"],
-                "card": card.get("name"),
-                "results": results,
-                "created_at": datetime.now(timezone.utc),
-            })
+    for state, event, entries in work:
 
-            _metrics["processed"] += 1
-            _metrics["matched_cards"] += 1
+        try:
+            for card, results, error in entries:
+                _record_card(mongo, event, card, results, error)
 
+            mongo.upsert_event_state(event["_id"], {"parsed": True, LEASE_FIELD: None})
         except Exception as e:
+            _processing_failed(state, e)
+
+    _maybe_log()
+
+
+def process_event(mongo, state: dict):
+    process_batch(mongo, [state])
+
+
+def claim_batch(mongo) -> list:
+    """
+    Lease the next batch of unparsed event states to this worker.
+
+    Leases expire after LEASE_SECONDS, so states claimed by a worker that
+    died are picked up again by another replica.
+    """
+    return mongo.claim_batch(
+        "event_state",
+        {"parsed": False},
+        owner=WORKER_ID,
+        lease_field=LEASE_FIELD,
+        lease_seconds=LEASE_SECONDS,
+        limit=BATCH_SIZE,
+        sort=[("_id", 1)],
+    )
+
 
-            mongo.insert_parse_result({
-                "event_id": event["_id"],
-                "card": card.get("name"),
-                "error": str(e),
-                "created_at": datetime.now(timezone.utc),
-            })
+def wait_for_work(mongo):
+    global WAKE_MODE
 
+    if WAKE_MODE == "changestream":
+        try:
+            mongo.wait_for_change(
+                "event_state",
+                pipeline=[{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}],
+                timeout=POLL_INTERVAL,
+            )
+            return
+        except Exception as e:
+            WAKE_MODE = "poll"
             audit.log(
-                event="parser_card_failed",
+                event="parser_changestream_unavailable",
                 result="failure",
-                severity="ERROR",
-                target=card.get("name"),
-                metadata={
-                    "event_id": str(event["_id"]),
-                    "error": str(e),
-                },
+                severity="WARNING",
+                metadata={"error": str(e)},
             )
 
-            _metrics["processed"] += 1
-            _metrics["failed"] += 1
-
-    mongo.upsert_event_state(event["_id"], {"parsed": True})
-
-    _maybe_log()
+    time.sleep(POLL_INTERVAL)
 
 
 def main():
 
     mongo = get_mongo()
 
+    leases = LeaseKeeper(
+        mongo,
+        "event_state",
+        owner=WORKER_ID,
+        lease_field=LEASE_FIELD,
+        lease_seconds=LEASE_SECONDS,
+    ).start()
+
     audit.log(
         event="parser_service_started",
         metadata={
             "poll_interval": POLL_INTERVAL,
+            "batch_size": BATCH_SIZE,
+            "lease_seconds": LEASE_SECONDS,
+            "wake_mode": WAKE_MODE,
+            "worker_id": WORKER_ID,
             "extractor": EXTRACTOR_SVC,
         },
     )
 
     while True:
 
-        state = mongo.find_one("event_state", {"parsed": False})
+        try:
+            batch = claim_batch(mongo)
+        except Exception as e:
+
+            audit.log(
+                event="parser_claim_failure",
+                result="failure",
+                severity="CRITICAL",
+                metadata={"error": str(e)},
+            )
+
+            batch = []
 
-        if not state:
+        if not batch:
             _maybe_log()
-            time.sleep(POLL_INTERVAL)
+            wait_for_work(mongo)
             continue
 
+        _metrics["claimed"] += len(batch)
+        _metrics["batches"] += 1
+
         try:
-            process_event(mongo, state)
+            process_batch(mongo, batch, leases)
         except Exception as e:
 
             audit.log(
@@ -240,8 +535,6 @@ def main():
             _metrics["failed"] += 1
             _maybe_log()
 
-        time.sleep(POLL_INTERVAL)
-
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,55 @@
+from typing import Dict, Iterable, List
+
+from modules.matching.aho_corasick import AhoCorasick
+
+
+class SelectorIndex:
+    """
+    Finds the cards whose selector matches an event without testing each
+    card in turn.
+
+    source_address selectors live in a dict keyed by address; raw
+    selectors are compiled into one Aho–Corasick automaton, so a single
+    pass over the raw log yields every raw card that matches, however many
+    there are. A raw log that is not a string (a dict or list from a JSON
+    source) is tested with `value in raw` per raw card, as before the
+    index. Cards are returned in the order they were given.
+    """
+
+    def __init__(self, cards: Iterable = ()):
+        self._cards = list(cards)
+        self._by_address: Dict[str, List[int]] = {}
+        self._raw_cards: List[int] = []
+
+        raw_patterns = []
+        for pos, card in enumerate(self._cards):
+            if card.selector_type == "source_address":
+                self._by_address.setdefault(card.selector_value, []).append(pos)
+            elif card.selector_type == "raw":
+                self._raw_cards.append(pos)
+                if isinstance(card.selector_value, str):
+                    raw_patterns.append((card.selector_value, pos))
+
+        self._raw = AhoCorasick(raw_patterns)
+
+    def __len__(self) -> int:
+        return len(self._cards)
+
+    def match(self, event: dict) -> list:
+        address = event.get("source", {}).get("address")
+        raw_log = event.get("raw", "")
+
+        hits = set(self._by_address.get(address, ()))
+
+        if isinstance(raw_log, str):
+            if len(self._raw):
+                hits.update(self._raw.keys(raw_log))
+        elif raw_log is not None:
+            for pos in self._raw_cards:
+                try:
+                    if self._cards[pos].selector_value in raw_log:
+                        hits.add(pos)
+                except TypeError:
+                    continue
+
+        return [self._cards[pos] for pos in sorted(hits)]
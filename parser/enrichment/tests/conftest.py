@@ -11,6 +11,7 @@ class FakeMongo:
         self._cards = cards or []
         self.parse_results = []
         self.state_updates = []
+        self.claims = []
 
     def find_one(self, collection, query):
         if collection == "event_state":
@@ -20,6 +21,11 @@ class FakeMongo:
             return self._event
         return None
 
+    def claim_batch(self, collection, filter_query, **kwargs):
+        self.claims.append({"collection": collection, "filter": filter_query, **kwargs})
+        s, self._state = self._state, None
+        return [s] if s else []
+
     def find(self, collection, query):
         if collection in ("cards", "parse_cards"):
             return list(self._cards)
@@ -76,6 +82,9 @@ def run_once(monkeypatch):
                 lambda card, raw: extractor_json,
             )
 
+        # Route batched extraction through the patched per-pair call
+        monkeypatch.setattr(svc, "call_extractor_batch", svc.extract_each)
+
         # ---- run exactly one loop ----
         with pytest.raises(StopLoop):
             svc.main()
@@ -50,6 +50,7 @@ def test_failures_recorded_no_silent_data_loss(monkeypatch):
         return {"field": ["value"]}
 
     monkeypatch.setattr(svc, "call_extractor", _call_extractor)
+    monkeypatch.setattr(svc, "call_extractor_batch", svc.extract_each)
 
     # Run exactly one loop
     with pytest.raises(StopLoop):
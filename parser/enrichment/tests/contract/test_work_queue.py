@@ -0,0 +1,33 @@
+from tests.conftest import FakeMongo
+
+
+def test_pending_states_are_claimed_with_a_lease(run_once):
+    mongo = run_once(
+        fake_mongo=FakeMongo(
+            state={"event_id": "evt4", "parsed": False},
+            event={"_id": "evt4", "raw": "abc foo def"},
+            cards=[{"name": "c1", "selector": {"type": "raw", "value": "foo"}, "regex": []}],
+        ),
+        extractor_json={"k": ["v"]},
+    )
+
+    # Contract: pending states are leased in batches, never read unowned.
+    claim = mongo.claims[0]
+    assert claim["collection"] == "event_state"
+    assert claim["filter"] == {"parsed": False}
+    assert claim["lease_field"] == "parse_lease"
+    assert claim["owner"]
+    assert claim["limit"] >= 1
+
+
+def test_parsed_transition_releases_lease(run_once):
+    mongo = run_once(
+        fake_mongo=FakeMongo(
+            state={"event_id": "evt5", "parsed": False},
+            event={"_id": "evt5", "raw": "abc foo def"},
+            cards=[],
+        ),
+        extractor_json={"k": ["v"]},
+    )
+
+    assert mongo.state_updates == [{"event_id": "evt5", "parsed": True, "parse_lease": None}]
@@ -0,0 +1,91 @@
+import re
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.card_cache import CardCache
+
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+class VersionedMongo:
+    def __init__(self, cards):
+        self.cards = cards
+        self.version = 1
+        self.queries = []
+
+    def get_version(self, name):
+        return self.version
+
+    def find(self, collection, query):
+        self.queries.append(query)
+        since = query.get("last_updated", {}).get("$gte")
+        docs = [c for c in self.cards if since is None or c["last_updated"] >= since]
+        if "deleted" in query:
+            docs = [c for c in docs if not c.get("deleted")]
+        return docs
+
+
+def card(_id, stype, value, minutes=0, **extra):
+    return {
+        "_id": _id,
+        "name": _id,
+        "selector": {"type": stype, "value": value},
+        "last_updated": T0 + timedelta(minutes=minutes),
+        **extra,
+    }
+
+
+def test_match_uses_selector_index_in_load_order():
+    mongo = VersionedMongo([
+        card("a", "raw", "sshd"),
+        card("b", "source_address", "10.0.0.1"),
+        card("c", "raw", "nginx"),
+        card("d", "source_address", "10.0.0.2"),
+    ])
+    cache = CardCache(check_interval=0)
+    cache.refresh(mongo)
+
+    event = {"raw": "host sshd[1]: accepted", "source": {"address": "10.0.0.1"}}
+    assert [c.name for c in cache.match(event)] == ["a", "b"]
+
+
+def test_unchanged_version_skips_reload():
+    mongo = VersionedMongo([card("a", "raw", "x")])
+    cache = CardCache(check_interval=0)
+
+    assert cache.refresh(mongo) is True
+    assert cache.refresh(mongo) is False
+    assert len(mongo.queries) == 1
+
+
+def test_version_bump_loads_only_changed_cards():
+    mongo = VersionedMongo([card("a", "raw", "x"), card("b", "raw", "y", minutes=1)])
+    cache = CardCache(check_interval=0)
+    cache.refresh(mongo)
+
+    mongo.cards[0] = card("a", "raw", "z", minutes=5)
+    mongo.cards[1] = card("b", "raw", "y", minutes=6, deleted=True)
+    mongo.version = 2
+
+    assert cache.refresh(mongo) is True
+    assert mongo.queries[-1] == {"last_updated": {"$gte": T0 + timedelta(minutes=1)}}
+    assert len(cache) == 1
+    assert [c.name for c in cache.match({"raw": "xyz", "source": {}})] == ["a"]
+    assert cache.stats()["incremental_loads"] == 1
+
+
+def test_regex_rules_are_precompiled():
+    mongo = VersionedMongo([
+        card("a", "raw", "x", regex=[{"name": "user", "pattern": r"user=\w+"}]),
+        card("b", "raw", "x", regex=[{"name": "bad", "pattern": "("}]),
+    ])
+    cache = CardCache(check_interval=0)
+    cache.refresh(mongo)
+
+    good, bad = cache.match({"raw": "x user=root", "source": {}})
+    assert good.apply_regex("x user=root") == {"user": ["user=root"]}
+
+    with pytest.raises(re.error):
+        bad.apply_regex("x")
@@ -0,0 +1,88 @@
+import importlib
+import sys
+
+import pytest
+import requests
+
+
+class FakeResponse:
+    def __init__(self, status, body):
+        self.status_code = status
+        self._body = body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code}", response=self)
+
+    def json(self):
+        return self._body
+
+
+class FakeSession:
+    def __init__(self, handler):
+        self.handler = handler
+        self.calls = []
+
+    def post(self, url, json=None, headers=None, timeout=None):
+        self.calls.append((url, json))
+        return self.handler(url, json)
+
+
+@pytest.fixture()
+def svc(monkeypatch):
+    monkeypatch.setenv("EXTRACTOR_SVC", "http://extractor/parser/extractor/parse")
+    sys.modules.pop("app.enrichment", None)
+    mod = importlib.import_module("app.enrichment")
+    monkeypatch.setattr(mod, "service_auth_headers", lambda: {})
+    return mod
+
+
+def test_pairs_are_sent_in_one_batch_request(svc, monkeypatch):
+    def handler(url, body):
+        assert url.endswith("/parse_batch")
+        return FakeResponse(200, {"results": [
+            {"event": n, "card": c, "results": {"n": ev["input"], "card": c}} if ev["input"] != "bad"
+            else {"event": n, "card": c, "error": "boom"}
+            for n, ev in enumerate(body["events"])
+            for c in ev["cards"]
+        ]})
+
+    session = FakeSession(handler)
+    monkeypatch.setattr(svc, "get_session", lambda: session)
+
+    c1 = {"_id": "a", "name": "c1", "selector": {"type": "raw", "value": "x"}}
+    c2 = {"_id": "b", "name": "c2", "selector": {"type": "raw", "value": "y"}}
+
+    out = svc.call_extractor_batch([(c1, "one"), (c2, "two"), (c1, "bad"), (c2, "one")])
+
+    assert len(session.calls) == 1
+    body = session.calls[0][1]
+    assert set(body["cards"]) == {"a", "b"}
+    # Each raw log is sent once with every card that applies to it
+    assert body["events"] == [
+        {"input": "one", "cards": ["a", "b"]},
+        {"input": "two", "cards": ["b"]},
+        {"input": "bad", "cards": ["a"]},
+    ]
+    assert out[0] == {"n": "one", "card": "a"}
+    assert out[1] == {"n": "two", "card": "b"}
+    assert isinstance(out[2], RuntimeError)
+    assert out[3] == {"n": "one", "card": "b"}
+
+
+def test_falls_back_to_single_calls_without_batch_endpoint(svc, monkeypatch):
+    def handler(url, body):
+        if url.endswith("/parse_batch"):
+            return FakeResponse(404, {})
+        return FakeResponse(200, {"results": {"n": body["input"]}})
+
+    session = FakeSession(handler)
+    monkeypatch.setattr(svc, "get_session", lambda: session)
+
+    card = {"name": "c1", "selector": {"type": "raw", "value": "x"}}
+    assert svc.call_extractor_batch([(card, "one"), (card, "two")]) == [{"n": "one"}, {"n": "two"}]
+
+    # The batch endpoint is not retried once it is known to be missing
+    session.calls.clear()
+    svc.call_extractor_batch([(card, "three"), (card, "four")])
+    assert [u for u, _ in session.calls] == ["http://extractor/parser/extractor/parse"] * 2
@@ -0,0 +1,100 @@
+import importlib
+import sys
+
+import pytest
+
+from modules.database.leases import LeaseKeeper
+
+
+class LeaseMongo:
+    """
+    Just enough of HerringboneMongoDatabase for process_batch, with leases
+    held per _id.
+    """
+    def __init__(self, states, events, cards):
+        self.leases = {s["_id"]: "me" for s in states}
+        self.events = {e["_id"]: e for e in events}
+        self.cards = cards
+        self.renewed = []
+        self.state_updates = []
+        self.parse_results = []
+
+    def find(self, collection, query):
+        return list(self.cards) if collection in ("cards", "parse_cards") else []
+
+    def get_version(self, name):
+        return None
+
+    def find_one(self, collection, query):
+        return self.events.get(query["_id"]) if collection == "events" else None
+
+    def renew_leases(self, collection, ids, *, owner, lease_field, lease_seconds):
+        ids = [i for i in ids if self.leases.get(i) == owner]
+        self.renewed.append(ids)
+        return len(ids)
+
+    def insert_parse_result(self, doc):
+        self.parse_results.append(doc)
+
+    def upsert_event_state(self, event_id, payload):
+        self.state_updates.append((event_id, payload))
+        self.leases.pop(f"s-{event_id}", None)
+
+
+@pytest.fixture()
+def svc(monkeypatch):
+    monkeypatch.setenv("EXTRACTOR_SVC", "http://extractor/parser/extractor/parse")
+    sys.modules.pop("app.enrichment", None)
+    return importlib.import_module("app.enrichment")
+
+
+def _keeper(mongo):
+    return LeaseKeeper(mongo, "event_state", owner="me", lease_field="parse_lease", lease_seconds=60)
+
+
+def test_leases_are_renewed_while_the_extractor_runs(svc, monkeypatch):
+    states = [{"_id": f"s-{n}", "event_id": n} for n in range(3)]
+    events = [{"_id": n, "raw": f"line {n}"} for n in range(3)]
+    card = {"_id": "c", "name": "c", "selector": {"type": "raw", "value": "line"}}
+    mongo = LeaseMongo(states, events, [card])
+    keeper = _keeper(mongo)
+
+    def slow_extractor(pairs):
+        # Stands in for a renewal tick landing during a long extractor call
+        assert keeper.held() == 3
+        assert keeper.renew() == 3
+        return [{"ok": "1"}] * len(pairs)
+
+    monkeypatch.setattr(svc, "call_extractor_batch", slow_extractor)
+
+    svc.process_batch(mongo, states, keeper)
+
+    assert [sorted(ids) for ids in mongo.renewed] == [["s-0", "s-1", "s-2"]]
+    assert len(mongo.state_updates) == 3
+    # Done states are no longer renewed
+    assert keeper.held() == 0
+    assert keeper.renew() == 0
+
+
+def test_lost_leases_are_counted():
+    mongo = LeaseMongo([{"_id": "a"}, {"_id": "b"}], [], [])
+    keeper = _keeper(mongo)
+    keeper.add(["a", "b"])
+
+    mongo.leases["b"] = "someone-else"
+
+    assert keeper.renew() == 1
+    assert keeper.stats()["lost"] == 1
+
+
+def test_failed_renewal_is_retried_next_tick():
+    class Down:
+        def renew_leases(self, *a, **kw):
+            raise RuntimeError("mongo down")
+
+    keeper = _keeper(Down())
+    keeper.add(["a"])
+
+    assert keeper.renew() == 0
+    assert keeper.stats()["renew_failures"] == 1
+    assert keeper.held() == 1
@@ -0,0 +1,57 @@
+import random
+
+from modules.matching.aho_corasick import AhoCorasick
+
+from app.card_cache import CompiledCard
+from app.selector_index import SelectorIndex
+
+
+def card(name, stype, value):
+    return CompiledCard({"name": name, "selector": {"type": stype, "value": value}})
+
+
+def test_automaton_reports_overlapping_patterns():
+    ac = AhoCorasick([("he", "he"), ("she", "she"), ("his", "his"), ("hers", "hers")])
+
+    assert sorted(ac.search("ushers")) == [(4, "he"), (4, "she"), (6, "hers")]
+    assert ac.keys("ahishers") == {"his", "she", "he", "hers"}
+    assert ac.keys("xyz") == set()
+
+
+def test_automaton_agrees_with_substring_check():
+    rng = random.Random(7)
+    patterns = ["".join(rng.choice("ab") for _ in range(rng.randint(1, 4))) for _ in range(30)]
+    ac = AhoCorasick((p, i) for i, p in enumerate(patterns))
+
+    for _ in range(50):
+        text = "".join(rng.choice("abc") for _ in range(rng.randint(0, 20)))
+        assert ac.keys(text) == {i for i, p in enumerate(patterns) if p in text}
+
+
+def test_index_matches_address_and_raw_selectors_in_order():
+    index = SelectorIndex([
+        card("ssh", "raw", "sshd["),
+        card("fw", "source_address", "10.0.0.1"),
+        card("auth", "raw", "Accepted"),
+        card("other-host", "source_address", "10.0.0.2"),
+        card("everything", "raw", ""),
+        card("unknown", "tag", "sshd"),
+    ])
+
+    event = {"raw": "host sshd[42]: Accepted publickey", "source": {"address": "10.0.0.1"}}
+    assert [c.name for c in index.match(event)] == ["ssh", "fw", "auth", "everything"]
+
+    event = {"raw": "kernel: eth0 up", "source": {"address": "10.0.0.2"}}
+    assert [c.name for c in index.match(event)] == ["other-host", "everything"]
+
+
+def test_non_string_raw_falls_back_to_membership():
+    index = SelectorIndex([
+        card("has-user", "raw", "user"),
+        card("has-port", "raw", 22),
+        card("text-only", "raw", "sshd"),
+    ])
+
+    assert [c.name for c in index.match({"raw": {"user": "root", "msg": "sshd"}})] == ["has-user"]
+    assert [c.name for c in index.match({"raw": [22, "user"]})] == ["has-user", "has-port"]
+    assert index.match({"raw": None}) == []
@@ -1,7 +1,424 @@
+import hashlib
+import json
+import os
 import re
+import threading
+from collections import OrderedDict
 from typing import Any, Dict, List, Union
 from jsonpath_ng import parse as jsonpath_parse
 
+from modules.matching.regex_guard import PatternTimeout, regex_guard
+
+
+CARD_CACHE_SIZE = int(os.environ.get("EXTRACTOR_CARD_CACHE_SIZE", 1024))
+# "per_field" searches each pattern on its own; "merged" scans once per card
+REGEX_MODE = os.environ.get("EXTRACTOR_REGEX_MODE", "per_field").lower()
+
+# Backreferences, conditional group references, named groups and global
+# inline flags change meaning (or fail to compile) once a pattern is
+# embedded in a larger alternation.
+_UNMERGEABLE = re.compile(r"\\[1-9]|\(\?\(|\(\?P[<=]|\(\?<[A-Za-z_]|\(\?[aiLmsux]+\)")
+
+
+_NO_MATCH = object()
+
+
+# One step of the simple JSONPath subset: .field, [index], ['field'], ["field"]
+_SIMPLE_STEP = re.compile(r"""\.([A-Za-z_][A-Za-z0-9_]*)|\[(-?\d+)\]|\['([^'\\]*)'\]|\["([^"\\]*)"\]""")
+
+
+def _mergeable(pattern: str, compiled: re.Pattern) -> bool:
+    if _UNMERGEABLE.search(pattern):
+        return False
+    # A pattern that can match the empty string would win at every position.
+    return compiled.fullmatch("") is None
+
+
+class SimplePath:
+    """
+    A JSONPath made only of field and integer index steps ("$.user.name",
+    "$.src[0]", "$['a b'][-1]"), evaluated as direct dict/list lookups.
+
+    Results match jsonpath_ng: a missing key, an index past the end or a
+    field step on a non-object yields no value. Anything jsonpath_ng treats
+    differently (indexing into a string or an object, a negative index
+    before the start) is handed to jsonpath_ng for that document.
+    """
+
+    __slots__ = ("path", "steps", "_expr")
+
+    def __init__(self, path: str, steps: List[Union[str, int]]):
+        self.path = path
+        self.steps = steps
+        self._expr = None
+
+    def values(self, data: Any) -> List[Any]:
+        cur = data
+
+        for step in self.steps:
+            if type(step) is str:
+                if isinstance(cur, dict):
+                    if step not in cur:
+                        return []
+                    cur = cur[step]
+                elif cur is None or isinstance(cur, (list, str, int, float)):
+                    return []
+                else:
+                    return self._slow(data)
+            else:
+                if isinstance(cur, list):
+                    if step >= len(cur):
+                        return []
+                    if step < -len(cur):
+                        return self._slow(data)
+                    cur = cur[step]
+                else:
+                    return self._slow(data)
+
+        return [cur]
+
+    def _slow(self, data: Any) -> List[Any]:
+        if self._expr is None:
+            self._expr = jsonpath_parse(self.path)
+        return [m.value for m in self._expr.find(data)]
+
+
+class _JsonPath:
+    """Adapter giving a jsonpath_ng expression the same values() call."""
+
+    __slots__ = ("expr",)
+
+    def __init__(self, path: str):
+        self.expr = jsonpath_parse(path)
+
+    def values(self, data: Any) -> List[Any]:
+        return [m.value for m in self.expr.find(data)]
+
+
+def compile_jsonpath(path: str):
+    """
+    SimplePath for the simple subset, jsonpath_ng for everything else.
+    """
+    if path.startswith("$"):
+        steps: List[Union[str, int]] = []
+        pos = 1
+
+        while pos < len(path):
+            m = _SIMPLE_STEP.match(path, pos)
+            if not m:
+                break
+            field, index, single, double = m.groups()
+            if index is not None:
+                steps.append(int(index))
+            else:
+                steps.append(next(v for v in (field, single, double) if v is not None))
+            pos = m.end()
+        else:
+            return SimplePath(path, steps)
+
+    return _JsonPath(path)
+
+
+class CompiledCard:
+    """
+    A card's regex and JSONPath rules, compiled once.
+
+    Rules that fail to compile keep their error, which is reported in the
+    field's result exactly as it would be on an uncached evaluation.
+
+    Regex rules can be applied per field (one search per pattern) or merged:
+    mergeable patterns are joined into one alternation, each tagged with an
+    empty named group, and the input is scanned once with finditer. Both
+    modes give the same results. The scan tries every field at each
+    position outside a reported match, so a field can only have an earlier
+    match inside one; those spans are re-checked with anchored matches
+    before a field's scan result is used. Patterns that cannot be merged
+    safely are always searched on their own.
+    """
+
+    __slots__ = ("regex", "jsonp", "merged", "_slots", "_unmerged", "_fallback_logged")
+
+    def __init__(
+        self,
+        regex_rules: List[Dict[str, str]] | None = None,
+        jsonp_rules: List[Dict[str, str]] | None = None,
+    ):
+        self.regex = []
+        for rule in regex_rules or []:
+            for field, pattern in rule.items():
+                try:
+                    self.regex.append((field, regex_guard.compile(pattern, re.IGNORECASE)))
+                except re.error as e:
+                    self.regex.append((field, e))
+
+        self._fallback_logged = False
+        self._compile_merged()
+
+        self.jsonp = []
+        for rule in jsonp_rules or []:
+            for field, path in rule.items():
+                try:
+                    self.jsonp.append((field, compile_jsonpath(path)))
+                except Exception as e:
+                    self.jsonp.append((field, e))
+
+    def _compile_merged(self):
+        parts = []
+        slots = []
+        unmerged = []
+
+        for idx, (field, compiled) in enumerate(self.regex):
+            if isinstance(compiled, re.error):
+                continue
+            if _mergeable(compiled.pattern, compiled.compiled):
+                # The empty marker group closes last, so match.lastgroup
+                # names the alternative; a non-capturing wrapper (rather
+                # than a capturing one) keeps re's literal-prefix scan.
+                parts.append(f"(?:{compiled.pattern})(?P<_f{len(slots)}>)")
+                slots.append((idx, compiled))
+            else:
+                unmerged.append(idx)
+
+        self.merged = None
+        self._slots: Dict[str, tuple] = {}
+        self._unmerged = unmerged
+
+        if len(parts) < 2:
+            self._unmerged = sorted(unmerged + [idx for idx, _ in slots])
+            return
+
+        try:
+            merged = regex_guard.compile("|".join(parts), re.IGNORECASE)
+        except (re.error, OverflowError, RecursionError):
+            self._unmerged = sorted(unmerged + [idx for idx, _ in slots])
+            return
+
+        offset = 0
+        for n, (idx, compiled) in enumerate(slots):
+            # group(1) of the original pattern, or the whole match
+            group = offset + 1 if compiled.groups else 0
+            offset += compiled.groups + 1
+            self._slots[f"_f{n}"] = (n, idx, group)
+
+        self.merged = merged
+
+    @staticmethod
+    def _value(match: re.Match):
+        # Prefer capture groups, otherwise full match
+        return match.group(1) if match.groups() else match.group(0)
+
+    @classmethod
+    def _search(cls, compiled, text: str, pos: int = 0):
+        try:
+            match = compiled.search(text, pos)
+        except PatternTimeout as e:
+            return f"[regex timeout: {e}]"
+        except re.error as e:
+            return f"[regex error: {e}]"
+        return cls._value(match) if match else _NO_MATCH
+
+    def apply_regex(self, text: str, mode: str | None = None) -> Dict[str, Any]:
+        if self.effective_mode(mode) == "merged":
+            results = self._apply_regex_merged(text)
+            if results is not None:
+                return results
+        return self._apply_regex_per_field(text)
+
+    def effective_mode(self, mode: str | None = None) -> str:
+        """
+        The mode apply_regex() actually uses: "merged" only when it was
+        asked for and the card has a merged pattern that runs inline.
+        """
+        if (mode or REGEX_MODE) != "merged" or self.merged is None:
+            return "per_field"
+
+        if self._merged_inline():
+            return "merged"
+
+        if not self._fallback_logged:
+            self._fallback_logged = True
+            print("[!] Card has a sandboxed regex, searching its fields one by one instead of merged")
+
+        return "per_field"
+
+    def _merged_inline(self) -> bool:
+        # The span re-check matches merged patterns directly, so every one
+        # of them has to be running inline too
+        return (
+            self.merged is not None
+            and not self.merged.sandboxed
+            and not any(self.regex[idx][1].sandboxed for _, idx, _ in self._slots.values())
+        )
+
+    def _apply_regex_merged(self, text: str) -> Dict[str, Any] | None:
+        found: Dict[int, tuple] = {}
+        spans = []
+
+        for m in self.merged.finditer(text):
+            n, idx, group = self._slots[m.lastgroup]
+
+            # An empty match lets finditer retry the same position, which
+            # the span re-check below does not model
+            if m.end() == m.start():
+                return None
+
+            spans.append((m.start(), m.end(), n))
+            if idx not in found:
+                found[idx] = (m.start(), m.group(group))
+                if len(found) == len(self._slots):
+                    break
+
+        # A field's first match can hide inside an earlier reported span:
+        # the scan skips the span's inner positions, and at its start only
+        # the fields listed before the winner were tried.
+        for n, idx, _ in self._slots.values():
+            limit = found[idx][0] if idx in found else len(text)
+            compiled = self.regex[idx][1].compiled
+
+            for start, end, winner in spans:
+                if start >= limit:
+                    break
+
+                hit = None
+                for p in range(start if n > winner else start + 1, min(end, limit)):
+                    hit = compiled.match(text, p)
+                    if hit:
+                        break
+
+                if hit:
+                    found[idx] = (p, self._value(hit))
+                    break
+
+        found = {idx: value for idx, (_, value) in found.items()}
+
+        for idx in self._unmerged:
+            found[idx] = self._search(self.regex[idx][1], text)
+
+        results: Dict[str, Any] = {}
+
+        for idx, (field, compiled) in enumerate(self.regex):
+            if isinstance(compiled, re.error):
+                results[field] = f"[regex error: {compiled}]"
+            elif found.get(idx, _NO_MATCH) is not _NO_MATCH:
+                results[field] = found[idx]
+
+        return results
+
+    def _apply_regex_per_field(self, text: str) -> Dict[str, Any]:
+        results: Dict[str, Any] = {}
+
+        for field, compiled in self.regex:
+            if isinstance(compiled, re.error):
+                results[field] = f"[regex error: {compiled}]"
+                continue
+
+            value = self._search(compiled, text)
+            if value is not _NO_MATCH:
+                results[field] = value
+
+        return results
+
+    def apply_jsonp(self, json_data: Dict[str, Any]) -> Dict[str, Any]:
+        results: Dict[str, Any] = {}
+
+        for field, expr in self.jsonp:
+            if isinstance(expr, Exception):
+                results[field] = f"[jsonpath error: {expr}]"
+                continue
+
+            try:
+                matches = expr.values(json_data)
+
+                # Normalize single vs multi-value paths
+                results[field] = matches[0] if len(matches) == 1 else matches
+
+            except Exception as e:
+                results[field] = f"[jsonpath error: {e}]"
+
+        return results
+
+
+def card_key(regex_rules: List[Dict[str, str]] | None, jsonp_rules: List[Dict[str, str]] | None) -> str:
+    """
+    Content hash of a card's rules; cards with identical rules share an entry.
+    """
+    blob = json.dumps([regex_rules or [], jsonp_rules or []], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class CompiledCardCache:
+    """
+    Thread-safe LRU of CompiledCard objects keyed by card_key().
+    """
+
+    def __init__(self, maxsize: int = CARD_CACHE_SIZE):
+        self.maxsize = max(1, maxsize)
+        self._entries: "OrderedDict[str, CompiledCard]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._metrics = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+        }
+
+    def get(
+        self,
+        regex_rules: List[Dict[str, str]] | None = None,
+        jsonp_rules: List[Dict[str, str]] | None = None,
+    ) -> CompiledCard:
+        key = card_key(regex_rules, jsonp_rules)
+
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+                self._metrics["hits"] += 1
+                return compiled
+            self._metrics["misses"] += 1
+
+        # Compile outside the lock; a concurrent miss on the same card just
+        # compiles it twice.
+        compiled = CompiledCard(regex_rules, jsonp_rules)
+
+        with self._lock:
+            self._entries[key] = compiled
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._metrics["evictions"] += 1
+
+        return compiled
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._metrics["hits"] + self._metrics["misses"]
+            cards = list(self._entries.values())
+            out = {
+                **self._metrics,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hit_ratio": round(self._metrics["hits"] / lookups, 4) if lookups else 0.0,
+            }
+
+        # Which regex mode the cached cards are really running in
+        merged = sum(1 for c in cards if c.effective_mode() == "merged")
+        out["regex_mode"] = REGEX_MODE
+        out["cards_merged"] = merged
+        out["cards_per_field"] = len(cards) - merged
+
+        return out
+
+
+card_cache = CompiledCardCache()
+
+
+def compile_card(card: Dict[str, Any]) -> CompiledCard:
+    return card_cache.get(card.get("regex"), card.get("jsonp"))
+
 
 class CardParser:
     # Unified parser for CardSet extraction (regex or jsonp)
@@ -28,43 +445,11 @@ class CardParser:
         regex_rules: List[Dict[str, str]],
         text: str,
     ) -> Dict[str, Any]:
-        results: Dict[str, Any] = {}
-
-        for rule in regex_rules:
-            for field, pattern in rule.items():
-                try:
-                    match = re.search(pattern, text, flags=re.IGNORECASE)
-                    if not match:
-                        continue
-
-                    # Prefer capture groups, otherwise full match
-                    if match.groups():
-                        results[field] = match.group(1)
-                    else:
-                        results[field] = match.group(0)
-
-                except re.error as e:
-                    results[field] = f"[regex error: {e}]"
-
-        return results
+        return card_cache.get(regex_rules, None).apply_regex(text)
 
     def _apply_jsonp(
         self,
         jsonp_rules: List[Dict[str, str]],
         json_data: Dict[str, Any],
     ) -> Dict[str, Any]:
-        results: Dict[str, Any] = {}
-
-        for rule in jsonp_rules:
-            for field, path in rule.items():
-                try:
-                    expr = jsonpath_parse(path)
-                    matches = [m.value for m in expr.find(json_data)]
-
-                    # Normalize single vs multi-value paths
-                    results[field] = matches[0] if len(matches) == 1 else matches
-
-                except Exception as e:
-                    results[field] = f"[jsonpath error: {e}]"
-
-        return results
+        return card_cache.get(None, jsonp_rules).apply_jsonp(json_data)
@@ -1,12 +1,20 @@
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import Any, Dict, List, Optional, Union
-from app.parser import CardParser
+from app.parser import card_cache, compile_card
 import json
+import os
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # pragma: no cover - orjson is an optional speedup
+    _json_loads = json.loads
 
 from modules.auth.auth import require_scopes
 from modules.audit.logger import AuditLogger
+from modules.matching.regex_guard import regex_guard
 
 extractor_call_scope = require_scopes("extractor:call")
 
@@ -17,6 +25,8 @@ router = APIRouter(
 
 audit = AuditLogger()
 
+MAX_BATCH_ITEMS = int(os.environ.get("EXTRACTOR_MAX_BATCH_ITEMS", 1000))
+
 
 class Selector(BaseModel):
     type: str
@@ -39,33 +49,122 @@ class ExtractResponse(BaseModel):
     results: Dict[str, Any]
 
 
+class BatchItem(BaseModel):
+    card: str
+    input: Union[str, Dict[str, Any]]
+
+
+class BatchEvent(BaseModel):
+    input: Union[str, Dict[str, Any]]
+    cards: List[str]
+
+
+class ExtractBatchRequest(BaseModel):
+    """
+    One of:
+      - cards + items:  many (card id, input) pairs, each card sent once
+      - cards + events: many inputs, each sent once with the cards to apply
+      - card + inputs:  one card applied to many inputs
+    """
+    cards: Optional[Dict[str, Card]] = None
+    items: Optional[List[BatchItem]] = None
+    events: Optional[List[BatchEvent]] = None
+    card: Optional[Card] = None
+    inputs: Optional[List[Union[str, Dict[str, Any]]]] = None
+
+    @model_validator(mode="after")
+    def _one_shape(self):
+        shared = self.cards is not None or self.items is not None or self.events is not None
+        single = self.card is not None or self.inputs is not None
+
+        if shared == single:
+            raise ValueError("Provide either cards with items or events, or card+inputs")
+        if shared and (self.cards is None or (self.items is None) == (self.events is None)):
+            raise ValueError("cards must be provided with exactly one of items or events")
+        if single and (self.card is None or self.inputs is None):
+            raise ValueError("card and inputs must be provided together")
+
+        return self
+
+
+class BatchResult(BaseModel):
+    event: Optional[int] = None
+    card: Optional[str] = None
+    results: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+class ExtractBatchResponse(BaseModel):
+    count: int
+    results: List[BatchResult]
+
+
+class ExtractorInput:
+    """
+    One input shared by every card applied to it: the text form and the
+    decoded JSON document are each produced at most once.
+    """
+
+    __slots__ = ("raw", "_text", "_doc", "_error")
+
+    def __init__(self, raw: Union[str, Dict[str, Any]]):
+        self.raw = raw
+        self._text = None
+        self._doc = raw if isinstance(raw, dict) else None
+        self._error = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = str(self.raw)
+        return self._text
+
+    def document(self) -> Any:
+        if self._doc is None and self._error is None:
+            try:
+                self._doc = _json_loads(self.raw)
+            except Exception as e:
+                self._error = e
+        if self._error is not None:
+            raise self._error
+        return self._doc
+
+
+def extract(card: Dict[str, Any], input_data: Union[str, Dict[str, Any], ExtractorInput]) -> Dict[str, Any]:
+    if not isinstance(input_data, ExtractorInput):
+        input_data = ExtractorInput(input_data)
+
+    results: Dict[str, Any] = {}
+    compiled = compile_card(card)
+
+    if card.get("regex"):
+        results.update(compiled.apply_regex(input_data.text))
+
+    if card.get("jsonp"):
+        try:
+            results.update(compiled.apply_jsonp(input_data.document()))
+        except Exception as e:
+            results["jsonp_error"] = f"Invalid JSON input or evaluation error: {e}"
+
+    return results
+
+
 @router.post(
     "/parse",
     response_model=ExtractResponse,
     summary="Run regex and/or JSONPath extraction over input",
     description="Receives a full card and an input (string or JSON) and returns {selector, results}.",
 )
-async def parse(
+def parse(
     payload: ExtractRequest,
     request: Request,
     identity=Depends(extractor_call_scope),
 ):
+    # Plain def: regex searches block on the sandbox, so this runs on
+    # FastAPI's threadpool rather than the event loop.
     card = payload.card.model_dump()
-    input_data = payload.input
     selector = card["selector"]
-    results: Dict[str, Any] = {}
-
-    if card.get("regex"):
-        regex_parser = CardParser("regex")
-        results.update(regex_parser(card["regex"], str(input_data)))
-
-    if card.get("jsonp"):
-        jsonp_parser = CardParser("jsonp")
-        try:
-            json_input = input_data if isinstance(input_data, dict) else json.loads(input_data)
-            results.update(jsonp_parser(card["jsonp"], json_input))
-        except Exception as e:
-            results["jsonp_error"] = f"Invalid JSON input or evaluation error: {e}"
+    results = extract(card, payload.input)
 
     audit.log(
         event="extractor_parse",
@@ -79,6 +178,88 @@ async def parse(
     return JSONResponse(content={"selector": selector, "results": results}, status_code=200)
 
 
+@router.post(
+    "/parse_batch",
+    response_model=ExtractBatchResponse,
+    summary="Run extraction for many card/input pairs in one request",
+    description=(
+        "Receives {cards: {id: card}, items: [{card: id, input}]}, "
+        "{cards: {id: card}, events: [{input, cards: [id]}]} or "
+        "{card, inputs: [...]} and returns one result per (input, card), in order."
+    ),
+)
+def parse_batch(
+    payload: ExtractBatchRequest,
+    request: Request,
+    identity=Depends(extractor_call_scope),
+):
+    # Plain def: extraction is CPU-bound, so FastAPI runs the batch on its
+    # threadpool instead of blocking the event loop for every other request.
+    # (event index, card id, input); inputs are shared so each one is
+    # decoded once however many cards are applied to it.
+    items = []
+
+    if payload.card is not None:
+        cards = {"0": payload.card.model_dump()}
+        items = [(None, "0", ExtractorInput(i)) for i in payload.inputs]
+    elif payload.events is not None:
+        cards = {k: c.model_dump() for k, c in payload.cards.items()}
+        for n, ev in enumerate(payload.events):
+            shared = ExtractorInput(ev.input)
+            items.extend((n, card_id, shared) for card_id in ev.cards)
+    else:
+        cards = {k: c.model_dump() for k, c in payload.cards.items()}
+        seen: Dict[str, ExtractorInput] = {}
+        for i in payload.items:
+            if isinstance(i.input, str):
+                shared = seen.get(i.input)
+                if shared is None:
+                    shared = seen[i.input] = ExtractorInput(i.input)
+            else:
+                shared = ExtractorInput(i.input)
+            items.append((None, i.card, shared))
+
+    if len(items) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_BATCH_ITEMS} items")
+
+    out = []
+    failed = 0
+
+    for event, card_id, input_data in items:
+        entry: Dict[str, Any] = {"card": card_id}
+        if event is not None:
+            entry["event"] = event
+
+        card = cards.get(card_id)
+
+        if card is None:
+            failed += 1
+            entry["error"] = f"Unknown card '{card_id}'"
+        else:
+            try:
+                entry["results"] = extract(card, input_data)
+            except Exception as e:
+                failed += 1
+                entry["error"] = str(e)
+
+        out.append(entry)
+
+    audit.log(
+        event="extractor_parse_batch",
+        severity="INFO",
+        identity=identity,
+        request=request,
+        metadata={"cards": len(cards), "items": len(items), "failed": failed},
+    )
+
+    return JSONResponse(content={"count": len(out), "results": out}, status_code=200)
+
+
+@router.get("/stats")
+async def stats(identity=Depends(extractor_call_scope)):
+    return {"card_cache": card_cache.stats(), "regex": regex_guard.stats()}
+
+
 @router.get("/readyz")
 async def readyz():
     return {"ok": True}
@@ -0,0 +1,95 @@
+"""
+Simple-path accessors vs jsonpath_ng on typical card rules.
+
+    cd parser/extractor
+    PYTHONPATH=.:../../modules python benchmarks/bench_jsonpath.py [--docs N] [--rounds N]
+"""
+import argparse
+import random
+import time
+
+from jsonpath_ng import parse as jsonpath_parse
+
+from app.parser import SimplePath, compile_jsonpath
+
+
+PATHS = [
+    "$.user.name",
+    "$.user.id",
+    "$.src[0]",
+    "$.dst[1]",
+    "$.event.action",
+    "$.event.outcome",
+    "$['http']['request']['method']",
+    "$.http.response.status_code",
+    "$.tags[-1]",
+    "$.missing.field",
+]
+
+
+def doc(rng: random.Random) -> dict:
+    return {
+        "user": {"name": rng.choice(["alice", "bob", "root"]), "id": rng.randint(1, 5000)},
+        "src": [f"10.0.0.{rng.randint(1, 254)}", rng.randint(1024, 65535)],
+        "dst": [f"192.168.1.{rng.randint(1, 254)}", 443],
+        "event": {"action": "login", "outcome": rng.choice(["success", "failure"])},
+        "http": {"request": {"method": "GET"}, "response": {"status_code": 200}},
+        "tags": ["auth", "edge"],
+    }
+
+
+def run(evaluate, docs: list, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for d in docs:
+            evaluate(d)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=5000)
+    ap.add_argument("--rounds", type=int, default=5)
+    args = ap.parse_args()
+
+    rng = random.Random(42)
+    docs = [doc(rng) for _ in range(args.docs)]
+
+    ng = [jsonpath_parse(p) for p in PATHS]
+    fast = [compile_jsonpath(p) for p in PATHS]
+    assert all(isinstance(f, SimplePath) for f in fast)
+
+    for d in docs[:100]:
+        assert [[m.value for m in e.find(d)] for e in ng] == [f.values(d) for f in fast]
+
+    t_ng = run(lambda d: [[m.value for m in e.find(d)] for e in ng], docs, args.rounds)
+    t_fast = run(lambda d: [f.values(d) for f in fast], docs, args.rounds)
+
+    per = len(docs) * len(PATHS)
+    print(
+        f"{len(PATHS)} paths x {len(docs)} docs: "
+        f"jsonpath_ng={t_ng / per * 1e6:6.2f}us/path "
+        f"simple={t_fast / per * 1e6:6.2f}us/path "
+        f"speedup={t_ng / t_fast:5.1f}x"
+    )
+
+    started = time.perf_counter()
+    for p in PATHS:
+        jsonpath_parse(p)
+    t_parse = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for p in PATHS:
+        compile_jsonpath(p)
+    t_compile = time.perf_counter() - started
+
+    print(
+        f"compile: jsonpath_ng={t_parse / len(PATHS) * 1e3:6.2f}ms/path "
+        f"simple={t_compile / len(PATHS) * 1e3:6.3f}ms/path"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+CARD = {
+    "selector": {"type": "raw", "value": "sshd"},
+    "regex": [{"user": r"user=(\w+)"}],
+}
+
+
+def test_parse_batch_one_card_many_inputs(client):
+    r = client.post(
+        "/parser/extractor/parse_batch",
+        json={"card": CARD, "inputs": ["sshd user=alice", "sshd user=bob", "nothing"]},
+    )
+    assert r.status_code == 200
+
+    body = r.json()
+    assert body["count"] == 3
+    assert [i["results"].get("user") for i in body["results"]] == ["alice", "bob", None]
+
+
+def test_parse_batch_card_input_pairs_keep_order(client):
+    r = client.post(
+        "/parser/extractor/parse_batch",
+        json={
+            "cards": {
+                "ssh": CARD,
+                "json": {"selector": {"type": "raw", "value": "{"}, "jsonp": [{"host": "$.host"}]},
+            },
+            "items": [
+                {"card": "json", "input": '{"host": "web-1"}'},
+                {"card": "ssh", "input": "sshd user=carol"},
+                {"card": "missing", "input": "x"},
+            ],
+        },
+    )
+    assert r.status_code == 200
+
+    results = r.json()["results"]
+    assert results[0]["results"] == {"host": "web-1"}
+    assert results[1]["results"] == {"user": "carol"}
+    assert results[2]["card"] == "missing"
+    assert "error" in results[2]
+
+
+def test_parse_batch_rejects_mixed_shapes(client):
+    r = client.post(
+        "/parser/extractor/parse_batch",
+        json={"card": CARD, "inputs": ["x"], "items": [{"card": "a", "input": "x"}]},
+    )
+    assert r.status_code == 422
+
+
+def test_parse_batch_events_share_one_input_across_cards(client):
+    r = client.post(
+        "/parser/extractor/parse_batch",
+        json={
+            "cards": {
+                "ssh": CARD,
+                "json": {"selector": {"type": "raw", "value": "{"}, "jsonp": [{"user": "$.user"}]},
+            },
+            "events": [
+                {"input": '{"user": "dave", "msg": "sshd user=dave"}', "cards": ["ssh", "json"]},
+                {"input": "not json", "cards": ["json"]},
+            ],
+        },
+    )
+    assert r.status_code == 200
+
+    results = r.json()["results"]
+    assert [(i["event"], i["card"]) for i in results] == [(0, "ssh"), (0, "json"), (1, "json")]
+    assert results[0]["results"] == {"user": "dave"}
+    assert results[1]["results"] == {"user": "dave"}
+    assert "jsonp_error" in results[2]["results"]
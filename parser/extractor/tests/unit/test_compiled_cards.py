@@ -0,0 +1,162 @@
+import random
+
+import pytest
+
+from app.parser import CardParser, CompiledCardCache
+from modules.matching.regex_guard import RegexGuard
+
+
+REGEX = [{"user": r"user=(\w+)"}, {"action": "accepted|failed"}]
+JSONP = [{"host": "$.host"}, {"ports": "$.ports[*]"}]
+
+
+def test_identical_cards_compile_once():
+    cache = CompiledCardCache(maxsize=8)
+
+    first = cache.get(REGEX, JSONP)
+    second = cache.get([dict(r) for r in REGEX], [dict(r) for r in JSONP])
+
+    assert first is second
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_card_is_evicted():
+    cache = CompiledCardCache(maxsize=2)
+
+    a = cache.get([{"a": "a"}])
+    cache.get([{"b": "b"}])
+    cache.get([{"a": "a"}])
+    cache.get([{"c": "c"}])
+
+    assert cache.get([{"a": "a"}]) is a
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["size"] == 2
+
+
+def test_compiled_card_matches_uncached_results():
+    compiled = CompiledCardCache().get(REGEX, JSONP)
+
+    assert compiled.apply_regex("sshd: Accepted user=root") == {"user": "root", "action": "Accepted"}
+    assert compiled.apply_jsonp({"host": "web-1", "ports": [22, 443]}) == {"host": "web-1", "ports": [22, 443]}
+
+
+def test_compile_errors_are_reported_per_field():
+    compiled = CompiledCardCache().get([{"bad": "("}, {"ok": "x"}], [{"broken": "$.["}])
+
+    regex_results = compiled.apply_regex("x")
+    assert regex_results["bad"].startswith("[regex error:")
+    assert regex_results["ok"] == "x"
+    assert compiled.apply_jsonp({})["broken"].startswith("[jsonpath error:")
+
+
+def test_card_parser_keeps_its_interface():
+    assert CardParser("regex")(REGEX, "user=alice failed") == {"user": "alice", "action": "failed"}
+    assert CardParser("jsonp")(JSONP, {"host": "db", "ports": [5432]}) == {"host": "db", "ports": 5432}
+
+
+@pytest.fixture()
+def inline_guard(monkeypatch):
+    # Merged scans only run on inline patterns
+    guard = RegexGuard(mode="inline")
+    monkeypatch.setattr("app.parser.regex_guard", guard)
+    return guard
+
+
+def test_merged_mode_matches_per_field_results(inline_guard):
+    compiled = CompiledCardCache().get([
+        {"user": r"user=(\w+)"},
+        {"src": r"\bsrc=(\d+\.\d+\.\d+\.\d+)"},
+        {"action": "accepted|failed"},
+        {"port": r"port (\d+)"},
+        {"missing": r"nomatch=(\w+)"},
+        {"backref": r"(\w)\1"},
+    ])
+    assert compiled.merged is not None
+
+    for line in [
+        "sshd: Failed password user=root src=10.0.0.1 port 22",
+        "src=192.168.1.9 user=bob accepted port 2222 aa",
+        "nothing to see",
+    ]:
+        assert compiled.apply_regex(line, "merged") == compiled.apply_regex(line, "per_field")
+
+
+def test_merged_mode_recovers_fields_hidden_by_an_overlapping_match(inline_guard):
+    # "ip=" would only be seen inside the "srcip=" match in a single scan
+    compiled = CompiledCardCache().get([{"srcip": r"srcip=(\S+)"}, {"ip": r"ip=(\S+)"}])
+
+    assert compiled.apply_regex("srcip=1.2.3.4", "merged") == {"srcip": "1.2.3.4", "ip": "1.2.3.4"}
+
+
+def test_merged_mode_does_not_depend_on_field_order(inline_guard):
+    # A single scan reports "ab" for a and skips "ab" for b; b's first
+    # match is still "ab", not the later "ac"
+    compiled = CompiledCardCache().get([{"a": "ab"}, {"b": "a."}])
+    assert compiled.merged is not None
+
+    assert compiled.apply_regex("ab ac", "merged") == {"a": "ab", "b": "ab"}
+    assert compiled.apply_regex("ab ac", "merged") == compiled.apply_regex("ab ac", "per_field")
+
+
+def test_merged_mode_agrees_with_per_field_on_overlapping_patterns(inline_guard):
+    rng = random.Random(12)
+    atoms = ["a", "b", "c", ".", "a+", "b*c", "[ab]", "(a|b)", "(c.)"]
+
+    for _ in range(200):
+        rules = [
+            {f"f{i}": "".join(rng.choice(atoms) for _ in range(rng.randint(1, 3)))}
+            for i in range(rng.randint(2, 5))
+        ]
+        compiled = CompiledCardCache().get(rules)
+        text = "".join(rng.choice("abc ") for _ in range(rng.randint(0, 30)))
+
+        assert compiled.apply_regex(text, "merged") == compiled.apply_regex(text, "per_field"), (rules, text)
+
+
+def test_conditional_group_references_are_not_merged(inline_guard):
+    compiled = CompiledCardCache().get([{"a": r"(<)?x(?(1)>)"}, {"b": "y"}, {"c": "z"}])
+
+    assert compiled.merged is not None
+    assert compiled._unmerged == [0]
+    assert compiled.apply_regex("<x> y z", "merged") == {"a": "<", "b": "y", "c": "z"}
+
+
+def test_merged_mode_engages_under_the_default_guard(monkeypatch):
+    from app import parser
+    from modules.matching.regex_guard import REGEX_GUARD_MODE
+
+    monkeypatch.setattr(parser, "REGEX_MODE", "merged")
+    cache = CompiledCardCache()
+    compiled = cache.get(REGEX)
+
+    assert parser.regex_guard.mode == REGEX_GUARD_MODE
+    assert compiled.effective_mode() == "merged"
+    assert compiled.apply_regex("sshd: Accepted user=root") == {"user": "root", "action": "Accepted"}
+
+    stats = cache.stats()
+    assert stats["regex_mode"] == "merged"
+    assert stats["cards_merged"] == 1
+    assert stats["cards_per_field"] == 0
+
+
+def test_sandboxed_pattern_falls_back_to_per_field_visibly(monkeypatch, capsys):
+    from app import parser
+
+    guard = RegexGuard(mode="auto", slow_ms=0)
+    monkeypatch.setattr(parser, "regex_guard", guard)
+    monkeypatch.setattr(parser, "REGEX_MODE", "merged")
+    try:
+        cache = CompiledCardCache()
+        compiled = cache.get(REGEX)
+        assert compiled.effective_mode() == "merged"
+
+        # Every search counts as slow here, so the merged pattern is sandboxed
+        compiled.apply_regex("sshd: Accepted user=root")
+
+        assert compiled.effective_mode() == "per_field"
+        assert compiled.apply_regex("user=bob failed") == {"user": "bob", "action": "failed"}
+        assert cache.stats()["cards_per_field"] == 1
+        assert "searching its fields one by one" in capsys.readouterr().out
+    finally:
+        guard.close()
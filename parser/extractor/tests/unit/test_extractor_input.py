@@ -0,0 +1,27 @@
+from app.routers import extractor
+
+
+def test_input_is_decoded_once_for_all_cards(monkeypatch):
+    calls = []
+
+    def counting_loads(raw):
+        calls.append(raw)
+        return {"user": "erin", "host": "web-1"}
+
+    monkeypatch.setattr(extractor, "_json_loads", counting_loads)
+
+    shared = extractor.ExtractorInput('{"user": "erin", "host": "web-1"}')
+    first = extractor.extract({"selector": {"type": "raw", "value": "x"}, "jsonp": [{"u": "$.user"}]}, shared)
+    second = extractor.extract({"selector": {"type": "raw", "value": "y"}, "jsonp": [{"h": "$.host"}]}, shared)
+
+    assert first == {"u": "erin"}
+    assert second == {"h": "web-1"}
+    assert len(calls) == 1
+
+
+def test_decode_error_is_reported_for_every_card():
+    shared = extractor.ExtractorInput("not json")
+    card = {"selector": {"type": "raw", "value": "x"}, "jsonp": [{"u": "$.user"}]}
+
+    assert "jsonp_error" in extractor.extract(card, shared)
+    assert "jsonp_error" in extractor.extract(card, shared)
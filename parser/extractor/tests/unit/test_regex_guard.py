@@ -0,0 +1,136 @@
+import re
+import threading
+import time
+
+import pytest
+
+from app.parser import CompiledCard
+from modules.matching.regex_guard import REGEX_GUARD_MODE, PatternTimeout, RegexGuard, analyze_pattern
+
+
+@pytest.mark.parametrize("pattern", [
+    r"(a+)+$",
+    r"(\w+\s?)*$",
+    r"(a|ab)*c",
+    r"(.*,)*x",
+    "(",
+])
+def test_pathological_patterns_are_flagged(pattern):
+    assert analyze_pattern(pattern)
+
+
+@pytest.mark.parametrize("pattern", [
+    r"user=(\w+)",
+    r"(?:\d{1,3}\.){3}\d{1,3}",
+    r"([a-z]+\.)+com",
+    r"(foo|bar)+",
+    r".*error.*",
+])
+def test_ordinary_patterns_pass(pattern):
+    assert analyze_pattern(pattern) == []
+
+
+def test_analysis_uses_the_compile_flags():
+    # Only overlapping once case is ignored
+    assert analyze_pattern(r"(ab|AB)*c") == []
+    assert analyze_pattern(r"(ab|AB)*c", re.IGNORECASE)
+    assert analyze_pattern(r"([a-z]+X)+") == []
+    assert analyze_pattern(r"([a-z]+X)+", re.IGNORECASE)
+
+
+def test_only_flagged_patterns_are_sandboxed_by_default():
+    guard = RegexGuard()
+    try:
+        assert REGEX_GUARD_MODE == "auto"
+
+        gp = guard.compile(r"user=(\w+)")
+        assert not gp.sandboxed
+        assert gp.search("user=root").group(1) == "root"
+
+        assert guard.compile(r"(a+)+$").sandboxed
+        # No sandbox process is started until a sandboxed search runs
+        assert all(w._proc is None for w in guard._sandbox._workers)
+    finally:
+        guard.close()
+
+
+def test_a_timeout_does_not_hold_up_other_searches():
+    guard = RegexGuard(mode="sandbox", timeout_ms=1000, sandbox_workers=2)
+    try:
+        # Start both workers so start-up is not part of the timings
+        ok = guard.compile(r"b+")
+        assert ok.search("abba").group(0) == "bb"
+
+        evil = guard.compile(r"(a+)+$")
+        errors = []
+
+        def run_evil():
+            try:
+                evil.search("a" * 40 + "b")
+            except PatternTimeout as e:
+                errors.append(e)
+
+        t = threading.Thread(target=run_evil)
+        t.start()
+        time.sleep(0.2)
+
+        started = time.monotonic()
+        assert ok.search("abba").group(0) == "bb"
+        assert time.monotonic() - started < 0.5
+
+        t.join()
+        assert len(errors) == 1
+        assert guard.stats()["sandbox_restarts"] == 1
+    finally:
+        guard.close()
+
+
+def test_sandboxed_pattern_times_out_and_is_quarantined():
+    guard = RegexGuard(mode="auto", timeout_ms=200, quarantine_after=2)
+    try:
+        evil = guard.compile(r"(a+)+$")
+        assert evil.sandboxed
+
+        m = evil.search("xx aaa")
+        assert m.group(0) == "aaa"
+        assert m.span() == (3, 6)
+
+        for _ in range(2):
+            with pytest.raises(PatternTimeout):
+                evil.search("a" * 40 + "b")
+
+        assert evil.quarantined
+        with pytest.raises(PatternTimeout, match="quarantined"):
+            evil.search("aaa")
+
+        stats = guard.stats()
+        assert stats["patterns"][0]["pattern"] == r"(a+)+$"
+        assert stats["patterns"][0]["timeouts"] == 2
+    finally:
+        guard.close()
+
+
+def test_slow_inline_pattern_is_moved_to_sandbox():
+    guard = RegexGuard(mode="auto", slow_ms=0)
+    try:
+        gp = guard.compile(r"user=(\w+)")
+        assert not gp.sandboxed
+
+        assert gp.search("user=root").group(1) == "root"
+        assert gp.sandboxed
+        assert gp.search("user=alice").group(1) == "alice"
+    finally:
+        guard.close()
+
+
+def test_card_reports_timeouts_per_field(monkeypatch):
+    guard = RegexGuard(mode="sandbox", timeout_ms=200)
+    monkeypatch.setattr("app.parser.regex_guard", guard)
+    try:
+        compiled = CompiledCard([{"evil": r"(a+)+$"}, {"ok": r"(b+)"}])
+
+        results = compiled.apply_regex("a" * 40 + "b")
+        assert results["evil"].startswith("[regex timeout:")
+        assert results["ok"] == "b"
+    finally:
+        guard.close()
@@ -0,0 +1,43 @@
+import pytest
+from jsonpath_ng import parse as jsonpath_parse
+
+from app.parser import SimplePath, compile_jsonpath
+
+
+DOC = {
+    "user": {"name": "bob", "tags": ["a", "b"]},
+    "src": ["10.0.0.1", 22],
+    "n": None,
+    "s": "text",
+    "a b": {"c": 1},
+}
+
+
+@pytest.mark.parametrize("path", [
+    "$",
+    "$.user.name",
+    "$.src[0]",
+    "$.src[-1]",
+    "$.src[5]",
+    "$['user']['tags'][1]",
+    '$["a b"].c',
+    "$.missing.field",
+    "$.n",
+    "$.n.x",
+    "$.s.x",
+    "$.src.x",
+    "$.s[0]",
+])
+def test_simple_paths_match_jsonpath_ng(path):
+    compiled = compile_jsonpath(path)
+
+    assert isinstance(compiled, SimplePath)
+    assert compiled.values(DOC) == [m.value for m in jsonpath_parse(path).find(DOC)]
+
+
+@pytest.mark.parametrize("path", ["$.user.*", "$..name", "$.user.tags[*]", "$.src[0:1]", "user.name"])
+def test_complex_paths_use_jsonpath_ng(path):
+    compiled = compile_jsonpath(path)
+
+    assert not isinstance(compiled, SimplePath)
+    assert compiled.values(DOC) == [m.value for m in jsonpath_parse(path).find(DOC)]